@@ -1,210 +1,330 @@
+"""Generate seeded synthetic product catalogs with realistic price histories.
+
+Without arguments this writes the 10-product, 90-day sample used in
+development (sample_products.json plus product_1..3.json). The same price
+model scales to load-testing catalogs: products are simulated in blocks, one
+NumPy step per sample across the whole block, and each block is written out
+before the next one is generated, so memory stays constant however many
+products are requested. It does grow with the history length: a block's
+prices take BLOCK_SIZE x 8 bytes per sample (30 MB for 5 years daily, 700 MB
+for 5 years hourly), while random numbers are drawn TIME_CHUNK samples at a
+time.
+
+Output formats:
+    json    sample_products.json + product_1..3.json (small catalogs only)
+    jsonl   sharded products-00000.jsonl files, one product per line
+    store   the columnar price store read by ml-service (daily or coarser)
+
+The output depends only on the options (seed, counts, frequency, end date),
+not on the shard size.
+
+Usage:
+    python generate_sample_data.py
+    python generate_sample_data.py --products 1000000 --days 1825 --format jsonl -o catalog/
+    python generate_sample_data.py --products 1000000 --days 1825 --format store -o price_store
+"""
+import argparse
 import json
-import random
-import math
-from datetime import datetime, timedelta
-import uuid
-
-def generate_sample_data():
-    """Generate sample product data with realistic price histories"""
-    
-    products = [
-        {
-            "name": "iPhone 15 Pro",
-            "category": "Electronics",
-            "brand": "Apple",
-            "description": "Latest iPhone with Pro camera system and titanium design",
-            "imageUrl": "https://example.com/iphone15pro.jpg",
-            "averageRating": 4.7,
-            "tags": ["smartphone", "apple", "5g", "camera", "premium"]
-        },
-        {
-            "name": "Samsung Galaxy S24 Ultra",
-            "category": "Electronics", 
-            "brand": "Samsung",
-            "description": "Flagship Android smartphone with S Pen and advanced AI features",
-            "imageUrl": "https://example.com/galaxys24.jpg",
-            "averageRating": 4.6,
-            "tags": ["smartphone", "samsung", "android", "s-pen", "camera"]
-        },
-        {
-            "name": "MacBook Air M3",
-            "category": "Electronics",
-            "brand": "Apple", 
-            "description": "Ultra-thin laptop with M3 chip and all-day battery life",
-            "imageUrl": "https://example.com/macbookair.jpg",
-            "averageRating": 4.8,
-            "tags": ["laptop", "apple", "m3", "ultrabook", "macos"]
-        },
-        {
-            "name": "Sony WH-1000XM5",
-            "category": "Electronics",
-            "brand": "Sony",
-            "description": "Industry-leading noise canceling wireless headphones",
-            "imageUrl": "https://example.com/sonywh1000xm5.jpg", 
-            "averageRating": 4.5,
-            "tags": ["headphones", "wireless", "noise-canceling", "sony", "audio"]
-        },
-        {
-            "name": "Nike Air Max 270",
-            "category": "Fashion",
-            "brand": "Nike",
-            "description": "Lifestyle sneakers with Max Air unit for all-day comfort",
-            "imageUrl": "https://example.com/airmax270.jpg",
-            "averageRating": 4.3,
-            "tags": ["sneakers", "nike", "air-max", "casual", "comfort"]
-        },
-        {
-            "name": "Instant Pot Duo 7-in-1",
-            "category": "Home & Kitchen",
-            "brand": "Instant Pot",
-            "description": "Electric pressure cooker with 7 cooking functions",
-            "imageUrl": "https://example.com/instantpot.jpg",
-            "averageRating": 4.6,
-            "tags": ["pressure-cooker", "kitchen", "appliance", "multi-function"]
-        },
-        {
-            "name": "The Psychology of Money",
-            "category": "Books",
-            "brand": "Harriman House",
-            "description": "Timeless lessons on wealth, greed, and happiness by Morgan Housel",
-            "imageUrl": "https://example.com/psychologyofmoney.jpg",
-            "averageRating": 4.7,
-            "tags": ["finance", "psychology", "investing", "money", "bestseller"]
-        },
-        {
-            "name": "Fitbit Charge 6",
-            "category": "Electronics",
-            "brand": "Fitbit",
-            "description": "Advanced fitness tracker with built-in GPS and heart rate monitoring",
-            "imageUrl": "https://example.com/fitbitcharge6.jpg",
-            "averageRating": 4.4,
-            "tags": ["fitness", "tracker", "health", "gps", "heart-rate"]
-        },
-        {
-            "name": "Dyson V15 Detect",
-            "category": "Home & Kitchen", 
-            "brand": "Dyson",
-            "description": "Cordless vacuum with laser dust detection and powerful suction",
-            "imageUrl": "https://example.com/dysonv15.jpg",
-            "averageRating": 4.5,
-            "tags": ["vacuum", "cordless", "dyson", "cleaning", "laser-detect"]
-        },
-        {
-            "name": "Levi's 501 Original Jeans",
-            "category": "Fashion",
-            "brand": "Levi's", 
-            "description": "Classic straight-leg jeans with authentic fit and feel",
-            "imageUrl": "https://example.com/levis501.jpg",
-            "averageRating": 4.2,
-            "tags": ["jeans", "denim", "levis", "classic", "straight-leg"]
-        }
-    ]
-    
-    # Generate price histories for each product
-    for product in products:
-        price_history = generate_price_history(product)
-        product["priceHistory"] = price_history
-        product["currentPrice"] = price_history[-1]["price"]
-        product["isActive"] = True
-        product["_id"] = str(uuid.uuid4())[:24]
-    
-    return products
+import os
+import re
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
 
-def generate_price_history(product):
-    """Generate realistic price history for a product"""
-    
-    # Base prices by category
-    base_prices = {
-        "Electronics": {"iPhone": 999, "Samsung": 899, "MacBook": 1199, "Sony": 349, "Fitbit": 159},
-        "Fashion": {"Nike": 130, "Levi's": 59},
-        "Home & Kitchen": {"Instant Pot": 89, "Dyson": 749},
-        "Books": {"default": 16}
+PRODUCTS = [
+    {
+        "name": "iPhone 15 Pro",
+        "category": "Electronics",
+        "brand": "Apple",
+        "description": "Latest iPhone with Pro camera system and titanium design",
+        "imageUrl": "https://example.com/iphone15pro.jpg",
+        "averageRating": 4.7,
+        "tags": ["smartphone", "apple", "5g", "camera", "premium"],
+        "basePrice": 999
+    },
+    {
+        "name": "Samsung Galaxy S24 Ultra",
+        "category": "Electronics",
+        "brand": "Samsung",
+        "description": "Flagship Android smartphone with S Pen and advanced AI features",
+        "imageUrl": "https://example.com/galaxys24.jpg",
+        "averageRating": 4.6,
+        "tags": ["smartphone", "samsung", "android", "s-pen", "camera"],
+        "basePrice": 899
+    },
+    {
+        "name": "MacBook Air M3",
+        "category": "Electronics",
+        "brand": "Apple",
+        "description": "Ultra-thin laptop with M3 chip and all-day battery life",
+        "imageUrl": "https://example.com/macbookair.jpg",
+        "averageRating": 4.8,
+        "tags": ["laptop", "apple", "m3", "ultrabook", "macos"],
+        "basePrice": 1199
+    },
+    {
+        "name": "Sony WH-1000XM5",
+        "category": "Electronics",
+        "brand": "Sony",
+        "description": "Industry-leading noise canceling wireless headphones",
+        "imageUrl": "https://example.com/sonywh1000xm5.jpg",
+        "averageRating": 4.5,
+        "tags": ["headphones", "wireless", "noise-canceling", "sony", "audio"],
+        "basePrice": 349
+    },
+    {
+        "name": "Nike Air Max 270",
+        "category": "Fashion",
+        "brand": "Nike",
+        "description": "Lifestyle sneakers with Max Air unit for all-day comfort",
+        "imageUrl": "https://example.com/airmax270.jpg",
+        "averageRating": 4.3,
+        "tags": ["sneakers", "nike", "air-max", "casual", "comfort"],
+        "basePrice": 130
+    },
+    {
+        "name": "Instant Pot Duo 7-in-1",
+        "category": "Home & Kitchen",
+        "brand": "Instant Pot",
+        "description": "Electric pressure cooker with 7 cooking functions",
+        "imageUrl": "https://example.com/instantpot.jpg",
+        "averageRating": 4.6,
+        "tags": ["pressure-cooker", "kitchen", "appliance", "multi-function"],
+        "basePrice": 89
+    },
+    {
+        "name": "The Psychology of Money",
+        "category": "Books",
+        "brand": "Harriman House",
+        "description": "Timeless lessons on wealth, greed, and happiness by Morgan Housel",
+        "imageUrl": "https://example.com/psychologyofmoney.jpg",
+        "averageRating": 4.7,
+        "tags": ["finance", "psychology", "investing", "money", "bestseller"],
+        "basePrice": 16
+    },
+    {
+        "name": "Fitbit Charge 6",
+        "category": "Electronics",
+        "brand": "Fitbit",
+        "description": "Advanced fitness tracker with built-in GPS and heart rate monitoring",
+        "imageUrl": "https://example.com/fitbitcharge6.jpg",
+        "averageRating": 4.4,
+        "tags": ["fitness", "tracker", "health", "gps", "heart-rate"],
+        "basePrice": 159
+    },
+    {
+        "name": "Dyson V15 Detect",
+        "category": "Home & Kitchen",
+        "brand": "Dyson",
+        "description": "Cordless vacuum with laser dust detection and powerful suction",
+        "imageUrl": "https://example.com/dysonv15.jpg",
+        "averageRating": 4.5,
+        "tags": ["vacuum", "cordless", "dyson", "cleaning", "laser-detect"],
+        "basePrice": 749
+    },
+    {
+        "name": "Levi's 501 Original Jeans",
+        "category": "Fashion",
+        "brand": "Levi's",
+        "description": "Classic straight-leg jeans with authentic fit and feel",
+        "imageUrl": "https://example.com/levis501.jpg",
+        "averageRating": 4.2,
+        "tags": ["jeans", "denim", "levis", "classic", "straight-leg"],
+        "basePrice": 59
     }
-    
-    # Determine base price
-    category = product["category"]
-    name = product["name"]
-    
-    if category == "Electronics":
-        if "iPhone" in name:
-            base_price = base_prices[category]["iPhone"]
-        elif "Samsung" in name:
-            base_price = base_prices[category]["Samsung"] 
-        elif "MacBook" in name:
-            base_price = base_prices[category]["MacBook"]
-        elif "Sony" in name:
-            base_price = base_prices[category]["Sony"]
-        elif "Fitbit" in name:
-            base_price = base_prices[category]["Fitbit"]
-        else:
-            base_price = 299
-    elif category == "Fashion":
-        if "Nike" in name:
-            base_price = base_prices[category]["Nike"]
-        elif "Levi's" in name:
-            base_price = base_prices[category]["Levi's"]
-        else:
-            base_price = 79
-    elif category == "Home & Kitchen":
-        if "Instant Pot" in name:
-            base_price = base_prices[category]["Instant Pot"]
-        elif "Dyson" in name:
-            base_price = base_prices[category]["Dyson"]
-        else:
-            base_price = 149
-    else:
-        base_price = base_prices["Books"]["default"]
-    
-    # Generate 90 days of price history
-    price_history = []
-    current_date = datetime.now() - timedelta(days=90)
-    current_price = base_price
-    
-    for day in range(90):
-        # Add some seasonality and trends
-        seasonal_factor = 1 + 0.1 * math.sin(day * 2 * 3.14159 / 30)  # Monthly cycle
-        trend_factor = 1 + (day * 0.001 * random.uniform(-1, 1))  # Small random trend
-        
-        # Add random daily fluctuation
-        daily_change = random.uniform(-0.05, 0.05)  # +/- 5% daily change
-        
-        # Calculate new price
-        price_change = current_price * daily_change * seasonal_factor * trend_factor
-        current_price = max(base_price * 0.7, current_price + price_change)  # Don't go below 70% of base
-        current_price = min(base_price * 1.4, current_price)  # Don't go above 140% of base
-        
-        # Add occasional sales (10% chance of significant discount)
-        if random.random() < 0.1:
-            current_price *= random.uniform(0.8, 0.95)  # 5-20% discount
-        
-        price_history.append({
-            "date": current_date.isoformat(),
-            "price": round(current_price, 2),
-            "source": "sample_data"
-        })
-        
-        current_date += timedelta(days=1)
-    
-    return price_history
-
-def save_to_files():
-    """Save sample data to JSON files"""
-    products = generate_sample_data()
-    
-    # Save all products to one file
-    with open('sample_products.json', 'w') as f:
-        json.dump(products, f, indent=2, default=str)
-    
-    # Save individual product files for testing
-    for i, product in enumerate(products[:3]):  # Save first 3 for individual testing
-        filename = f'product_{i+1}.json'
-        with open(filename, 'w') as f:
-            json.dump(product, f, indent=2, default=str)
-    
+]
+
+# Products are simulated (and random numbers drawn) in blocks of this size,
+# TIME_CHUNK samples at a time
+BLOCK_SIZE = 2048
+TIME_CHUNK = 365
+
+FREQUENCY_HOURS = {'h': 1, 'd': 24, 'w': 24 * 7}
+
+
+def parse_frequency(value):
+    """'1d', '6h', '1w' -> sampling interval in hours"""
+    match = re.fullmatch(r'(\d+)([hdw])', value.strip().lower())
+    if not match or int(match.group(1)) == 0:
+        raise argparse.ArgumentTypeError(f"invalid frequency '{value}' (expected e.g. 6h, 1d, 1w)")
+    return int(match.group(1)) * FREQUENCY_HOURS[match.group(2)]
+
+
+def sample_times(days, step_hours, end_date):
+    """Sample timestamps covering ``days`` days up to ``end_date``"""
+    points = max(1, days * 24 // step_hours)
+    start = np.datetime64(end_date, 's') - np.timedelta64(days, 'D')
+    return start + np.arange(points) * np.timedelta64(step_hours, 'h')
+
+
+def simulate_prices(rng, base_prices, points, step_hours, time_chunk=TIME_CHUNK):
+    """Price walks for a block of products: a (products, points) float64 matrix.
+
+    Each sample moves the price by a uniform +/-5% daily change (scaled to the
+    sampling interval) modulated by a 30-day seasonal cycle and a small random
+    trend, clipped to 70-140% of the base price. Sales cut the price by 5-20%
+    with a 10% chance per day and persist until the walk recovers.
+    """
+    count = len(base_prices)
+    step_days = step_hours / 24
+    sale_probability = 1 - 0.9 ** step_days
+    low, high = base_prices * 0.7, base_prices * 1.4
+    prices = np.empty((count, points))
+    current = np.asarray(base_prices, dtype=float)
+
+    for start in range(0, points, time_chunk):
+        stop = min(start + time_chunk, points)
+        elapsed_days = np.arange(start, stop) * step_days
+
+        # Random draws for ``time_chunk`` samples at a time, laid out (samples,
+        # products) so every step below works on one contiguous row
+        shape = (stop - start, count)
+        seasonal = 1 + 0.1 * np.sin(elapsed_days * 2 * np.pi / 30)
+        trend = 1 + elapsed_days[:, None] * 0.001 * rng.uniform(-1, 1, shape)
+        change = rng.uniform(-0.05, 0.05, shape) * np.sqrt(step_days)
+        factor = 1 + change * seasonal[:, None] * trend
+        discount = np.where(rng.random(shape) < sale_probability, rng.uniform(0.8, 0.95, shape), 1.0)
+
+        walk = np.empty(shape)
+        for step in range(stop - start):
+            current = np.minimum(np.maximum(current * factor[step], low), high) * discount[step]
+            walk[step] = current
+        prices[:, start:stop] = np.round(walk.T, 2)
+    return prices
+
+
+def product_id(seed, index):
+    """Deterministic 24-hex-digit (ObjectId-shaped) id"""
+    return f'{seed & 0xffffffff:08x}{index:016x}'
+
+
+def generate_blocks(count, days, step_hours, seed, end_date, block_size=BLOCK_SIZE):
+    """Yield (products, times, prices) blocks; products carry catalog metadata without histories"""
+    times = sample_times(days, step_hours, end_date)
+    for block, start in enumerate(range(0, count, block_size)):
+        indices = range(start, min(start + block_size, count))
+        rng = np.random.default_rng([seed, block])
+        templates = [PRODUCTS[index % len(PRODUCTS)] for index in indices]
+        # The first copy of each template keeps its list price; later copies vary it
+        scale = np.where(np.array(indices) < len(PRODUCTS), 1.0, rng.uniform(0.8, 1.2, len(templates)))
+        base_prices = np.array([template['basePrice'] for template in templates]) * scale
+        prices = simulate_prices(rng, base_prices, len(times), step_hours)
+
+        products = []
+        for index, template in zip(indices, templates):
+            product = {key: value for key, value in template.items() if key != 'basePrice'}
+            if index >= len(PRODUCTS):
+                product['name'] = f"{template['name']} #{index // len(PRODUCTS) + 1}"
+            products.append(product)
+        for product, index, row in zip(products, indices, prices):
+            product['currentPrice'] = float(row[-1])
+            product['isActive'] = True
+            product['_id'] = product_id(seed, index)
+        yield products, times, prices
+
+
+def history_prefixes(times):
+    """The JSON text of every price point up to its price value; shared by all products"""
+    return [f'{{"date": "{date}", "source": "sample_data", "price": ' for date in np.datetime_as_string(times, unit='s')]
+
+
+def product_json(product, prefixes, prices):
+    """One product as a JSON document; the history is spliced in as text"""
+    history = '}, '.join(map(str.__add__, prefixes, map(repr, prices.tolist())))
+    return f'{json.dumps(product)[:-1]}, "priceHistory": [{history}}}]}}'
+
+
+def generate_sample_data(count=len(PRODUCTS), days=90, step_hours=24, seed=42, end_date=None):
+    """Generate a small catalog in memory as a list of product dicts"""
+    end_date = end_date or datetime.now().date().isoformat()
+    products = []
+    for block, times, prices in generate_blocks(count, days, step_hours, seed, end_date):
+        prefixes = history_prefixes(times)
+        products.extend(json.loads(product_json(product, prefixes, row)) for product, row in zip(block, prices))
+    return products
+
+
+def write_json(output, **options):
+    """All products to sample_products.json and the first 3 to product_N.json"""
+    products = generate_sample_data(**options)
+    with open(os.path.join(output, 'sample_products.json'), 'w') as f:
+        json.dump(products, f, indent=2)
+    for i, product in enumerate(products[:3]):
+        with open(os.path.join(output, f'product_{i + 1}.json'), 'w') as f:
+            json.dump(product, f, indent=2)
     print(f"Generated {len(products)} sample products")
     print("Files created:")
     print("- sample_products.json (all products)")
     print("- product_1.json, product_2.json, product_3.json (individual products)")
 
+
+def write_jsonl(output, count, days, step_hours, seed, end_date, shard_size):
+    """Products to products-NNNNN.jsonl shards of ``shard_size`` lines"""
+    written = 0
+    shard = None
+    prefixes = None
+    try:
+        for products, times, prices in generate_blocks(count, days, step_hours, seed, end_date):
+            prefixes = prefixes or history_prefixes(times)
+            for product, row in zip(products, prices):
+                if written % shard_size == 0:
+                    if shard:
+                        shard.close()
+                    shard = open(os.path.join(output, f'products-{written // shard_size:05d}.jsonl'), 'w')
+                shard.write(product_json(product, prefixes, row) + '\n')
+                written += 1
+    finally:
+        if shard:
+            shard.close()
+    print(f"Wrote {written} products to {-(-written // shard_size)} shards in {output}")
+
+
+def write_store(output, count, days, step_hours, seed, end_date):
+    """Products to a columnar price store (ml-service/price_store.py)"""
+    if step_hours % 24:
+        raise SystemExit('The price store holds one price per day; use a frequency of 1d or coarser')
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ml-service'))
+    from price_store import EPOCH_DAY, PriceStoreWriter
+
+    with PriceStoreWriter(output) as writer:
+        for products, times, prices in generate_blocks(count, days, step_hours, seed, end_date):
+            epoch_days = (times.astype('datetime64[D]') - EPOCH_DAY).astype(np.int32)
+            writer.add_block([product['_id'] for product in products], epoch_days, prices)
+    print(f"Wrote {writer.products} products ({writer.points} points) to {output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=len(PRODUCTS), help='number of products')
+    parser.add_argument('--days', type=int, default=90, help='history length in days')
+    parser.add_argument('--frequency', type=parse_frequency, default='1d', help='sampling interval: 6h, 1d, 1w, ...')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--end-date', default=datetime.now().date().isoformat(), help='histories end here (YYYY-MM-DD)')
+    parser.add_argument('--format', choices=['json', 'jsonl', 'store'], default='json')
+    parser.add_argument('--shard-size', type=int, default=100000, help='products per JSONL shard')
+    parser.add_argument('-o', '--output', default='.', help='output directory')
+    args = parser.parse_args()
+
+    options = {
+        'count': args.products,
+        'days': args.days,
+        'step_hours': args.frequency,
+        'seed': args.seed,
+        'end_date': args.end_date
+    }
+    started = time.perf_counter()
+    if args.format == 'store':
+        write_store(args.output, **options)
+    else:
+        os.makedirs(args.output, exist_ok=True)
+        if args.format == 'jsonl':
+            write_jsonl(args.output, shard_size=args.shard_size, **options)
+        else:
+            write_json(args.output, **options)
+    print(f"Finished in {time.perf_counter() - started:.1f}s")
+
+
 if __name__ == "__main__":
-    save_to_files()
+    main()
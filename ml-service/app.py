@@ -1,15 +1,43 @@
 import os
+import json
 import logging
-from datetime import datetime, timedelta
-from flask import Flask, request, jsonify
+from collections import namedtuple
+from datetime import datetime
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 import numpy as np
-import pandas as pd
-from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import mean_absolute_error, r2_score
+import time
 import warnings
 
+from batch_engine import (
+    batch_scaled_regression, batch_trend, classify_trend, evaluate_products, fallback_recommendation, pack_histories
+)
+from columnar import PointColumns
+from date_utils import DAY, days_between, day_of_week, month_of, to_isoformat
+from deals import BASES as DEAL_BASES, DealIndex
+from features import FeatureFrame, preprocess_numpy
+from history_store import HistoryStore
+from incremental_trend import TrendStateStore, VersionConflict
+from instrumentation import ServiceMetrics
+from lazy_imports import LazyModule
+from microbatch import MicroBatcher
+from parallel import BATCH_EXECUTION, EXECUTION_MODES, run_chunked
+from precompute import PrecomputeScheduler
+from price_sketch import DEFAULT_K
+from price_store import PriceStore
+from profiling import RequestProfiler
+from result_cache import ResultCache, make_cache_key
+from seasonality import detect_cycles
+from shared_catalog import SharedCatalog
+from wire_format import ContentNegotiation
+
+# Heavy dependencies are imported on first use (or by warmup()) so the service
+# starts and answers /health without them
+pd = LazyModule('pandas')
+linear_model = LazyModule('sklearn.linear_model')
+preprocessing = LazyModule('sklearn.preprocessing')
+metrics = LazyModule('sklearn.metrics')
+
 # Suppress sklearn warnings
 warnings.filterwarnings('ignore')
 
@@ -20,15 +48,55 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app, origins=['http://localhost:3000', 'http://localhost:3001'])
 
+# Per-stage and per-endpoint latency histograms, served on GET /metrics
+service_metrics = ServiceMetrics()
+service_metrics.instrument(app)
+
+# Opt-in cProfile of sampled or X-Profile requests; no hooks unless enabled
+RequestProfiler.from_env().instrument(app)
+
+# gzip request bodies; columnar and MessagePack bodies chosen by Content-Type/Accept
+ContentNegotiation.from_env().instrument(app)
+
+# Longest forecast horizon /predict accepts
+MAX_DAYS_AHEAD = 3650
+
+# Most products one /deals query returns
+MAX_DEALS = 1000
+
+# Products evaluated together per vectorized step of the streaming batch endpoint
+STREAM_CHUNK_SIZE = int(os.environ.get('STREAM_CHUNK_SIZE', 64))
+
+# Result of fitting the forecast model to one price history. Each request gets
+# its own instance, so the shared engine never holds per-request state.
+ForecastFit = namedtuple('ForecastFit', ['feature_mean', 'feature_scale', 'coefficients', 'intercept'])
+
+FORECAST_FEATURES = ['days_since_start', 'day_of_week', 'month', 'price_ma_7']
+
+# 'numpy' computes features lazily as stages request them, 'pandas' builds
+# every feature into a DataFrame up front
+PREPROCESS_ENGINES = ('pandas', 'numpy')
+PREPROCESS_ENGINE = os.environ.get('PREPROCESS_ENGINE', 'numpy')
+
 class PricePredictionEngine:
-    def __init__(self):
-        self.scaler = StandardScaler()
-        self.model = LinearRegression()
-        
-    def preprocess_data(self, price_history):
+    """Stateless prediction pipeline; safe to share across request threads"""
+    
+    @service_metrics.timed('preprocess')
+    def preprocess_data(self, price_history, engine=None):
+        """Prepare features with the requested preprocessing engine"""
+        engine = engine or PREPROCESS_ENGINE
+        if engine == 'numpy':
+            try:
+                return preprocess_numpy(price_history)
+            except Exception as e:
+                logger.error(f"Error preprocessing data: {str(e)}")
+                raise
+        return self._preprocess_pandas(price_history)
+    
+    def _preprocess_pandas(self, price_history):
         """Convert price history to DataFrame and prepare features"""
         try:
-            df = pd.DataFrame(price_history)
+            df = pd.DataFrame(list(price_history))
             df['date'] = pd.to_datetime(df['date'])
             df = df.sort_values('date').reset_index(drop=True)
             
@@ -52,45 +120,62 @@ class PricePredictionEngine:
             logger.error(f"Error preprocessing data: {str(e)}")
             raise
     
-    def detect_seasonality(self, df):
-        """Detect seasonal patterns in price data"""
+    @service_metrics.timed('seasonality')
+    def detect_seasonality(self, df, cycles=None):
+        """Detect seasonal patterns in price data; ``cycles`` can come precomputed from detect_cycles"""
         try:
             if len(df) < 12:  # Not enough data for seasonal analysis
                 return None
             
+            # Weekly/monthly/yearly cycles from the periodogram
+            if cycles is None:
+                cycles = self.detect_cycles([df])[0]
+            
             # Group by month and calculate average prices
-            monthly_avg = df.groupby('month')['price'].mean()
+            months, month_index = np.unique(self._column(df, 'month'), return_inverse=True)
+            prices = self._column(df, 'price')
+            monthly_avg = np.bincount(month_index, prices) / np.bincount(month_index)
             
             # Simple seasonality detection based on coefficient of variation
-            cv = monthly_avg.std() / monthly_avg.mean()
+            cv = monthly_avg.std(ddof=1) / monthly_avg.mean()
             
             if cv > 0.1:  # Threshold for seasonal variation
-                best_months = monthly_avg.nsmallest(3).index.tolist()
-                worst_months = monthly_avg.nlargest(3).index.tolist()
+                best_months = months[np.argsort(monthly_avg, kind='stable')[:3]].tolist()
+                worst_months = months[np.argsort(-monthly_avg, kind='stable')[:3]].tolist()
                 
                 return {
                     'has_seasonality': True,
                     'best_months': best_months,
                     'worst_months': worst_months,
-                    'variation_coefficient': round(cv, 3)
+                    'variation_coefficient': round(cv, 3),
+                    'cycles': cycles
                 }
             
-            return {'has_seasonality': False}
+            return {'has_seasonality': bool(cycles), 'cycles': cycles}
         except Exception as e:
             logger.warning(f"Seasonality detection failed: {str(e)}")
             return None
     
+    @service_metrics.timed('cycles')
+    def detect_cycles(self, frames):
+        """Periodogram cycles (period, strength, best buying phase) for many frames at once"""
+        return detect_cycles(
+            [(self._column(df, 'days_since_start').astype(float), self._column(df, 'price')) for df in frames],
+            [self._date_values(df)[0][-1] for df in frames]
+        )
+    
+    @service_metrics.timed('trend')
     def calculate_trend(self, df):
         """Calculate price trend using linear regression"""
         try:
-            X = df[['days_since_start']].values
-            y = df['price'].values
+            X = self._column(df, 'days_since_start').reshape(-1, 1)
+            y = self._column(df, 'price')
             
-            trend_model = LinearRegression()
+            trend_model = linear_model.LinearRegression()
             trend_model.fit(X, y)
             
             slope = trend_model.coef_[0]
-            r2 = r2_score(y, trend_model.predict(X))
+            r2 = metrics.r2_score(y, trend_model.predict(X))
             
             if slope > 0.1:
                 trend = 'increasing'
@@ -108,50 +193,102 @@ class PricePredictionEngine:
             logger.warning(f"Trend calculation failed: {str(e)}")
             return {'trend': 'stable', 'slope': 0, 'r2_score': 0}
     
-    def predict_future_prices(self, df, days_ahead=30):
+    @service_metrics.timed('batch_trend')
+    def calculate_trends(self, frames):
+        """calculate_trend for many frames with one vectorized least squares pass"""
+        packed = pack_histories([
+            (self._column(df, 'days_since_start').astype(float), self._column(df, 'price')) for df in frames
+        ])
+        slope, _, r2 = batch_trend(packed)
+        return [
+            {
+                'trend': classify_trend(slope[row]),
+                'slope': round(float(slope[row]), 4),
+                'r2_score': round(float(r2[row]), 3)
+            }
+            for row in range(len(frames))
+        ]
+    
+    def _column(self, df, name):
+        """Feature column as a NumPy array, whichever engine built the frame"""
+        return np.asarray(df[name])
+    
+    def _date_values(self, df):
+        """Date column as naive wall-clock datetime64 plus the UTC offset suffix it was given with"""
+        if isinstance(df, FeatureFrame):
+            return df['date'], df.utc_offset
+        dates = df['date']
+        if dates.dt.tz is None:
+            return dates.values.astype('datetime64[us]'), ''
+        return dates.dt.tz_localize(None).values.astype('datetime64[us]'), dates.iloc[-1].isoformat()[-6:]
+    
+    def build_future_features(self, df, days_ahead):
+        """Build the feature matrix and ISO dates for every day of the forecast horizon"""
+        dates, utc_offset = self._date_values(df)
+        future_dates = dates.max() + np.arange(1, days_ahead + 1) * DAY
+        
+        features = np.empty((days_ahead, 4))
+        features[:, 0] = days_between(future_dates, dates.min())
+        features[:, 1] = day_of_week(future_dates)
+        features[:, 2] = month_of(future_dates)
+        features[:, 3] = self._column(df, 'price')[-7:].mean()  # Use recent average
+        
+        return features, [date + utc_offset for date in to_isoformat(future_dates)]
+    
+    @service_metrics.timed('fit_forecast')
+    def fit_forecast_model(self, df):
+        """Fit the scaled linear forecast model and return it as a ForecastFit"""
+        X = np.column_stack([self._column(df, name) for name in FORECAST_FEATURES]).astype(float)
+        y = self._column(df, 'price')
+        
+        # Scale features
+        scaler = preprocessing.StandardScaler()
+        X_scaled = scaler.fit_transform(X)
+        
+        # Train model
+        model = linear_model.LinearRegression()
+        model.fit(X_scaled, y)
+        
+        return ForecastFit(scaler.mean_, scaler.scale_, model.coef_, model.intercept_)
+    
+    @service_metrics.timed('batch_fit_forecast')
+    def fit_forecast_models(self, frames):
+        """fit_forecast_model for many frames with one stacked least squares solve"""
+        features = [
+            np.column_stack([self._column(df, name) for name in FORECAST_FEATURES]).astype(float) for df in frames
+        ]
+        fits = batch_scaled_regression(features, [self._column(df, 'price') for df in frames])
+        return [ForecastFit(*(values[row] for values in fits)) for row in range(len(frames))]
+    
+    @service_metrics.timed('forecast')
+    def predict_future_prices(self, df, days_ahead=30, fit=None):
         """Predict future prices using machine learning"""
         try:
-            # Prepare features
-            feature_columns = ['days_since_start', 'day_of_week', 'month', 'price_ma_7']
-            X = df[feature_columns].values
-            y = df['price'].values
-            
-            # Scale features
-            X_scaled = self.scaler.fit_transform(X)
-            
-            # Train model
-            self.model.fit(X_scaled, y)
+            if fit is None:
+                fit = self.fit_forecast_model(df)
             
-            # Make predictions for future dates
-            last_date = df['date'].max()
-            future_dates = [last_date + timedelta(days=i) for i in range(1, days_ahead + 1)]
+            # Predict the whole horizon in a single call
+            future_features, future_dates = self.build_future_features(df, days_ahead)
+            future_scaled = (future_features - fit.feature_mean) / fit.feature_scale
+            predicted_prices = future_scaled @ fit.coefficients + fit.intercept
             
-            predictions = []
-            for future_date in future_dates:
-                days_since_start = (future_date - df['date'].min()).days
-                day_of_week = future_date.weekday()
-                month = future_date.month
-                price_ma_7 = df['price'].tail(7).mean()  # Use recent average
-                
-                future_features = np.array([[days_since_start, day_of_week, month, price_ma_7]])
-                future_features_scaled = self.scaler.transform(future_features)
-                
-                predicted_price = self.model.predict(future_features_scaled)[0]
-                predictions.append({
-                    'date': future_date.isoformat(),
+            return [
+                {
+                    'date': future_date,
                     'predicted_price': round(max(0, predicted_price), 2)  # Ensure non-negative
-                })
-            
-            return predictions
+                }
+                for future_date, predicted_price in zip(future_dates, predicted_prices.tolist())
+            ]
         except Exception as e:
             logger.error(f"Future price prediction failed: {str(e)}")
             return []
     
-    def analyze_best_buy_time(self, df, future_predictions, current_price):
-        """Determine the best time to buy based on predictions"""
+    @service_metrics.timed('buy_recommendation')
+    def analyze_best_buy_time(self, df, future_predictions, current_price, stats=None):
+        """Determine the best time to buy based on predictions, from a PriceSketch of the history if given"""
         try:
             if not future_predictions:
-                return self._fallback_recommendation(df, current_price)
+                return self._fallback_recommendation(df, current_price, stats)
             
             # Find the minimum predicted price in the next 30 days
             future_prices = [p['predicted_price'] for p in future_predictions]
@@ -163,8 +300,13 @@ class PricePredictionEngine:
             savings_percentage = ((current_price - min_future_price) / current_price) * 100
             
             # Determine confidence based on model performance and price stability
-            historical_prices = df['price'].values
-            price_volatility = np.std(historical_prices) / np.mean(historical_prices)
+            if stats is not None:
+                price_volatility = stats.std / stats.mean
+                lower_quartile = stats.quantile(0.25)
+            else:
+                historical_prices = self._column(df, 'price')
+                price_volatility = np.std(historical_prices) / np.mean(historical_prices)
+                lower_quartile = np.percentile(historical_prices, 25)
             
             if price_volatility < 0.1:
                 confidence = 0.8
@@ -182,7 +324,7 @@ class PricePredictionEngine:
             elif savings_percentage > 5:
                 recommendation = f"Consider waiting {days_to_wait} days for {savings_percentage:.1f}% savings"
                 best_buy_time = f"In {days_to_wait} days"
-            elif current_price <= np.percentile(historical_prices, 25):
+            elif current_price <= lower_quartile:
                 recommendation = "Good time to buy! Current price is in the lower 25% of historical range"
                 best_buy_time = "Now"
                 confidence = min(confidence + 0.1, 0.9)
@@ -200,104 +342,331 @@ class PricePredictionEngine:
             }
         except Exception as e:
             logger.error(f"Best buy time analysis failed: {str(e)}")
-            return self._fallback_recommendation(df, current_price)
+            return self._fallback_recommendation(df, current_price, stats)
     
-    def _fallback_recommendation(self, df, current_price):
+    def _fallback_recommendation(self, df, current_price, stats=None):
         """Fallback recommendation when ML prediction fails"""
-        historical_prices = df['price'].values
-        avg_price = np.mean(historical_prices)
-        min_price = np.min(historical_prices)
-        
-        if current_price <= min_price * 1.1:
-            return {
-                'best_buy_time': 'Now',
-                'confidence': 0.7,
-                'expected_price': current_price,
-                'savings_percentage': 0,
-                'recommendation': 'Good time to buy! Price is near historical low',
-                'days_to_wait': 0
-            }
-        elif current_price <= avg_price:
-            return {
-                'best_buy_time': 'Within 1 week',
-                'confidence': 0.6,
-                'expected_price': current_price * 0.98,
-                'savings_percentage': 2,
-                'recommendation': 'Decent time to buy. Price is below average',
-                'days_to_wait': 3
-            }
-        else:
-            return {
-                'best_buy_time': 'Wait 2-4 weeks',
-                'confidence': 0.5,
-                'expected_price': avg_price,
-                'savings_percentage': ((current_price - avg_price) / current_price) * 100,
-                'recommendation': 'Consider waiting. Price is above average',
-                'days_to_wait': 14
-            }
+        if stats is not None:
+            return fallback_recommendation(stats.mean, stats.min, current_price)
+        historical_prices = self._column(df, 'price')
+        return fallback_recommendation(np.mean(historical_prices), np.min(historical_prices), current_price)
 
 # Initialize prediction engine
 predictor = PricePredictionEngine()
 
+# Results keyed by a content hash of the request inputs
+prediction_cache = ResultCache.from_env()
+
+# Running trend statistics for clients that send append-only deltas
+trend_states = TrendStateStore.from_env()
+
+def open_price_store(path=None):
+    """Memory-map the columnar price store named by PRICE_STORE_DIR, if any"""
+    path = path or os.environ.get('PRICE_STORE_DIR')
+    if not path:
+        return None
+    try:
+        store = PriceStore(path)
+        logger.info(f"Opened price store {path} with {len(store)} products")
+        return store
+    except (OSError, ValueError) as e:
+        logger.error(f"Could not open price store {path}: {str(e)}")
+        return None
+
+price_store = open_price_store()
+
+CATALOG_PATHS = os.environ['CATALOG_PATHS'].split(os.pathsep) if os.environ.get('CATALOG_PATHS') else []
+
+DEALS_PERCENTILE = float(os.environ.get('DEALS_PERCENTILE', 50))
+DEALS_WINDOW_DAYS = int(os.environ.get('DEALS_WINDOW_DAYS', 30))
+
+def open_shared_catalog(path=None):
+    """Map the shared catalog in SHARED_CATALOG_DIR, if any, first rebuilding it if CATALOG_PATHS changed"""
+    path = path or os.environ.get('SHARED_CATALOG_DIR')
+    if not path:
+        return None
+    try:
+        # Published generations carry this process's /deals columns, which workers map
+        catalog = SharedCatalog(
+            path, float(os.environ.get('SHARED_CATALOG_POLL', 1)), (DEALS_PERCENTILE, DEALS_WINDOW_DAYS)
+        )
+        if CATALOG_PATHS:
+            catalog.load(CATALOG_PATHS)
+        return catalog
+    except (OSError, ValueError) as e:
+        logger.error(f"Could not open shared catalog {path}: {str(e)}")
+        return None
+
+# With SHARED_CATALOG_DIR set the catalog is mapped from files every worker
+# shares; otherwise each process loads CATALOG_PATHS into its own memory
+shared_catalog = open_shared_catalog()
+
+# Histories /predict can resolve by product_id: /ingest, catalog files, price store
+history_store = HistoryStore(
+    price_store, int(os.environ.get('PRICE_SKETCH_K', DEFAULT_K)), shared_catalog,
+    int(os.environ.get('STORE_SKETCH_CACHE_SIZE', 1024))
+)
+
+# Per-product discount statistics for GET /deals, updated on every history change
+deal_index = DealIndex(DEALS_PERCENTILE, DEALS_WINDOW_DAYS)
+if price_store is not None:
+    deal_index.load_price_store(price_store)
+if shared_catalog is not None:
+    if shared_catalog.current() is not None:
+        deal_index.load_catalog(shared_catalog.current(), wait=True)
+    # New generations are indexed on a background thread and swapped in
+    shared_catalog.add_listener(deal_index.load_catalog)
+history_store.add_listener(deal_index.update)
+
+if CATALOG_PATHS and shared_catalog is None:
+    history_store.load_catalog(CATALOG_PATHS)
+
+def run_analysis(price_history, current_price, analysis_type='full', days_ahead=30, engine=None):
+    """Run the prediction pipeline for one price history"""
+    # Preprocess data
+    df = predictor.preprocess_data(price_history, engine)
+    return analyze_frame(df, current_price, analysis_type, days_ahead)
+
+def analyze_frame(df, current_price, analysis_type='full', days_ahead=30, trend=None, fit=None, cycles=None, stats=None):
+    """Run the analysis stages on a preprocessed frame.
+    
+    A precomputed trend, forecast fit or cycles are reused if given; ``stats``
+    is a PriceSketch of the frame's prices that replaces rescanning them.
+    """
+    # Perform analysis based on type
+    result = {}
+    
+    if analysis_type in ['trend', 'full']:
+        trend_analysis = trend or predictor.calculate_trend(df)
+        result.update(trend_analysis)
+    
+    if analysis_type in ['seasonal', 'full']:
+        seasonality = predictor.detect_seasonality(df, cycles)
+        if seasonality:
+            result['seasonality'] = seasonality
+    
+    if analysis_type == 'full':
+        # Full analysis with price prediction
+        future_predictions = predictor.predict_future_prices(df, days_ahead, fit)
+        buy_analysis = predictor.analyze_best_buy_time(df, future_predictions, current_price, stats)
+        
+        result.update(buy_analysis)
+        result['future_predictions'] = future_predictions[:7]  # Return first 7 days
+        if stats is not None:
+            result['volatility'] = round(stats.std / stats.mean, 3)
+        else:
+            result['volatility'] = round(np.std(df['price']) / np.mean(df['price']), 3)
+    
+    return result
+
+def analyze_frames(jobs):
+    """analyze_frame for a list of (df, current_price, analysis_type, days_ahead[, stats]) jobs.
+    
+    Trend lines, forecast models and seasonal cycles for the whole list are
+    computed in single vectorized passes; each job's result (or its
+    exception) is returned in order.
+    """
+    trends = [None] * len(jobs)
+    fits = [None] * len(jobs)
+    cycles = [None] * len(jobs)
+    trend_rows = [row for row, job in enumerate(jobs) if job[2] in ['trend', 'full'] and len(job[0]) >= 2]
+    fit_rows = [row for row, job in enumerate(jobs) if job[2] == 'full' and len(job[0]) >= 2]
+    cycle_rows = [row for row, job in enumerate(jobs) if job[2] in ['seasonal', 'full'] and len(job[0]) >= 12]
+    try:
+        if trend_rows:
+            for row, trend in zip(trend_rows, predictor.calculate_trends([jobs[row][0] for row in trend_rows])):
+                trends[row] = trend
+        if fit_rows:
+            for row, fit in zip(fit_rows, predictor.fit_forecast_models([jobs[row][0] for row in fit_rows])):
+                fits[row] = fit
+        if cycle_rows:
+            for row, found in zip(cycle_rows, predictor.detect_cycles([jobs[row][0] for row in cycle_rows])):
+                cycles[row] = found
+    except Exception as e:
+        # Every job still gets its own per-frame fit below
+        logger.warning(f"Batched model fitting failed: {str(e)}")
+    
+    results = []
+    for row, job in enumerate(jobs):
+        df, current_price, analysis_type, days_ahead = job[:4]
+        stats = job[4] if len(job) > 4 else None
+        try:
+            results.append(analyze_frame(df, current_price, analysis_type, days_ahead, trends[row], fits[row], cycles[row], stats))
+        except Exception as e:
+            results.append(e)
+    return results
+
+# Concurrent /predict calls are coalesced into analyze_frames batches when a
+# collection window is configured
+MICROBATCH_WINDOW_MS = float(os.environ.get('MICROBATCH_WINDOW_MS', 0))
+predict_batcher = MicroBatcher(
+    analyze_frames,
+    window=MICROBATCH_WINDOW_MS / 1000,
+    max_batch_size=int(os.environ.get('MICROBATCH_MAX_SIZE', 32))
+) if MICROBATCH_WINDOW_MS > 0 else None
+
+def precompute_chunk(histories):
+    """Full analysis of StoredHistory items at their last price; runs in worker processes too"""
+    jobs = [
+        (FeatureFrame({'date': history.dates, 'price': history.prices}, history.utc_offset),
+         float(history.prices[-1]), 'full', 30, history.sketch)
+        for history in histories
+    ]
+    return [
+        result if isinstance(result, Exception) else {'product_name': history.name, **result}
+        for history, result in zip(histories, analyze_frames(jobs))
+    ]
+
+def precompute_histories(histories):
+    return run_chunked(precompute_chunk, histories, os.environ.get('PRECOMPUTE_EXECUTION', BATCH_EXECUTION))
+
+# Stored products' results are recomputed in the background whenever their
+# history version changes and served by GET /precomputed/<product_id>
+PRECOMPUTE_INTERVAL = float(os.environ.get('PRECOMPUTE_INTERVAL', 0))
+precompute = PrecomputeScheduler(history_store, precompute_histories, PRECOMPUTE_INTERVAL) if PRECOMPUTE_INTERVAL > 0 else None
+if precompute is not None:
+    precompute.start()
+
+def warmup():
+    """Import heavy dependencies and run one prediction ahead of real traffic.
+    
+    Call it in the parent process before forking workers (gunicorn --preload
+    with ML_WARMUP=true) so imported modules live in copy-on-write pages
+    shared by every worker.
+    """
+    started = time.perf_counter()
+    for module in (pd, linear_model, preprocessing, metrics):
+        module.load()
+    
+    start = np.datetime64('2024-01-01T00:00:00')
+    history = [
+        {'date': str(start + np.timedelta64(day, 'D')), 'price': 100.0 + (day % 7)}
+        for day in range(30)
+    ]
+    for engine in PREPROCESS_ENGINES:
+        run_analysis(history, 100.0, 'full', 30, engine)
+    
+    logger.info(f"Warmup completed in {time.perf_counter() - started:.2f}s")
+
+if os.environ.get('ML_WARMUP', 'false').lower() == 'true':
+    warmup()
+
+@service_metrics.registry.collector
+def store_gauges():
+    """Result cache and micro-batch counters and store sizes, read when /metrics is scraped"""
+    cache = prediction_cache.stats()
+    batcher = predict_batcher.stats() if predict_batcher is not None else None
+    return [
+        ('ml_prediction_cache_entries', 'gauge', 'Entries in the /predict result cache', cache['size']),
+        ('ml_prediction_cache_hits_total', 'counter', 'Result cache hits', cache['hits']),
+        ('ml_prediction_cache_misses_total', 'counter', 'Result cache misses', cache['misses']),
+        ('ml_prediction_cache_evictions_total', 'counter', 'Result cache LRU evictions', cache['evictions']),
+        ('ml_price_store_products', 'gauge', 'Products in the memory-mapped price store', len(price_store) if price_store is not None else 0),
+        ('ml_stored_histories', 'gauge', 'Histories held for by-reference predictions', len(history_store)),
+        ('ml_deal_index_products', 'gauge', 'Products indexed for /deals', len(deal_index)),
+        ('ml_trend_states', 'gauge', 'Products with incremental trend state in this process', len(trend_states)),
+        ('ml_shared_catalog_generation', 'gauge', 'Shared catalog generation mapped by this process',
+         shared_catalog.stats()['generation'] or 0 if shared_catalog is not None else 0),
+        ('ml_precomputed_products', 'gauge', 'Products with a precomputed result', len(precompute.table) if precompute is not None else 0)
+    ] + ([
+        ('ml_microbatch_batches_total', 'counter', 'Coalesced /predict batches', batcher['batches']),
+        ('ml_microbatch_items_total', 'counter', 'Requests computed in coalesced batches', batcher['items']),
+        ('ml_microbatch_deduplicated_total', 'counter', 'Requests served by an identical in-flight request', batcher['deduplicated'])
+    ] if batcher else [])
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({
         'status': 'OK',
         'message': 'ShopSmart ML Service is running',
-        'timestamp': datetime.now().isoformat()
+        'timestamp': datetime.now().isoformat(),
+        'cache': prediction_cache.stats(),
+        'price_store_products': len(price_store) if price_store is not None else 0,
+        'stored_histories': len(history_store),
+        'deals': deal_index.stats(),
+        'trend_states': trend_states.stats(),
+        'shared_catalog': shared_catalog.stats() if shared_catalog is not None else None,
+        'microbatch': predict_batcher.stats() if predict_batcher is not None else None,
+        'precompute': precompute.stats() if precompute is not None else None
     }), 200
 
 @app.route('/predict', methods=['POST'])
 def predict_price():
     """Main prediction endpoint"""
     try:
-        data = request.get_json()
-        
-        # Validate input
-        required_fields = ['product_name', 'price_history', 'current_price']
-        for field in required_fields:
-            if field not in data:
-                return jsonify({'error': f'Missing required field: {field}'}), 400
+        with service_metrics.stage('parse_request'):
+            data = request.get_json()
         
-        price_history = data['price_history']
-        current_price = data['current_price']
-        product_name = data['product_name']
         analysis_type = data.get('analysis_type', 'full')
+        days_ahead = data.get('days_ahead', 30)
+        engine = data.get('preprocess_engine', PREPROCESS_ENGINE)
         
-        if len(price_history) < 5:
+        if engine not in PREPROCESS_ENGINES:
             return jsonify({
-                'error': 'Insufficient price history. Minimum 5 data points required'
+                'error': f"preprocess_engine must be one of: {', '.join(PREPROCESS_ENGINES)}"
             }), 400
         
-        logger.info(f"Processing prediction for {product_name} with {len(price_history)} data points")
+        if not isinstance(days_ahead, int) or not 1 <= days_ahead <= MAX_DAYS_AHEAD:
+            return jsonify({
+                'error': f'days_ahead must be an integer between 1 and {MAX_DAYS_AHEAD}'
+            }), 400
         
-        # Preprocess data
-        df = predictor.preprocess_data(price_history)
+        if 'price_history' not in data and 'product_id' in data:
+            # By reference: the history comes from the local store
+            stored = history_store.get(str(data['product_id']))
+            if stored is None:
+                return jsonify({'error': f"Unknown product_id: {data['product_id']}"}), 404
+            
+            current_price = data.get('current_price', float(stored.prices[-1]))
+            product_name = data.get('product_name', stored.name)
+            data_points = len(stored.prices)
+            cache_key = make_cache_key(stored.product_id, stored.version, current_price, analysis_type, days_ahead)
+        else:
+            # Validate input
+            required_fields = ['product_name', 'price_history', 'current_price']
+            for field in required_fields:
+                if field not in data:
+                    return jsonify({'error': f'Missing required field: {field}'}), 400
+            
+            stored = None
+            price_history = data['price_history']
+            current_price = data['current_price']
+            product_name = data['product_name']
+            data_points = len(price_history)
+            cache_key = make_cache_key(price_history, current_price, analysis_type, days_ahead, engine)
         
-        # Perform analysis based on type
-        result = {'product_name': product_name}
+        if data_points < 5:
+            return jsonify({
+                'error': 'Insufficient price history. Minimum 5 data points required'
+            }), 400
         
-        if analysis_type in ['trend', 'full']:
-            trend_analysis = predictor.calculate_trend(df)
-            result.update(trend_analysis)
+        service_metrics.observe_history(data_points)
+        logger.info(f"Processing prediction for {product_name} with {data_points} data points")
         
-        if analysis_type in ['seasonal', 'full']:
-            seasonality = predictor.detect_seasonality(df)
-            if seasonality:
-                result['seasonality'] = seasonality
+        # Identical inputs are served from the result cache
+        analysis = prediction_cache.get(cache_key)
+        if analysis is None:
+            if stored is not None:
+                df = FeatureFrame({'date': stored.dates, 'price': stored.prices}, stored.utc_offset)
+                stats = stored.sketch
+            else:
+                df = predictor.preprocess_data(price_history, engine)
+                stats = None
+            if predict_batcher is not None:
+                # Identical in-flight requests share one computation
+                job = (df, current_price, analysis_type, days_ahead, stats)
+                analysis = predict_batcher.submit(cache_key, job).result()
+            else:
+                analysis = analyze_frame(df, current_price, analysis_type, days_ahead, stats=stats)
+            prediction_cache.set(cache_key, analysis)
         
-        if analysis_type == 'full':
-            # Full analysis with price prediction
-            future_predictions = predictor.predict_future_prices(df)
-            buy_analysis = predictor.analyze_best_buy_time(df, future_predictions, current_price)
-            
-            result.update(buy_analysis)
-            result['future_predictions'] = future_predictions[:7]  # Return first 7 days
-            result['volatility'] = round(np.std(df['price']) / np.mean(df['price']), 3)
+        result = {'product_name': product_name, **analysis}
         
         logger.info(f"Prediction completed for {product_name}")
-        return jsonify(result), 200
+        with service_metrics.stage('encode_response'):
+            response = jsonify(result)
+        return response, 200
         
     except Exception as e:
         logger.error(f"Prediction error: {str(e)}")
@@ -310,51 +679,260 @@ def predict_price():
 def batch_predict():
     """Batch prediction endpoint for multiple products"""
     try:
-        data = request.get_json()
+        with service_metrics.stage('parse_request'):
+            data = request.get_json()
         products = data.get('products', [])
         
-        if not products or len(products) > 10:
+        if not products:
             return jsonify({
-                'error': 'Products array must contain 1-10 items'
+                'error': 'Products array must contain at least 1 item'
             }), 400
         
-        results = []
+        execution = data.get('execution', BATCH_EXECUTION)
+        if execution not in EXECUTION_MODES:
+            return jsonify({'error': f"execution must be one of: {', '.join(EXECUTION_MODES)}"}), 400
+        
+        # Products are evaluated by the vectorized batch engine, in chunks
+        # spread over the worker pool for large process-mode batches
+        with service_metrics.stage('batch_evaluate'):
+            outcomes = run_chunked(evaluate_products, products, execution)
+        results = [payload for ok, payload in outcomes if ok]
+        errors = [payload for ok, payload in outcomes if not ok]
+        
+        if service_metrics.enabled:
+            for product in products:
+                if isinstance(product, dict) and isinstance(product.get('price_history'), (list, PointColumns)):
+                    service_metrics.observe_history(len(product['price_history']))
+        
+        logger.info(f"Batch prediction processed {len(results)} products ({len(errors)} errors)")
+        
+        with service_metrics.stage('encode_response'):
+            response = jsonify({
+                'results': results,
+                'errors': errors,
+                'total_processed': len(results),
+                'total_errors': len(errors)
+            })
+        return response, 200
+        
+    except Exception as e:
+        logger.error(f"Batch prediction error: {str(e)}")
+        return jsonify({
+            'error': 'Internal server error during batch prediction',
+            'details': str(e)
+        }), 500
+
+def _ndjson_chunks(lines, chunk_size):
+    """Parse NDJSON lines into chunks of (line_number, product or parse error)"""
+    chunk = []
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            chunk.append((line_number, json.loads(line), None))
+        except ValueError as e:
+            chunk.append((line_number, None, f'Invalid JSON: {str(e)}'))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+@app.route('/batch-predict/stream', methods=['POST'])
+def batch_predict_stream():
+    """Streaming batch prediction: one NDJSON product per line in, one result per line out"""
+    chunk_size = request.args.get('chunk_size', STREAM_CHUNK_SIZE, type=int)
+    if not 1 <= chunk_size <= 1000:
+        return jsonify({'error': 'chunk_size must be between 1 and 1000'}), 400
+    
+    def generate():
+        processed = 0
+        for chunk in _ndjson_chunks(request.stream, chunk_size):
+            products = [product for _, product, parse_error in chunk if parse_error is None]
+            outcomes = iter(evaluate_products(products))
+            
+            for line_number, _, parse_error in chunk:
+                if parse_error is not None:
+                    record = {'line': line_number, 'product_id': None, 'error': parse_error}
+                else:
+                    ok, record = next(outcomes)
+                    if not ok:
+                        record = {'line': line_number, **record}
+                processed += 1
+                yield json.dumps(record) + '\n'
+        
+        logger.info(f"Streamed batch predictions for {processed} products")
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/ingest', methods=['POST'])
+def ingest_histories():
+    """Store product price histories for by-reference predictions"""
+    try:
+        data = request.get_json()
+        products = data.get('products', []) if data else []
+        
+        if not products:
+            return jsonify({'error': 'Products array must contain at least 1 item'}), 400
+        
+        versions = {}
         errors = []
         
-        for product_data in products:
+        for product in products:
             try:
-                # Process individual product prediction
-                df = predictor.preprocess_data(product_data['price_history'])
-                trend_analysis = predictor.calculate_trend(df)
-                buy_analysis = predictor.analyze_best_buy_time(
-                    df, [], product_data['current_price']
+                product_id = str(product['product_id'])
+                stored = history_store.put(
+                    product_id,
+                    product['price_history'],
+                    name=product.get('product_name'),
+                    append=bool(product.get('append', False)),
+                    category=product.get('category'),
+                    brand=product.get('brand')
                 )
-                
-                result = {
-                    'product_id': product_data.get('product_id'),
-                    'product_name': product_data['product_name'],
-                    **trend_analysis,
-                    **buy_analysis
-                }
-                results.append(result)
-                
+                versions[product_id] = stored.version
             except Exception as e:
                 errors.append({
-                    'product_id': product_data.get('product_id'),
+                    'product_id': product.get('product_id') if isinstance(product, dict) else None,
                     'error': str(e)
                 })
         
+        if versions and precompute is not None:
+            precompute.notify()
+        
         return jsonify({
-            'results': results,
+            'versions': versions,
             'errors': errors,
-            'total_processed': len(results),
+            'total_ingested': len(versions),
             'total_errors': len(errors)
         }), 200
         
     except Exception as e:
-        logger.error(f"Batch prediction error: {str(e)}")
+        logger.error(f"Ingest error: {str(e)}")
         return jsonify({
-            'error': 'Internal server error during batch prediction',
+            'error': 'Internal server error during ingest',
+            'details': str(e)
+        }), 500
+
+@app.route('/catalog/reload', methods=['POST'])
+def reload_catalog():
+    """Publish CATALOG_PATHS as a new shared catalog generation; every worker switches to it"""
+    if shared_catalog is None:
+        return jsonify({'error': 'Shared catalog is disabled (set SHARED_CATALOG_DIR)'}), 404
+    
+    if not CATALOG_PATHS:
+        return jsonify({'error': 'No catalog files to load (set CATALOG_PATHS)'}), 400
+    
+    try:
+        data = request.get_json(silent=True) or {}
+        previous = shared_catalog.stats()['generation']
+        # Unchanged files keep the current generation unless forced
+        generation = shared_catalog.load(CATALOG_PATHS, force=bool(data.get('force', False)))
+        
+        if precompute is not None and generation.number != previous:
+            precompute.notify()
+        
+        return jsonify({'reloaded': generation.number != previous, **shared_catalog.stats()}), 200
+        
+    except Exception as e:
+        logger.error(f"Catalog reload error: {str(e)}")
+        return jsonify({
+            'error': 'Internal server error during catalog reload',
+            'details': str(e)
+        }), 500
+
+@app.route('/precomputed/<product_id>', methods=['GET'])
+def precomputed_result(product_id):
+    """Serve a product's precomputed full analysis"""
+    if precompute is None:
+        return jsonify({'error': 'Precomputation is disabled (set PRECOMPUTE_INTERVAL)'}), 404
+    
+    body = precompute.lookup(product_id)
+    if body is None:
+        return jsonify({'error': f'No precomputed result for product_id: {product_id}'}), 404
+    return Response(body, mimetype='application/json')
+
+@app.route('/deals', methods=['GET'])
+def best_deals():
+    """Top-k stored products by current discount against their historical percentile or moving average"""
+    try:
+        basis = request.args.get('basis', 'percentile')
+        
+        # request.args.get(type=...) falls back to the default on bad input, so parse explicitly
+        try:
+            k = int(request.args.get('k', '10'))
+        except ValueError:
+            k = 0
+        if not 1 <= k <= MAX_DEALS:
+            return jsonify({'error': f'k must be an integer between 1 and {MAX_DEALS}'}), 400
+        
+        if basis not in DEAL_BASES:
+            return jsonify({'error': f"basis must be one of: {', '.join(DEAL_BASES)}"}), 400
+        
+        try:
+            min_discount = float(request.args.get('min_discount', '0'))
+        except ValueError:
+            min_discount = float('nan')
+        if not np.isfinite(min_discount):
+            return jsonify({'error': 'min_discount must be a number (percent)'}), 400
+        
+        if shared_catalog is not None:
+            # Picks up a newer catalog generation (indexed in the background) if one was published
+            shared_catalog.current()
+        
+        deals = deal_index.top(
+            k,
+            basis,
+            category=request.args.get('category'),
+            brand=request.args.get('brand'),
+            min_discount=min_discount / 100
+        )
+        return jsonify({
+            'deals': deals,
+            'basis': basis,
+            'indexed_products': len(deal_index),
+            'timestamp': datetime.now().isoformat()
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Deals query error: {str(e)}")
+        return jsonify({
+            'error': 'Internal server error during deals query',
+            'details': str(e)
+        }), 500
+
+@app.route('/trend/incremental', methods=['POST'])
+def incremental_trend():
+    """Update a product's trend with the price points added since a known version"""
+    try:
+        data = request.get_json()
+        
+        required_fields = ['product_id', 'since_version', 'points']
+        for field in required_fields:
+            if field not in data:
+                return jsonify({'error': f'Missing required field: {field}'}), 400
+        
+        since_version = data['since_version']
+        if not isinstance(since_version, int) or since_version < 0:
+            return jsonify({'error': 'since_version must be a non-negative integer'}), 400
+        
+        try:
+            summary = trend_states.apply(data['product_id'], since_version, data['points'])
+        except VersionConflict as e:
+            # The client must resend the points after current_version, or the
+            # full history with since_version=0
+            return jsonify({
+                'error': 'Version mismatch',
+                'current_version': e.current_version
+            }), 409
+        except (KeyError, ValueError, TypeError) as e:
+            return jsonify({'error': f'Invalid price points: {str(e)}'}), 400
+        
+        return jsonify({'product_id': data['product_id'], **summary}), 200
+        
+    except Exception as e:
+        logger.error(f"Incremental trend error: {str(e)}")
+        return jsonify({
+            'error': 'Internal server error during trend update',
             'details': str(e)
         }), 500
 
@@ -368,4 +946,6 @@ def internal_error(error):
 
 if __name__ == '__main__':
     logger.info("Starting ShopSmart ML Service")
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # The engine is stateless, so requests can be served from multiple threads
+    threaded = os.environ.get('ML_THREADED', 'true').lower() == 'true'
+    app.run(host='0.0.0.0', port=5000, debug=True, threaded=threaded)
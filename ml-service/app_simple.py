@@ -1,14 +1,22 @@
 import os
+import json
+import hashlib
 import logging
-from datetime import datetime, timedelta
-from flask import Flask, request, jsonify
+from datetime import datetime
+from functools import partial
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 import numpy as np
-import pandas as pd
-import random
-import math
 import warnings
 
+from columnar import PointColumns, point_arrays
+from date_utils import DAY, days_between, to_isoformat
+from instrumentation import ServiceMetrics
+from parallel import BATCH_EXECUTION, EXECUTION_MODES, run_chunked
+from profiling import RequestProfiler
+from result_cache import ResultCache, make_cache_key
+from wire_format import ContentNegotiation
+
 # Suppress warnings
 warnings.filterwarnings('ignore')
 
@@ -19,6 +27,16 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)
 
+# Per-stage and per-endpoint latency histograms, served on GET /metrics
+service_metrics = ServiceMetrics()
+service_metrics.instrument(app)
+
+# Opt-in cProfile of sampled or X-Profile requests; no hooks unless enabled
+RequestProfiler.from_env().instrument(app)
+
+# gzip request bodies; columnar and MessagePack bodies chosen by Content-Type/Accept
+ContentNegotiation.from_env().instrument(app)
+
 class SimplePricePredictionModel:
     """Simple price prediction model using basic statistical methods"""
     
@@ -58,6 +76,15 @@ class SimplePricePredictionModel:
             return np.std(prices) if len(prices) > 1 else 0
         return np.std(prices[-window:])
     
+    def forecast_seed(self, x_data, prices, timeframe_days):
+        """Seed derived from the request inputs, so identical requests get identical forecasts"""
+        digest = hashlib.blake2b(digest_size=8)
+        digest.update(np.ascontiguousarray(x_data, dtype=np.int64).tobytes())
+        digest.update(np.ascontiguousarray(prices, dtype=np.float64).tobytes())
+        digest.update(int(timeframe_days).to_bytes(4, 'little'))
+        return int.from_bytes(digest.digest(), 'little')
+    
+    @service_metrics.timed('forecast')
     def predict_price(self, price_history, timeframe_days=30):
         """Predict future prices using simple statistical methods"""
         try:
@@ -65,48 +92,42 @@ class SimplePricePredictionModel:
                 return [], 0.5
             
             # Convert to arrays
-            dates = [datetime.fromisoformat(item['date'].replace('Z', '+00:00')) for item in price_history]
-            prices = [float(item['price']) for item in price_history]
+            dates, prices, utc_offset = point_arrays(price_history)
             
             # Convert dates to numeric (days from first date)
             base_date = dates[0]
-            x_data = [(date - base_date).days for date in dates]
+            x_data = days_between(dates, base_date)
             
             # Simple linear regression
-            slope, intercept = self.simple_linear_regression(np.array(x_data), np.array(prices))
+            slope, intercept = self.simple_linear_regression(x_data, prices)
             
             # Calculate moving average and volatility for trend analysis
             ma_7 = self.calculate_moving_average(prices, 7)
             volatility = self.calculate_volatility(prices, 7)
             
-            # Generate future predictions
-            predictions = []
+            # Generate the whole forecast horizon at once
             current_price = prices[-1]
-            last_x = x_data[-1]
+            steps = np.arange(1, timeframe_days + 1)
+            future_x = x_data[-1] + steps
             
-            # Add some randomness based on volatility
-            for i in range(1, timeframe_days + 1):
-                future_x = last_x + i
-                
-                # Linear trend prediction
-                trend_price = slope * future_x + intercept
-                
-                # Add seasonal and noise components
-                seasonal_factor = 1 + 0.1 * math.sin(2 * math.pi * i / 30)  # Monthly seasonality
-                noise_factor = 1 + random.uniform(-volatility/current_price, volatility/current_price) * 0.1
-                
-                # Combine all factors
-                predicted_price = trend_price * seasonal_factor * noise_factor
-                
-                # Ensure price doesn't go negative or change too dramatically
-                predicted_price = max(predicted_price, current_price * 0.5)
-                predicted_price = min(predicted_price, current_price * 2.0)
-                
-                future_date = base_date + timedelta(days=future_x)
-                predictions.append({
-                    'date': future_date.isoformat(),
-                    'predicted_price': round(predicted_price, 2)
-                })
+            # Linear trend prediction
+            trend_price = slope * future_x + intercept
+            
+            # Add seasonal and noise components; the noise is drawn from a
+            # generator seeded by the inputs so results are reproducible
+            rng = np.random.default_rng(self.forecast_seed(x_data, prices, timeframe_days))
+            noise_bound = volatility / current_price
+            seasonal_factor = 1 + 0.1 * np.sin(2 * np.pi * steps / 30)  # Monthly seasonality
+            noise_factor = 1 + rng.uniform(-noise_bound, noise_bound, timeframe_days) * 0.1
+            
+            # Combine all factors, ensuring the price doesn't go negative or change too dramatically
+            predicted_prices = np.clip(trend_price * seasonal_factor * noise_factor, current_price * 0.5, current_price * 2.0)
+            
+            future_dates = to_isoformat(base_date + future_x * DAY)
+            predictions = [
+                {'date': future_date + utc_offset, 'predicted_price': round(predicted_price, 2)}
+                for future_date, predicted_price in zip(future_dates, predicted_prices.tolist())
+            ]
             
             # Calculate confidence based on data quality
             confidence = self.calculate_confidence(prices, volatility)
@@ -143,6 +164,73 @@ class SimplePricePredictionModel:
 # Global model instance
 model = SimplePricePredictionModel()
 
+# Results keyed by a content hash of the request inputs
+prediction_cache = ResultCache.from_env()
+
+@service_metrics.registry.collector
+def cache_gauges():
+    """Result cache counters, read when /metrics is scraped"""
+    cache = prediction_cache.stats()
+    return [
+        ('ml_prediction_cache_entries', 'gauge', 'Entries in the /predict result cache', cache['size']),
+        ('ml_prediction_cache_hits_total', 'counter', 'Result cache hits', cache['hits']),
+        ('ml_prediction_cache_misses_total', 'counter', 'Result cache misses', cache['misses']),
+        ('ml_prediction_cache_evictions_total', 'counter', 'Result cache LRU evictions', cache['evictions'])
+    ]
+
+# Forecast horizon in days for each supported timeframe
+TIMEFRAME_DAYS = {
+    '1m': 30,
+    '3m': 90,
+    '6m': 180,
+    '1y': 365
+}
+
+def predict_batch_product(product, days):
+    """Prediction summary for one product of a batch request"""
+    product_id = product.get('product_id')
+    price_history = product.get('price_history', [])
+    
+    if not product_id or not price_history:
+        return {
+            'product_id': product_id,
+            'error': 'Missing product_id or price_history'
+        }
+    
+    # Generate predictions
+    predictions, confidence = model.predict_price(price_history, days)
+    
+    # Determine trend
+    if len(predictions) >= 2:
+        start_price = predictions[0]['predicted_price']
+        end_price = predictions[-1]['predicted_price']
+        if end_price > start_price * 1.05:
+            trend = 'increasing'
+        elif end_price < start_price * 0.95:
+            trend = 'decreasing'
+        else:
+            trend = 'stable'
+    else:
+        trend = 'stable'
+    
+    return {
+        'product_id': product_id,
+        'predictions': predictions[:min(10, len(predictions))],  # Limit for batch
+        'confidence': confidence,
+        'trend': trend
+    }
+
+def predict_batch_chunk(products, days):
+    """Batch predictions for a chunk of products; runs in worker processes too"""
+    results = []
+    for product in products:
+        try:
+            results.append(predict_batch_product(product, days))
+        except Exception as e:
+            product_id = product.get('product_id') if isinstance(product, dict) else None
+            results.append({'product_id': product_id, 'error': str(e)})
+    return results
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -150,7 +238,8 @@ def health_check():
         'status': 'healthy',
         'service': 'ShopSmart ML Service',
         'version': '1.0.0',
-        'timestamp': datetime.now().isoformat()
+        'timestamp': datetime.now().isoformat(),
+        'cache': prediction_cache.stats()
     })
 
 @app.route('/predict', methods=['POST'])
@@ -173,39 +262,43 @@ def predict_single_product():
             return jsonify({'error': 'Price history is required'}), 400
         
         # Convert timeframe to days
-        timeframe_map = {
-            '1m': 30,
-            '3m': 90,
-            '6m': 180,
-            '1y': 365
-        }
-        
-        days = timeframe_map.get(timeframe, 30)
+        days = TIMEFRAME_DAYS.get(timeframe, 30)
         
-        # Generate predictions
-        predictions, confidence = model.predict_price(price_history, days)
+        # Identical histories are served from the result cache
+        cache_key = make_cache_key(price_history, timeframe)
+        cached = prediction_cache.get(cache_key)
         
-        # Determine trend
-        if len(predictions) >= 2:
-            start_price = predictions[0]['predicted_price']
-            end_price = predictions[-1]['predicted_price']
-            if end_price > start_price * 1.05:
-                trend = 'increasing'
-            elif end_price < start_price * 0.95:
-                trend = 'decreasing'
+        if cached is None:
+            # Generate predictions
+            predictions, confidence = model.predict_price(price_history, days)
+            
+            # Determine trend
+            if len(predictions) >= 2:
+                start_price = predictions[0]['predicted_price']
+                end_price = predictions[-1]['predicted_price']
+                if end_price > start_price * 1.05:
+                    trend = 'increasing'
+                elif end_price < start_price * 0.95:
+                    trend = 'decreasing'
+                else:
+                    trend = 'stable'
             else:
                 trend = 'stable'
-        else:
-            trend = 'stable'
+            
+            cached = {
+                'predictions': predictions[:min(30, len(predictions))],  # Limit to 30 predictions
+                'confidence': confidence,
+                'trend': trend
+            }
+            prediction_cache.set(cache_key, cached)
         
         response = {
             'product_id': product_id,
-            'predictions': predictions[:min(30, len(predictions))],  # Limit to 30 predictions
-            'confidence': confidence,
-            'trend': trend,
+            **cached,
             'timeframe': timeframe,
             'generated_at': datetime.now().isoformat()
         }
+        confidence = cached['confidence']
         
         logger.info(f"Generated prediction for product {product_id} with confidence {confidence}")
         
@@ -230,51 +323,14 @@ def predict_batch():
         if not products:
             return jsonify({'error': 'Products list is required'}), 400
         
-        results = []
+        execution = data.get('execution', BATCH_EXECUTION)
+        if execution not in EXECUTION_MODES:
+            return jsonify({'error': f"execution must be one of: {', '.join(EXECUTION_MODES)}"}), 400
         
-        for product in products:
-            product_id = product.get('product_id')
-            price_history = product.get('price_history', [])
-            
-            if not product_id or not price_history:
-                results.append({
-                    'product_id': product_id,
-                    'error': 'Missing product_id or price_history'
-                })
-                continue
-            
-            # Convert timeframe to days
-            timeframe_map = {
-                '1m': 30,
-                '3m': 90,
-                '6m': 180,
-                '1y': 365
-            }
-            
-            days = timeframe_map.get(timeframe, 30)
-            
-            # Generate predictions
-            predictions, confidence = model.predict_price(price_history, days)
-            
-            # Determine trend
-            if len(predictions) >= 2:
-                start_price = predictions[0]['predicted_price']
-                end_price = predictions[-1]['predicted_price']
-                if end_price > start_price * 1.05:
-                    trend = 'increasing'
-                elif end_price < start_price * 0.95:
-                    trend = 'decreasing'
-                else:
-                    trend = 'stable'
-            else:
-                trend = 'stable'
-            
-            results.append({
-                'product_id': product_id,
-                'predictions': predictions[:min(10, len(predictions))],  # Limit for batch
-                'confidence': confidence,
-                'trend': trend
-            })
+        # Convert timeframe to days
+        days = TIMEFRAME_DAYS.get(timeframe, 30)
+        
+        results = run_chunked(partial(predict_batch_chunk, days=days), products, execution)
         
         response = {
             'results': results,
@@ -291,6 +347,28 @@ def predict_batch():
         logger.error(f"Error in batch predict endpoint: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/predict/batch/stream', methods=['POST'])
+def predict_batch_stream():
+    """Streaming batch prediction: one NDJSON product per line in, one result per line out"""
+    timeframe = request.args.get('timeframe', '1m')
+    days = TIMEFRAME_DAYS.get(timeframe, 30)
+    
+    def generate():
+        processed = 0
+        for line_number, line in enumerate(request.stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                result = predict_batch_product(json.loads(line), days)
+            except Exception as e:
+                result = {'line': line_number, 'product_id': None, 'error': str(e)}
+            processed += 1
+            yield json.dumps(result) + '\n'
+        
+        logger.info(f"Streamed batch predictions for {processed} products")
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @app.route('/analyze/trend', methods=['POST'])
 def analyze_trend():
     """Analyze price trends for a product"""
@@ -305,7 +383,11 @@ def analyze_trend():
         if not price_history:
             return jsonify({'error': 'Price history is required'}), 400
         
-        prices = [float(item['price']) for item in price_history]
+        # Only prices are needed: dates are not parsed here
+        if isinstance(price_history, PointColumns):
+            prices = [float(price) for price in price_history.columns['price']]
+        else:
+            prices = [float(item['price']) for item in price_history]
         
         if len(prices) < 2:
             return jsonify({
@@ -365,6 +447,7 @@ if __name__ == '__main__':
     logger.info("  GET  /health - Health check")
     logger.info("  POST /predict - Single product prediction")
     logger.info("  POST /predict/batch - Batch prediction")
+    logger.info("  POST /predict/batch/stream - Streaming NDJSON batch prediction")
     logger.info("  POST /analyze/trend - Trend analysis")
     
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,249 @@
+"""Vectorized statistics for many price histories at once.
+
+Histories are packed into NaN-padded ``(products, max_length)`` matrices so that
+trend slopes, R², volatility and percentiles for the whole batch come out of a
+handful of array operations instead of one DataFrame + LinearRegression per
+product.
+
+Tolerance: slope, intercept and R² are the same ordinary least squares solution
+``PricePredictionEngine.calculate_trend`` gets from sklearn, computed with
+centered sums; they agree to ~1e-9 relative error, so after the 4 and 3 decimal
+rounding used in responses the values are identical except at exact rounding
+ties. Mean, min, volatility and percentiles match ``np.mean``, ``np.min``,
+``np.std`` and ``np.percentile`` (linear interpolation) to floating point
+precision.
+"""
+import numpy as np
+
+from columnar import point_arrays
+from date_utils import days_between
+
+PERCENTILES = (25, 50, 75)
+
+
+class PackedHistories:
+    """Price histories of a batch laid out as padded day/price matrices"""
+
+    def __init__(self, days, prices, lengths):
+        self.days = days
+        self.prices = prices
+        self.lengths = lengths
+        self.mask = np.arange(prices.shape[1]) < lengths[:, None]
+
+    def __len__(self):
+        return len(self.lengths)
+
+
+def history_to_arrays(price_history):
+    """Sort one price history by date and return (days_since_start, prices)"""
+    # Wall-clock dates: a uniform UTC offset does not change the elapsed days
+    dates, prices, _ = point_arrays(price_history)
+    order = np.argsort(dates, kind='stable')
+    dates = dates[order]
+    return days_between(dates, dates[0]).astype(float), prices[order]
+
+
+def pack_histories(histories):
+    """Pack a list of (days, prices) array pairs into a PackedHistories"""
+    lengths = np.array([len(prices) for _, prices in histories], dtype=np.int64)
+    width = int(lengths.max()) if len(lengths) else 0
+    days = np.full((len(histories), width), np.nan)
+    prices = np.full((len(histories), width), np.nan)
+    for row, (history_days, history_prices) in enumerate(histories):
+        days[row, :len(history_days)] = history_days
+        prices[row, :len(history_prices)] = history_prices
+    return PackedHistories(days, prices, lengths)
+
+
+def batch_trend(packed):
+    """Least squares slope, intercept and R² of price against days for every row"""
+    n = packed.lengths.astype(float)
+    x = np.where(packed.mask, packed.days, 0.0)
+    y = np.where(packed.mask, packed.prices, 0.0)
+
+    x_mean = x.sum(axis=1) / n
+    y_mean = y.sum(axis=1) / n
+    dx = np.where(packed.mask, x - x_mean[:, None], 0.0)
+    dy = np.where(packed.mask, y - y_mean[:, None], 0.0)
+
+    sxx = (dx * dx).sum(axis=1)
+    sxy = (dx * dy).sum(axis=1)
+    syy = (dy * dy).sum(axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where(sxx > 0, sxy / sxx, 0.0)
+    intercept = y_mean - slope * x_mean
+
+    residuals = np.where(packed.mask, y - (intercept[:, None] + slope[:, None] * x), 0.0)
+    ss_res = (residuals * residuals).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # sklearn's r2_score reports 1.0 for a perfect fit of a constant series
+        r2 = np.where(syy > 0, 1 - ss_res / syy, np.where(ss_res == 0, 1.0, 0.0))
+
+    return slope, intercept, r2
+
+
+def batch_scaled_regression(features, targets):
+    """StandardScaler + LinearRegression fits for many (X, y) pairs at once.
+
+    ``features`` is a list of ``(n_i, k)`` matrices and ``targets`` the matching
+    length-``n_i`` vectors. Returns ``(feature_mean, feature_scale,
+    coefficients, intercept)`` arrays with one row per pair, the values sklearn
+    reports as ``scaler.mean_``, ``scaler.scale_``, ``model.coef_`` and
+    ``model.intercept_``. Coefficients are the minimum-norm least squares
+    solution (like sklearn's lstsq), from one stacked pseudo-inverse; they agree
+    with sklearn to ~1e-9 relative error.
+    """
+    lengths = np.array([len(y) for y in targets], dtype=np.int64)
+    width = int(lengths.max())
+    k = features[0].shape[1]
+    X = np.zeros((len(features), width, k))
+    y = np.zeros((len(features), width))
+    for row, (x_rows, y_rows) in enumerate(zip(features, targets)):
+        X[row, :len(x_rows)] = x_rows
+        y[row, :len(y_rows)] = y_rows
+    mask = (np.arange(width) < lengths[:, None])[:, :, None]
+    n = lengths.astype(float)[:, None]
+
+    # Population mean and variance per product and feature, as StandardScaler
+    mean = X.sum(axis=1) / n
+    deviations = np.where(mask, X - mean[:, None, :], 0.0)
+    var = (deviations * deviations).sum(axis=1) / n
+    eps = np.finfo(np.float64).eps
+    constant = var <= n * eps * var + (n * mean * eps) ** 2
+    scale = np.where(constant, 1.0, np.sqrt(var))
+    X_scaled = np.where(mask, deviations / scale[:, None, :], 0.0)
+
+    # LinearRegression centers the (already near-centered) scaled features and y
+    X_offset = X_scaled.sum(axis=1) / n
+    y_offset = y.sum(axis=1) / n[:, 0]
+    X_centered = np.where(mask, X_scaled - X_offset[:, None, :], 0.0)
+    y_centered = np.where(mask[:, :, 0], y - y_offset[:, None], 0.0)
+
+    # Padding rows are all zero, so they do not change the solution
+    coefficients = np.einsum('bkn,bn->bk', np.linalg.pinv(X_centered), y_centered)
+    intercept = y_offset - np.einsum('bk,bk->b', X_offset, coefficients)
+    return mean, scale, coefficients, intercept
+
+
+def batch_statistics(packed, percentiles=PERCENTILES):
+    """Mean, min, max, volatility (std/mean) and percentiles for every row"""
+    n = packed.lengths.astype(float)
+    prices = np.where(packed.mask, packed.prices, 0.0)
+
+    mean = prices.sum(axis=1) / n
+    deviations = np.where(packed.mask, packed.prices - mean[:, None], 0.0)
+    std = np.sqrt((deviations * deviations).sum(axis=1) / n)
+
+    # NaN padding sorts to the end of each row, so the first `length` entries
+    # of every sorted row are that product's prices in ascending order
+    ordered = np.sort(packed.prices, axis=1)
+    last = packed.lengths - 1
+    stats = {
+        'mean': mean,
+        'std': std,
+        'min': ordered[:, 0],
+        'max': ordered[np.arange(len(packed)), last],
+        'volatility': std / mean,
+    }
+
+    for q in percentiles:
+        position = last * (q / 100.0)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.minimum(lower + 1, last)
+        low_values = np.take_along_axis(ordered, lower[:, None], axis=1)[:, 0]
+        high_values = np.take_along_axis(ordered, upper[:, None], axis=1)[:, 0]
+        stats[f'p{q}'] = low_values + (high_values - low_values) * (position - lower)
+
+    return stats
+
+
+def classify_trend(slope):
+    """Map a price-per-day slope onto the increasing/decreasing/stable labels"""
+    if slope > 0.1:
+        return 'increasing'
+    elif slope < -0.1:
+        return 'decreasing'
+    return 'stable'
+
+
+def fallback_recommendation(avg_price, min_price, current_price):
+    """Rule-based recommendation from historical mean and minimum price"""
+    if current_price <= min_price * 1.1:
+        return {
+            'best_buy_time': 'Now',
+            'confidence': 0.7,
+            'expected_price': current_price,
+            'savings_percentage': 0,
+            'recommendation': 'Good time to buy! Price is near historical low',
+            'days_to_wait': 0
+        }
+    elif current_price <= avg_price:
+        return {
+            'best_buy_time': 'Within 1 week',
+            'confidence': 0.6,
+            'expected_price': current_price * 0.98,
+            'savings_percentage': 2,
+            'recommendation': 'Decent time to buy. Price is below average',
+            'days_to_wait': 3
+        }
+    else:
+        return {
+            'best_buy_time': 'Wait 2-4 weeks',
+            'confidence': 0.5,
+            'expected_price': avg_price,
+            'savings_percentage': ((current_price - avg_price) / current_price) * 100,
+            'recommendation': 'Consider waiting. Price is above average',
+            'days_to_wait': 14
+        }
+
+
+def evaluate_products(products):
+    """Trend and buy recommendation for a list of product payloads.
+
+    Returns one ``(ok, payload)`` pair per input product, in input order:
+    the result dict for valid products, or ``{'product_id', 'error'}``. Results
+    match calling ``calculate_trend`` and
+    ``analyze_best_buy_time(df, [], current_price)`` product by product.
+    """
+    outcomes = []
+    accepted = []
+    histories = []
+
+    for product_data in products:
+        try:
+            price_history = product_data['price_history']
+            current_price = product_data['current_price']
+            product_name = product_data['product_name']
+            if len(price_history) < 2:
+                raise ValueError('Insufficient price history. Minimum 2 data points required')
+            histories.append(history_to_arrays(price_history))
+            accepted.append((len(outcomes), product_data.get('product_id'), product_name, current_price))
+            outcomes.append(None)
+        except Exception as e:
+            outcomes.append((False, {
+                'product_id': product_data.get('product_id') if isinstance(product_data, dict) else None,
+                'error': str(e)
+            }))
+
+    if not accepted:
+        return outcomes
+
+    packed = pack_histories(histories)
+    slope, _, r2 = batch_trend(packed)
+    stats = batch_statistics(packed)
+
+    for row, (position, product_id, product_name, current_price) in enumerate(accepted):
+        outcomes[position] = (True, {
+            'product_id': product_id,
+            'product_name': product_name,
+            'trend': classify_trend(slope[row]),
+            'slope': round(float(slope[row]), 4),
+            'r2_score': round(float(r2[row]), 3),
+            **fallback_recommendation(float(stats['mean'][row]), float(stats['min'][row]), current_price),
+            'volatility': round(float(stats['volatility'][row]), 3),
+            'price_percentiles': {f'p{q}': round(float(stats[f'p{q}'][row]), 2) for q in PERCENTILES}
+        })
+
+    return outcomes
+
@@ -0,0 +1,95 @@
+"""Index build time and query latency of the /deals top-K engine.
+
+Writes a seeded random-walk catalog to a temporary price store, indexes it
+with DealIndex.load_price_store, then times top-K queries on both bases and
+a filtered query, and checks the results against a full sort. Finally times
+re-indexing single products after an append (the HistoryStore listener path).
+
+Usage (from ml-service/):
+    python benchmarks/bench_deals.py --products 1000000 --days 60 --k 10
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from deals import BASES, DealIndex, discounts  # noqa: E402
+from history_store import HistoryStore  # noqa: E402
+from price_store import EPOCH_DAY, PriceStore, PriceStoreWriter  # noqa: E402
+
+
+def write_store(path, products, days, seed, block_size=50000):
+    rng = np.random.default_rng(seed)
+    epoch_days = np.arange(days, dtype=np.int32) + int((np.datetime64('2024-01-01') - EPOCH_DAY).astype(int))
+    with PriceStoreWriter(path) as writer:
+        for start in range(0, products, block_size):
+            count = min(block_size, products - start)
+            prices = rng.uniform(20, 1500, (count, 1)) * np.exp(np.cumsum(rng.normal(0, 0.02, (count, days)), axis=1))
+            writer.add_block([f'p{index}' for index in range(start, start + count)], epoch_days, prices)
+
+
+def time_query(func, repeat=20):
+    """Best-of mean milliseconds per call"""
+    best = None
+    for _ in range(3):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            result = func()
+        elapsed = (time.perf_counter() - started) / repeat * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=1000000)
+    parser.add_argument('--days', type=int, default=60)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'store')
+        started = time.perf_counter()
+        write_store(path, args.products, args.days, args.seed)
+        print(f"Wrote {args.products} products x {args.days} days in {time.perf_counter() - started:.1f}s")
+
+        store = PriceStore(path)
+        index = DealIndex()
+        started = time.perf_counter()
+        index.load_price_store(store)
+        print(f"Indexed {len(index)} products in {time.perf_counter() - started:.2f}s")
+
+        for basis in BASES:
+            milliseconds, deals = time_query(lambda: index.top(args.k, basis))
+            current = index._columns['current'][:index.size]
+            expected = np.argsort(-discounts(current, index._columns[basis][:index.size]), kind='stable')[:args.k]
+            assert {deal['product_id'] for deal in deals} == {index.ids[row] for row in expected}, basis
+            print(f"top {args.k} by {basis:<15} {milliseconds:>7.2f} ms  deepest {deals[0]['discount_percentage']}%")
+
+        # Histories put through a HistoryStore carry categories and are re-indexed on every append
+        history_store = HistoryStore()
+        history_store.add_listener(index.update)
+        dates = [str(np.datetime64('2024-01-01') + np.timedelta64(day, 'D')) for day in range(args.days + 1)]
+        for product in range(1000):
+            history_store.put(
+                f'c{product}', [{'date': date, 'price': 100.0} for date in dates[:-1]],
+                category=f'category-{product % 10}'
+            )
+        started = time.perf_counter()
+        for product in range(1000):
+            history_store.put(f'c{product}', [{'date': dates[-1], 'price': 90.0}], append=True)
+        print(f"append + re-index {(time.perf_counter() - started) / 1000 * 1e6:.0f} us per product")
+
+        milliseconds, deals = time_query(lambda: index.top(args.k, category='category-3'))
+        assert len(deals) == min(args.k, 100) and all(deal['category'] == 'category-3' for deal in deals)
+        print(f"top {args.k} in one category   {milliseconds:>7.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
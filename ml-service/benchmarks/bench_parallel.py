@@ -0,0 +1,83 @@
+"""Scaling of process-pool batch execution from 1 to N worker processes.
+
+Generates a seeded catalog, then times the app_simple.py batch path
+(timeframe '1y', i.e. 365-day forecasts) and the app.py batch engine with
+pools of increasing size. Results are checked to come back in input order.
+
+Usage (from ml-service/):
+    python benchmarks/bench_parallel.py --products 2000 --days 365 --max-workers 8
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from functools import partial
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from app_simple import predict_batch_chunk  # noqa: E402
+from batch_engine import evaluate_products  # noqa: E402
+from parallel import run_chunked  # noqa: E402
+
+
+def generate_catalog(products, days, seed):
+    rng = np.random.default_rng(seed)
+    start = datetime(2024, 1, 1)
+    dates = [(start + timedelta(days=i)).isoformat() for i in range(days)]
+    catalog = []
+    for index in range(products):
+        prices = rng.uniform(20, 1500) * np.exp(np.cumsum(rng.normal(0, 0.02, days)))
+        history = [{'date': date, 'price': round(float(price), 2)} for date, price in zip(dates, prices)]
+        catalog.append({
+            'product_id': f'p{index}',
+            'product_name': f'Product {index}',
+            'price_history': history,
+            'current_price': history[-1]['price'],
+        })
+    return catalog
+
+
+def time_workers(chunk_func, catalog, workers):
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Start every worker before timing
+        list(pool.map(abs, range(workers)))
+        started = time.perf_counter()
+        results = run_chunked(chunk_func, catalog, 'process', pool=pool, workers=workers)
+        elapsed = time.perf_counter() - started
+    ids = [result[1]['product_id'] if isinstance(result, tuple) else result['product_id'] for result in results]
+    assert ids == [product['product_id'] for product in catalog], 'results out of order'
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    catalog = generate_catalog(args.products, args.days, args.seed)
+    workloads = {
+        'app_simple /predict/batch (1y)': partial(predict_batch_chunk, days=365),
+        'app /batch-predict engine': evaluate_products,
+    }
+    worker_counts = sorted({1, *[2 ** i for i in range(1, 8) if 2 ** i <= args.max_workers], args.max_workers})
+
+    print(f"{args.products} products x {args.days} days")
+    for name, chunk_func in workloads.items():
+        print(f"\n{name}")
+        print(f"{'workers':>8} {'seconds':>9} {'products/s':>11} {'speedup':>8}")
+        baseline = None
+        for workers in worker_counts:
+            elapsed = time_workers(chunk_func, catalog, workers)
+            baseline = baseline or elapsed
+            print(f"{workers:>8} {elapsed:>9.3f} {args.products / elapsed:>11.0f} {baseline / elapsed:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
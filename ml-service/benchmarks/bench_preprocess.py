@@ -0,0 +1,51 @@
+"""Per-call latency of the pandas and NumPy preprocessing engines.
+
+Usage (from ml-service/):
+    python benchmarks/bench_preprocess.py --lengths 30 90 365 1825
+"""
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from app import predictor  # noqa: E402
+
+
+def make_history(length, seed):
+    """Daily random-walk price history with backend-style ISO dates"""
+    rng = np.random.default_rng(seed)
+    prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, length)))
+    start = datetime(2024, 1, 1)
+    return [
+        {'date': (start + timedelta(days=i)).isoformat() + 'Z', 'price': round(float(price), 2)}
+        for i, price in enumerate(prices)
+    ]
+
+
+def time_per_call(func, repeat):
+    """Best-of-5 mean seconds per call"""
+    return min(timeit.repeat(func, number=repeat, repeat=5)) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lengths', type=int, nargs='+', default=[30, 90, 365, 1825])
+    parser.add_argument('--repeat', type=int, default=200, help='calls per timing sample')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"{'points':>8} {'pandas (us)':>12} {'numpy (us)':>12} {'speedup':>8}")
+    for length in args.lengths:
+        history = make_history(length, args.seed)
+        pandas_time = time_per_call(lambda: predictor.preprocess_data(history, 'pandas'), args.repeat)
+        numpy_time = time_per_call(lambda: predictor.preprocess_data(history, 'numpy'), args.repeat)
+        print(f"{length:>8} {pandas_time * 1e6:>12.1f} {numpy_time * 1e6:>12.1f} {pandas_time / numpy_time:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
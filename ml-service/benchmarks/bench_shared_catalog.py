@@ -0,0 +1,131 @@
+"""Node memory of N worker processes holding the catalog, per-process vs shared.
+
+Writes a seeded JSONL catalog, then for each worker count starts that many
+processes that either load it into their own HistoryStore (the default
+CATALOG_PATHS behaviour) or map one SharedCatalog generation built once by
+the parent (SHARED_CATALOG_DIR). Every worker reads every product's history,
+then reports its proportional set size (PSS, Linux only: shared pages are
+split between the processes mapping them), so the sum is the memory the
+workers cost the node. The catalog columns subtract the same number of
+workers that only import the modules. Workers are started with 'spawn', like
+independent server workers without --preload.
+
+The shared run also publishes a second generation while the workers are
+alive and checks that each of them switches to it.
+
+Usage (from ml-service/):
+    python benchmarks/bench_shared_catalog.py --products 20000 --days 365 --workers 1 2 4 8
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+
+def write_catalog(path, products, days, seed):
+    rng = np.random.default_rng(seed)
+    dates = [str(np.datetime64('2024-01-01') + np.timedelta64(day, 'D')) for day in range(days)]
+    with open(path, 'w') as f:
+        for index in range(products):
+            prices = rng.uniform(20, 1500) * np.exp(np.cumsum(rng.normal(0, 0.02, days)))
+            f.write(json.dumps({
+                '_id': f'p{index}',
+                'name': f'Product {index}',
+                'category': f'Category {index % 12}',
+                'priceHistory': [{'date': date, 'price': round(price, 2)} for date, price in zip(dates, prices.tolist())]
+            }) + '\n')
+
+
+def pss_kb():
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            if line.startswith('Pss:'):
+                return int(line.split()[1])
+    return 0
+
+
+def worker(mode, catalog_path, root, products, measured, published, results):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from history_store import HistoryStore
+    from shared_catalog import SharedCatalog
+
+    catalog = SharedCatalog(root, poll_interval=0.05) if mode == 'shared' else None
+    store = HistoryStore(catalog=catalog)
+    if mode == 'private':
+        store.load_catalog([catalog_path])
+    total = 0.0 if mode == 'baseline' else sum(float(store.get(f'p{index}').prices.sum()) for index in range(products))
+    results.put(('pss', pss_kb(), total))
+    measured.wait()
+
+    if catalog is not None:
+        generation = store.version('p0')
+        published.wait()
+        deadline = time.monotonic() + 5
+        while store.version('p0') == generation and time.monotonic() < deadline:
+            time.sleep(0.01)
+        results.put(('generation', store.version('p0'), None))
+
+
+def run(mode, workers, catalog_path, root, products):
+    context = multiprocessing.get_context('spawn')
+    measured, published = context.Barrier(workers + 1), context.Event()
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(mode, catalog_path, root, products, measured, published, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    reports = [results.get() for _ in processes]
+    measured.wait()
+
+    generations = []
+    if mode == 'shared':
+        from shared_catalog import SharedCatalog
+        published_generation = SharedCatalog(root).load([catalog_path], force=True).number
+        published.set()
+        generations = [results.get()[1] for _ in processes]
+        assert generations == [published_generation] * workers, generations
+    for process in processes:
+        process.join()
+    assert len({round(total, 2) for _, _, total in reports}) == 1, 'workers read different catalogs'
+    return sum(pss for _, pss, _ in reports) / 1024, generations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=20000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    from shared_catalog import SharedCatalog
+
+    with tempfile.TemporaryDirectory() as directory:
+        catalog_path = os.path.join(directory, 'catalog.jsonl')
+        write_catalog(catalog_path, args.products, args.days, args.seed)
+        root = os.path.join(directory, 'shared')
+        started = time.perf_counter()
+        SharedCatalog(root).load([catalog_path])
+        print(f"{args.products} products x {args.days} days; shared generation built in "
+              f"{time.perf_counter() - started:.1f}s")
+
+        print(f"{'workers':>8} {'imports MB':>11} {'per-process catalog MB':>23} {'shared catalog MB':>18}")
+        for workers in args.workers:
+            baseline, _ = run('baseline', workers, catalog_path, root, args.products)
+            private, _ = run('private', workers, catalog_path, root, args.products)
+            shared, generations = run('shared', workers, catalog_path, root, args.products)
+            print(f"{workers:>8} {baseline:>11.0f} {private - baseline:>23.0f} {shared - baseline:>18.0f}"
+                  f"   (workers switched to generation {generations[0]})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""SimplePricePredictionModel.predict_price latency at 30, 90 and 365-day horizons.
+
+Compares the vectorized implementation with ``legacy_predict_price``, a copy
+of the previous per-day Python loop kept here as the baseline.
+
+Usage (from ml-service/):
+    python benchmarks/bench_simple_forecast.py --points 90
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from app_simple import model  # noqa: E402
+
+
+def legacy_predict_price(price_history, timeframe_days=30):
+    """Per-day loop implementation predict_price replaced"""
+    dates = [datetime.fromisoformat(item['date'].replace('Z', '+00:00')) for item in price_history]
+    prices = [float(item['price']) for item in price_history]
+    base_date = dates[0]
+    x_data = [(date - base_date).days for date in dates]
+    slope, intercept = model.simple_linear_regression(np.array(x_data), np.array(prices))
+    volatility = model.calculate_volatility(prices, 7)
+    predictions = []
+    current_price = prices[-1]
+    last_x = x_data[-1]
+    for i in range(1, timeframe_days + 1):
+        future_x = last_x + i
+        trend_price = slope * future_x + intercept
+        seasonal_factor = 1 + 0.1 * math.sin(2 * math.pi * i / 30)
+        noise_factor = 1 + random.uniform(-volatility / current_price, volatility / current_price) * 0.1
+        predicted_price = min(max(trend_price * seasonal_factor * noise_factor, current_price * 0.5), current_price * 2.0)
+        predictions.append({
+            'date': (base_date + timedelta(days=future_x)).isoformat(),
+            'predicted_price': round(predicted_price, 2)
+        })
+    return predictions, model.calculate_confidence(prices, volatility)
+
+
+def make_history(length, seed):
+    rng = np.random.default_rng(seed)
+    prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, length)))
+    start = datetime(2024, 1, 1)
+    return [
+        {'date': (start + timedelta(days=i)).isoformat() + 'Z', 'price': round(float(price), 2)}
+        for i, price in enumerate(prices)
+    ]
+
+
+def time_per_call(func, repeat):
+    return min(timeit.repeat(func, number=repeat, repeat=5)) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--points', type=int, default=90, help='history length')
+    parser.add_argument('--horizons', type=int, nargs='+', default=[30, 90, 365])
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    history = make_history(args.points, args.seed)
+    assert model.predict_price(history, 30) == model.predict_price(history, 30), 'forecast is not deterministic'
+
+    print(f"{args.points}-point history")
+    print(f"{'horizon':>8} {'loop (us)':>10} {'numpy (us)':>11} {'speedup':>8}")
+    for horizon in args.horizons:
+        legacy = time_per_call(lambda: legacy_predict_price(history, horizon), args.repeat)
+        vectorized = time_per_call(lambda: model.predict_price(history, horizon), args.repeat)
+        print(f"{horizon:>8} {legacy * 1e6:>10.1f} {vectorized * 1e6:>11.1f} {legacy / vectorized:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
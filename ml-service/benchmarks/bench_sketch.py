@@ -0,0 +1,72 @@
+"""Accuracy and cost of PriceSketch against exact NumPy statistics.
+
+For each history length the sketch is built by appending batches of new
+points, then compared with np.percentile/np.std on the full history: the rank
+error of its 25th percentile, the relative error of its volatility, its size,
+the cost per appended point and the cost of a full rescan. The same history is
+also split into shards, sketched in a process pool and merged, to show that
+merged sketches keep the same error bound.
+
+Usage (from ml-service/):
+    python benchmarks/bench_sketch.py --lengths 1000 100000 1000000 --k 200
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from price_sketch import PriceSketch, merge_sketches  # noqa: E402
+
+
+def rank_error(prices, value, q):
+    """|fraction of prices <= value - q|"""
+    return abs(np.count_nonzero(prices <= value) / len(prices) - q)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lengths', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--k', type=int, default=200, help='sketch accuracy parameter')
+    parser.add_argument('--append-size', type=int, default=24, help='points per appended batch')
+    parser.add_argument('--shards', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"k={args.k}, {args.append_size} points per append, {args.shards} shards")
+    print(f"{'points':>9} {'items':>6} {'p25 rank err':>13} {'merged err':>11} {'vol rel err':>12} "
+          f"{'append us/pt':>13} {'rescan ms':>10}")
+    with ProcessPoolExecutor() as pool:
+        for length in args.lengths:
+            rng = np.random.default_rng(args.seed)
+            prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, length)))
+
+            sketch = PriceSketch(args.k)
+            started = time.perf_counter()
+            for start in range(0, length, args.append_size):
+                sketch.update(prices[start:start + args.append_size])
+            append_seconds = time.perf_counter() - started
+
+            started = time.perf_counter()
+            np.percentile(prices, 25)
+            exact_volatility = np.std(prices) / np.mean(prices)
+            rescan_seconds = time.perf_counter() - started
+
+            shards = pool.map(partial(PriceSketch.from_prices, k=args.k), np.array_split(prices, args.shards))
+            merged = merge_sketches(shards)
+            assert merged.count == length and np.isclose(merged.mean, np.mean(prices))
+
+            volatility = sketch.std / sketch.mean
+            print(f"{length:>9} {len(sketch.quantiles):>6} {rank_error(prices, sketch.quantile(0.25), 0.25):>13.4%} "
+                  f"{rank_error(prices, merged.quantile(0.25), 0.25):>11.4%} "
+                  f"{abs(volatility - exact_volatility) / exact_volatility:>12.2e} "
+                  f"{append_seconds / length * 1e6:>13.2f} {rescan_seconds * 1000:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
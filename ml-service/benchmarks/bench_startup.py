@@ -0,0 +1,64 @@
+"""Reproducible cold-start measurement for the ML service.
+
+Each run starts a fresh interpreter, imports the app module, answers /health
+and then a first /predict through Flask's test client, reporting the median of
+every phase over several runs. For a per-module import breakdown run
+``python -X importtime -c "import app"``.
+
+Usage (from ml-service/):
+    python benchmarks/bench_startup.py --module app --runs 5
+    python benchmarks/bench_startup.py --module app --warmup   # ML_WARMUP=true
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r'''
+import json, time
+started = time.perf_counter()
+import {module} as service
+imported = time.perf_counter()
+client = service.app.test_client()
+assert client.get('/health').status_code == 200
+health = time.perf_counter()
+history = [{{'date': '2024-01-%02dT00:00:00' % (day + 1), 'price': 100.0 + day % 5}} for day in range(28)]
+payload = {{'product_id': 'probe', 'product_name': 'probe', 'price_history': history, 'current_price': 100.0}}
+assert client.post('/predict', json=payload).status_code == 200
+predicted = time.perf_counter()
+print(json.dumps({{
+    'import_s': imported - started,
+    'first_health_s': health - started,
+    'first_prediction_s': predicted - started,
+}}))
+'''
+
+
+def run_once(module, warmup):
+    env = dict(os.environ, ML_WARMUP='true' if warmup else 'false')
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE.format(module=module)],
+        cwd=SERVICE_DIR, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='app', choices=['app', 'app_simple'])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--warmup', action='store_true', help='run the pre-fork warmup at import')
+    args = parser.parse_args()
+
+    samples = [run_once(args.module, args.warmup) for _ in range(args.runs)]
+    print(f"{args.module} (warmup={'on' if args.warmup else 'off'}, median of {args.runs} runs)")
+    for phase in ('import_s', 'first_health_s', 'first_prediction_s'):
+        print(f"  {phase:<20} {statistics.median(s[phase] for s in samples) * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
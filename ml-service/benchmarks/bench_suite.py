@@ -0,0 +1,195 @@
+"""Microbenchmarks for every prediction stage and endpoint.
+
+Times each PricePredictionEngine stage (app.py), the SimplePricePredictionModel
+methods (app_simple.py) and end-to-end /predict and batch requests through
+Flask's test client, over seeded random-walk histories of each length. Result
+caches are disabled so every call runs the engine.
+
+Results are written as JSON. With ``--baseline`` the run is compared against a
+previous results file and exits non-zero if any benchmark's median got slower
+by more than ``--threshold`` (0.25 = 25%).
+
+Usage (from ml-service/):
+    python benchmarks/bench_suite.py -o bench.json
+    python benchmarks/bench_suite.py --baseline bench.json --threshold 0.25
+    python benchmarks/bench_suite.py --lengths 90 --filter app_simple.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Exercise the engines rather than the result caches
+os.environ['PREDICTION_CACHE_SIZE'] = '0'
+
+import numpy as np  # noqa: E402
+
+import app as full_service  # noqa: E402
+import app_simple as simple_service  # noqa: E402
+
+DEFAULT_LENGTHS = [30, 90, 365, 1825, 10000]
+BATCH_SIZE = 32
+
+
+def make_history(length, seed):
+    """Daily random-walk price history with backend-style ISO dates"""
+    rng = np.random.default_rng(seed)
+    prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, length)))
+    start = datetime(2000, 1, 1)
+    return [
+        {'date': (start + timedelta(days=i)).isoformat() + 'Z', 'price': round(float(price), 2)}
+        for i, price in enumerate(prices)
+    ]
+
+
+def build_cases(length, seed):
+    """(name, callable) pairs for one history length"""
+    predictor = full_service.predictor
+    model = simple_service.model
+    history = make_history(length, seed)
+    current_price = history[-1]['price']
+
+    df = predictor.preprocess_data(history)
+    future = predictor.predict_future_prices(df, 30)
+    prices = np.array([item['price'] for item in history])
+    x = np.arange(length, dtype=float)
+
+    full_client = full_service.app.test_client()
+    simple_client = simple_service.app.test_client()
+    predict_payload = {
+        'product_name': 'Benchmark product',
+        'price_history': history,
+        'current_price': current_price
+    }
+    batch_products = [
+        {
+            'product_id': f'p{i}',
+            'product_name': f'Benchmark product {i}',
+            'price_history': make_history(length, seed + i),
+            'current_price': current_price
+        }
+        for i in range(BATCH_SIZE)
+    ]
+
+    def post(client, path, payload):
+        response = client.post(path, json=payload)
+        if response.status_code != 200:
+            raise RuntimeError(f'{path} returned {response.status_code}: {response.get_data(as_text=True)[:200]}')
+
+    return [
+        ('app.preprocess_data', lambda: predictor.preprocess_data(history)),
+        # A fresh frame each call, so lazily computed features are timed too
+        ('app.detect_seasonality', lambda: predictor.detect_seasonality(predictor.preprocess_data(history))),
+        ('app.calculate_trend', lambda: predictor.calculate_trend(df)),
+        ('app.predict_future_prices', lambda: predictor.predict_future_prices(df, 30)),
+        ('app.analyze_best_buy_time', lambda: predictor.analyze_best_buy_time(df, future, current_price)),
+        ('app_simple.predict_price', lambda: model.predict_price(history, 30)),
+        ('app_simple.calculate_volatility', lambda: model.calculate_volatility(prices)),
+        ('app_simple.simple_linear_regression', lambda: model.simple_linear_regression(x, prices)),
+        ('http.app./predict', lambda: post(full_client, '/predict', predict_payload)),
+        ('http.app./batch-predict', lambda: post(full_client, '/batch-predict', {'products': batch_products})),
+        ('http.app_simple./predict', lambda: post(simple_client, '/predict', {
+            'product_id': 'p0', 'price_history': history, 'timeframe': '1m'
+        })),
+        ('http.app_simple./predict/batch', lambda: post(simple_client, '/predict/batch', {
+            'products': batch_products, 'timeframe': '1m'
+        })),
+    ]
+
+
+def measure(func, samples, min_sample_time):
+    """Per-call seconds over ``samples`` timing samples of auto-sized call counts"""
+    func()  # warm caches and lazy imports
+    number = 1
+    while True:
+        elapsed = timeit.timeit(func, number=number)
+        if elapsed >= min_sample_time or number >= 1 << 20:
+            break
+        number *= 2 if elapsed == 0 else max(2, min(10, int(min_sample_time / elapsed) + 1))
+    times = [t / number for t in timeit.repeat(func, number=number, repeat=samples)]
+    return {
+        'median_us': statistics.median(times) * 1e6,
+        'min_us': min(times) * 1e6,
+        'max_us': max(times) * 1e6,
+        'calls_per_sample': number,
+        'samples': samples
+    }
+
+
+def compare(results, baseline, threshold):
+    """Names of benchmarks whose median regressed by more than ``threshold``"""
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        ratio = result['median_us'] / previous['median_us']
+        marker = ''
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            marker = '  REGRESSION'
+        print(f"{name:<48} {previous['median_us']:>12.1f} -> {result['median_us']:>12.1f} us "
+              f"({ratio:5.2f}x){marker}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lengths', type=int, nargs='+', default=DEFAULT_LENGTHS)
+    parser.add_argument('--filter', default='', help='only run benchmarks whose name contains this')
+    parser.add_argument('--samples', type=int, default=7, help='timing samples per benchmark')
+    parser.add_argument('--min-sample-time', type=float, default=0.05, help='seconds per timing sample')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('-o', '--output', help='write results to this JSON file')
+    parser.add_argument('--baseline', help='results JSON of a previous run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed median slowdown vs the baseline')
+    args = parser.parse_args()
+
+    results = {}
+    started = time.time()
+    for length in args.lengths:
+        for name, func in build_cases(length, args.seed):
+            key = f'{name}[{length}]'
+            if args.filter not in key:
+                continue
+            results[key] = measure(func, args.samples, args.min_sample_time)
+            print(f"{key:<48} {results[key]['median_us']:>12.1f} us")
+
+    report = {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat() + 'Z',
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'seed': args.seed,
+            'lengths': args.lengths,
+            'duration_seconds': round(time.time() - started, 1)
+        },
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {len(results)} results to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        print()
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmarks regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == '__main__':
+    main()
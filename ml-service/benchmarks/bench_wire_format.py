@@ -0,0 +1,195 @@
+"""Bytes on the wire and encode/decode time of the request and response formats.
+
+Builds seeded /predict and batch request bodies with microsecond date strings
+(like the ones the backend sends) and compares, per format:
+
+    bytes     body size, and the ratio to plain JSON
+    encode    client-side serialization of the body (plus gzip)
+    decode    server-side request.get_json() through the negotiating request
+              class, plus turning every history into date/price arrays
+              (point_arrays), which is where the JSON layout parses each date
+
+Responses are /predict/batch-shaped results (one prediction list per product)
+encoded by jsonify() under the matching Accept header on the server and decoded
+by the client. MessagePack rows are skipped unless the msgpack package is
+installed. Times are the best of 5 means, in microseconds.
+
+Usage (from ml-service/):
+    python benchmarks/bench_wire_format.py --points 90 365 --batch 50
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from flask import Flask, jsonify, request  # noqa: E402
+
+from columnar import epoch_days, point_arrays, to_columnar  # noqa: E402
+from wire_format import (  # noqa: E402
+    COLUMNAR_JSON, COLUMNAR_MSGPACK, JSON, MSGPACK, ContentNegotiation, msgpack, packb, unpackb
+)
+
+# name -> (Content-Type, columnar layout, gzip)
+FORMATS = {
+    'json': (JSON, False, False),
+    'json+gzip': (JSON, False, True),
+    'columnar': (COLUMNAR_JSON, True, False),
+    'columnar+gzip': (COLUMNAR_JSON, True, True),
+    'msgpack': (MSGPACK, False, False),
+    'columnar msgpack': (COLUMNAR_MSGPACK, True, False),
+    'columnar msgpack+gzip': (COLUMNAR_MSGPACK, True, True),
+}
+
+
+def make_history(rng, points):
+    """Daily points at a random time of day, like scraped price histories"""
+    start = np.datetime64('2024-01-01T00:00:00', 'us') + np.int64(rng.integers(0, 86_400_000_000))
+    dates = start + np.arange(points) * np.timedelta64(1, 'D') + rng.integers(0, 60_000_000, points).astype('timedelta64[us]')
+    prices = np.round(rng.uniform(20, 1500) * np.exp(np.cumsum(rng.normal(0, 0.02, points))), 2)
+    return [
+        {'date': date, 'price': price}
+        for date, price in zip(np.datetime_as_string(dates, unit='us').tolist(), prices.tolist())
+    ]
+
+
+def columnar_history(history):
+    dates = np.array([point['date'] for point in history], dtype='datetime64[us]')
+    return {'epoch_days': epoch_days(dates), 'price': [point['price'] for point in history]}
+
+
+def with_columnar_histories(body):
+    """Copy of a request body with every price_history in the columnar layout"""
+    if 'products' in body:
+        return {**body, 'products': [with_columnar_histories(product) for product in body['products']]}
+    return {**body, 'price_history': columnar_history(body['price_history'])}
+
+
+def encode(value, content_type, compress):
+    body = packb(value) if content_type in (MSGPACK, COLUMNAR_MSGPACK) else json.dumps(value).encode()
+    return gzip.compress(body, compresslevel=6) if compress else body
+
+
+def best_mean_us(func, repeat):
+    best = None
+    for _ in range(5):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        elapsed = (time.perf_counter() - started) / repeat * 1e6
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def server_decode(app, body, content_type, compress):
+    """get_json() + point_arrays() of every history, as the prediction endpoints do"""
+    headers = {'Content-Type': content_type}
+    if compress:
+        headers['Content-Encoding'] = 'gzip'
+
+    def decode():
+        with app.test_request_context('/', method='POST', data=body, headers=headers):
+            data = request.get_json()
+            for product in data.get('products', [data]):
+                point_arrays(product['price_history'])
+    return decode
+
+
+def server_encode(app, value, accept):
+    def encode_response():
+        with app.test_request_context('/', headers={'Accept': accept}):
+            return jsonify(value).get_data()
+    return encode_response
+
+
+def available(name):
+    content_type = FORMATS[name][0]
+    return msgpack is not None or content_type not in (MSGPACK, COLUMNAR_MSGPACK)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--points', type=int, nargs='+', default=[90, 365], help='history lengths')
+    parser.add_argument('--batch', type=int, default=50, help='products per batch body')
+    parser.add_argument('--predictions', type=int, default=30, help='predicted points per response item')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    app = Flask(__name__)
+    ContentNegotiation().instrument(app)
+    if msgpack is None:
+        print('msgpack is not installed: MessagePack formats skipped')
+
+    for points in args.points:
+        bodies = {
+            f'/predict ({points} points)': {
+                'product_name': 'Product', 'current_price': 100.0, 'analysis_type': 'full',
+                'price_history': make_history(rng, points)
+            },
+            f'batch ({args.batch} x {points} points)': {
+                'products': [
+                    {'product_id': f'p{index}', 'product_name': f'Product {index}', 'current_price': 100.0,
+                     'price_history': make_history(rng, points)}
+                    for index in range(args.batch)
+                ]
+            },
+        }
+        for title, row_body in bodies.items():
+            column_body = with_columnar_histories(row_body)
+            print(f"\nRequest: {title}")
+            print(f"{'format':<22} {'bytes':>10} {'vs json':>8} {'encode us':>10} {'decode us':>10}")
+            baseline = None
+            for name, (content_type, columnar, compress) in FORMATS.items():
+                if not available(name):
+                    continue
+                value = column_body if columnar else row_body
+                body = encode(value, content_type, compress)
+                baseline = baseline or len(body)
+                encode_us = best_mean_us(lambda: encode(value, content_type, compress), args.repeat)
+                decode_us = best_mean_us(server_decode(app, body, content_type, compress), args.repeat)
+                print(f"{name:<22} {len(body):>10} {len(body) / baseline:>8.2f} {encode_us:>10.0f} {decode_us:>10.0f}")
+
+    # /predict/batch-shaped response: forecast dates are whole-second wall-clock times
+    future = np.datetime64('2025-06-12T00:58:14', 'us') + np.arange(args.predictions) * np.timedelta64(1, 'D')
+    future_dates = np.datetime_as_string(future, unit='us').tolist()
+    response = {
+        'results': [
+            {
+                'product_id': f'p{index}',
+                'predictions': [
+                    {'date': date, 'predicted_price': price}
+                    for date, price in zip(future_dates, np.round(rng.uniform(20, 1500, args.predictions), 2).tolist())
+                ],
+                'confidence': 0.8,
+                'trend': 'stable'
+            }
+            for index in range(args.batch)
+        ],
+        'processed_count': args.batch
+    }
+    print(f"\nResponse: {args.batch} results x {args.predictions} predictions")
+    print(f"{'format':<22} {'bytes':>10} {'vs json':>8} {'encode us':>10} {'decode us':>10}")
+    baseline = None
+    for name, (content_type, columnar, compress) in FORMATS.items():
+        if compress or not available(name):
+            continue
+        body = server_encode(app, response, content_type)()
+        baseline = baseline or len(body)
+        if content_type in (MSGPACK, COLUMNAR_MSGPACK):
+            client_decode = lambda: unpackb(body)  # noqa: E731
+        else:
+            client_decode = lambda: json.loads(body)  # noqa: E731
+        assert client_decode() == (to_columnar(response) if columnar else response)
+        encode_us = best_mean_us(server_encode(app, response, content_type), args.repeat)
+        decode_us = best_mean_us(client_decode, args.repeat)
+        print(f"{name:<22} {len(body):>10} {len(body) / baseline:>8.2f} {encode_us:>10.0f} {decode_us:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,467 @@
+"""Open-loop load test of a locally started ML service with HDR-style latency reports.
+
+Starts app.py or app_simple.py in a subprocess on a threaded local server (or
+targets a running service with --url) and replays a weighted mix of
+requests built from a catalog (data/sample_products.json by default, or
+files written by data/generate_sample_data.py):
+
+    app          /predict with analysis_type full, trend and seasonal, /batch-predict
+    app_simple   /predict with 1m/3m/6m timeframes, /predict/batch, /analyze/trend
+
+Batch requests draw their size from --batch-sizes. Requests arrive as a
+Poisson process at each offered rate of --rates for --duration seconds,
+whatever the service's response times (open loop), with at most
+--concurrency in flight. Latency is measured from each request's scheduled
+arrival, so queueing behind a slow service counts (no coordinated omission).
+Requests still unsent --timeout seconds after their step ends are dropped.
+
+Each step prints throughput and percentiles overall and per request type.
+The run ends with the saturation curve: offered vs achieved rate and tail
+latency per step. A step is saturated when it completes requests at under
+90% of the rate they were scheduled at, more than 1% of requests fail, or p99
+exceeds --slo-ms. The run stops at the first saturated step unless
+--no-stop. Latencies are kept in a log-linear histogram with under 1% value
+error; --hgrm-dir writes each step's percentile distribution in
+HdrHistogram's .hgrm text format, and -o writes the whole report as JSON.
+
+The launched service gets PREDICTION_CACHE_SIZE=0 unless --keep-cache, so
+the engine is measured rather than the result cache.
+
+Usage (from ml-service/):
+    python benchmarks/load_test.py --target app --rates 5 10 20 40 --duration 10
+    python benchmarks/load_test.py --target app_simple --catalog ../data/catalog/products-00000.jsonl
+    python benchmarks/load_test.py --url http://localhost:5000 --target app --rates 50 100 200
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from price_store import iter_catalog  # noqa: E402
+
+SAMPLE_PRODUCTS = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'sample_products.json')
+
+# request type -> default weight, per target
+MIXES = {
+    'app': {'predict_full': 4, 'predict_trend': 2, 'predict_seasonal': 2, 'batch_predict': 1},
+    'app_simple': {'predict': 5, 'predict_batch': 1, 'analyze_trend': 3},
+}
+
+# Payloads built per request type (each with its own perturbed prices)
+PAYLOADS_PER_TYPE = 64
+
+
+class LatencyHistogram:
+    """Log-linear histogram of microsecond values in the style of HdrHistogram.
+
+    Values below 2**bits are counted exactly; above that each power of two
+    is split into 2**(bits - 1) buckets, so a recorded value is reported with
+    a relative error under 2**(1 - bits) (0.8% for the default 8 bits).
+    """
+
+    def __init__(self, bits=8, max_exponent=40):
+        self.bits = bits
+        self.half = 1 << (bits - 1)
+        self.counts = np.zeros((max_exponent + 2) * self.half, dtype=np.int64)
+        self.total = 0
+        self.min = None
+        self.max = 0
+        self._sum = 0.0
+        self._sum_squares = 0.0
+
+    def _index(self, value):
+        exponent = max(0, value.bit_length() - self.bits)
+        return exponent * self.half + (value >> exponent)
+
+    def _highest_equivalent(self, index):
+        exponent = max(0, index // self.half - 1)
+        return ((index - exponent * self.half) << exponent) + (1 << exponent) - 1
+
+    def record(self, microseconds):
+        value = max(0, int(microseconds))
+        self.counts[min(self._index(value), len(self.counts) - 1)] += 1
+        self.total += 1
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = max(self.max, value)
+        self._sum += value
+        self._sum_squares += value * value
+
+    def merge(self, other):
+        self.counts += other.counts
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._sum += other._sum
+        self._sum_squares += other._sum_squares
+        return self
+
+    @property
+    def mean(self):
+        return self._sum / self.total if self.total else 0.0
+
+    @property
+    def stdev(self):
+        if not self.total:
+            return 0.0
+        return math.sqrt(max(0.0, self._sum_squares / self.total - self.mean ** 2))
+
+    def percentile(self, percent):
+        """Value (microseconds) at or below which ``percent`` of the recordings fall"""
+        if not self.total:
+            return 0
+        rank = max(1, math.ceil(percent / 100 * self.total))
+        index = int(np.searchsorted(np.cumsum(self.counts), rank))
+        return min(self._highest_equivalent(index), self.max)
+
+    def percentile_distribution(self, ticks_per_half=5, unit_ratio=1000.0):
+        """HdrHistogram .hgrm text: percentile ticks that halve the distance to 100% (values in ms)"""
+        lines = [f"{'Value':>12} {'Percentile':>14} {'TotalCount':>10} {'1/(1-Percentile)':>14}", '']
+        cumulative = np.cumsum(self.counts)
+        half, done = 0, False
+        while not done:
+            for tick in range(ticks_per_half):
+                fraction = 1 - 0.5 ** half * (1 - tick / (2 * ticks_per_half))
+                # Stop once a tick would need more recordings than there are
+                if 1 / (1 - fraction) > self.total:
+                    done = True
+                    break
+                value = self.percentile(fraction * 100)
+                count = int(cumulative[min(self._index(value), len(cumulative) - 1)])
+                lines.append(f"{value / unit_ratio:>12.3f} {fraction:>14.12f} {count:>10} {1 / (1 - fraction):>14.2f}")
+            half += 1
+        lines.append(f"{self.max / unit_ratio:>12.3f} {1.0:>14.12f} {self.total:>10}")
+        lines.append(f"#[Mean    = {self.mean / unit_ratio:>12.3f}, StdDeviation   = {self.stdev / unit_ratio:>12.3f}]")
+        lines.append(f"#[Max     = {self.max / unit_ratio:>12.3f}, Total count    = {self.total:>12}]")
+        lines.append(f"#[Buckets = {len(self.counts) // self.half:>12}, SubBuckets     = {self.half * 2:>12}]")
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        """Percentiles in milliseconds"""
+        return {
+            'count': self.total,
+            'p50_ms': round(self.percentile(50) / 1000, 3),
+            'p90_ms': round(self.percentile(90) / 1000, 3),
+            'p95_ms': round(self.percentile(95) / 1000, 3),
+            'p99_ms': round(self.percentile(99) / 1000, 3),
+            'p999_ms': round(self.percentile(99.9) / 1000, 3),
+            'max_ms': round(self.max / 1000, 3),
+            'mean_ms': round(self.mean / 1000, 3),
+        }
+
+
+def load_products(paths, limit):
+    """Catalog products with at least 5 price points, at most ``limit``"""
+    products = []
+    for path in paths:
+        for product in iter_catalog(path):
+            history = product.get('priceHistory') or product.get('price_history') or []
+            if len(history) >= 5:
+                products.append({
+                    'name': product.get('name') or product.get('product_name') or 'Product',
+                    'history': [{'date': point['date'], 'price': point['price']} for point in history]
+                })
+                if len(products) >= limit:
+                    return products
+    if not products:
+        raise SystemExit('No products with at least 5 price points in the catalog')
+    return products
+
+
+def perturbed_history(product, rng):
+    """The product's history with every price scaled by 0.8-1.2, so payloads are distinct"""
+    scale = rng.uniform(0.8, 1.2, len(product['history']))
+    return [
+        {'date': point['date'], 'price': round(float(point['price']) * factor, 2)}
+        for point, factor in zip(product['history'], scale)
+    ]
+
+
+def build_payloads(target, request_type, products, batch_sizes, rng):
+    """(method, path, encoded body) requests of one type"""
+    requests = []
+    for i in range(PAYLOADS_PER_TYPE):
+        product = products[i % len(products)]
+        history = perturbed_history(product, rng)
+        if request_type in ('predict_full', 'predict_trend', 'predict_seasonal'):
+            body = {
+                'product_name': f"{product['name']} #{i}",
+                'price_history': history,
+                'current_price': history[-1]['price'],
+                'analysis_type': request_type.split('_', 1)[1],
+            }
+            path = '/predict'
+        elif request_type == 'predict':
+            body = {'product_id': f'p{i}', 'price_history': history, 'timeframe': ('1m', '3m', '6m')[i % 3]}
+            path = '/predict'
+        elif request_type == 'analyze_trend':
+            body = {'price_history': history}
+            path = '/analyze/trend'
+        elif request_type in ('batch_predict', 'predict_batch'):
+            size = batch_sizes[i % len(batch_sizes)]
+            items = [
+                {'product_id': f'p{i}-{j}', 'product_name': products[(i + j) % len(products)]['name'],
+                 'price_history': perturbed_history(products[(i + j) % len(products)], rng)}
+                for j in range(size)
+            ]
+            if target == 'app':
+                for item in items:
+                    item['current_price'] = item['price_history'][-1]['price']
+                body, path = {'products': items}, '/batch-predict'
+            else:
+                body, path = {'products': items, 'timeframe': '1m'}, '/predict/batch'
+        else:
+            raise SystemExit(f'Unknown request type for {target}: {request_type}')
+        requests.append(('POST', path, json.dumps(body).encode()))
+    return requests
+
+
+def parse_mix(target, spec):
+    mix = dict(MIXES[target])
+    if spec:
+        mix = {}
+        for item in spec.split(','):
+            name, _, weight = item.partition('=')
+            mix[name.strip()] = float(weight or 1)
+    unknown = set(mix) - set(MIXES[target])
+    if unknown:
+        raise SystemExit(f"Unknown request types for {target}: {', '.join(sorted(unknown))} "
+                         f"(choose from {', '.join(MIXES[target])})")
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(target, port, keep_cache, log_path):
+    """Run ``target``'s Flask app on a threaded local server in a subprocess and wait until it answers"""
+    env = dict(os.environ)
+    if not keep_cache:
+        env['PREDICTION_CACHE_SIZE'] = '0'
+    log = open(log_path, 'w')
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), '--serve', target, '--port', str(port)],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f'{target} exited during startup; see {log_path}')
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/health')
+            if connection.getresponse().status == 200:
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise SystemExit(f'{target} did not start within 120s; see {log_path}')
+
+
+def serve(target, port):
+    """--serve mode: the subprocess started by start_server"""
+    import importlib
+
+    from werkzeug.serving import make_server
+
+    module = importlib.import_module(target)
+    make_server('127.0.0.1', port, module.app, threaded=True).serve_forever()
+
+
+def run_step(host, port, pools, mix, rate, duration, concurrency, timeout, rng):
+    """One open-loop step; returns (overall histogram, per-type histograms, counters)"""
+    names = list(mix)
+    weights = np.array([mix[name] for name in names], dtype=float)
+    arrivals = np.cumsum(rng.exponential(1 / rate, int(rate * duration * 1.5) + 16))
+    arrivals = arrivals[arrivals < duration]
+    kinds = rng.choice(len(names), len(arrivals), p=weights / weights.sum())
+    picks = rng.integers(0, PAYLOADS_PER_TYPE, len(arrivals))
+
+    histograms = {name: LatencyHistogram() for name in names}
+    errors = {}
+    dropped = [0]
+    cursor = [0]
+    lock = threading.Lock()
+    start = time.perf_counter() + 0.05
+
+    def worker():
+        connection = http.client.HTTPConnection(host, port, timeout=timeout)
+        local = {name: LatencyHistogram() for name in names}
+        while True:
+            with lock:
+                index = cursor[0]
+                cursor[0] += 1
+            if index >= len(arrivals):
+                break
+            scheduled = start + arrivals[index]
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif -delay > duration - arrivals[index] + timeout:
+                with lock:
+                    dropped[0] += 1
+                continue
+            name = names[kinds[index]]
+            method, path, body = pools[name][picks[index]]
+            try:
+                connection.request(method, path, body, {'Content-Type': 'application/json'})
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException) as e:
+                connection.close()
+                status = type(e).__name__
+            if status == 200:
+                local[name].record((time.perf_counter() - scheduled) * 1e6)
+            else:
+                with lock:
+                    errors[str(status)] = errors.get(str(status), 0) + 1
+        connection.close()
+        with lock:
+            for name, histogram in local.items():
+                histograms[name].merge(histogram)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = max(time.perf_counter() - start, duration)
+
+    overall = LatencyHistogram()
+    for histogram in histograms.values():
+        overall.merge(histogram)
+    return overall, histograms, {
+        'sent': len(arrivals),
+        'errors': errors,
+        'dropped': dropped[0],
+        'elapsed_seconds': round(elapsed, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--target', choices=sorted(MIXES), default='app', help='service module (and request mix)')
+    parser.add_argument('--url', help='load an already running service instead of starting one')
+    parser.add_argument('--catalog', nargs='+', default=[SAMPLE_PRODUCTS], help='catalog .json/.jsonl files')
+    parser.add_argument('--products', type=int, default=1000, help='catalog products to build requests from')
+    parser.add_argument('--mix', help="request type weights, e.g. 'predict_full=4,batch_predict=1'")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[5, 20, 50])
+    parser.add_argument('--rates', type=float, nargs='+', default=[2, 5, 10, 20, 40, 80], help='offered requests/s per step')
+    parser.add_argument('--duration', type=float, default=10, help='seconds per step')
+    parser.add_argument('--warmup', type=float, default=3, help='unrecorded seconds at the first rate')
+    parser.add_argument('--concurrency', type=int, default=32, help='most requests in flight')
+    parser.add_argument('--timeout', type=float, default=10, help='request timeout and drain time in seconds')
+    parser.add_argument('--slo-ms', type=float, help='p99 above this marks a step saturated')
+    parser.add_argument('--no-stop', action='store_true', help='run every rate even after saturation')
+    parser.add_argument('--keep-cache', action='store_true', help='leave the result cache enabled')
+    parser.add_argument('--hgrm-dir', help='write each step\'s percentile distribution here')
+    parser.add_argument('-o', '--output', help='write the report as JSON')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--serve', choices=sorted(MIXES), help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port)
+        return 0
+
+    rng = np.random.default_rng(args.seed)
+    products = load_products(args.catalog, args.products)
+    mix = parse_mix(args.target, args.mix)
+    pools = {name: build_payloads(args.target, name, products, args.batch_sizes, rng) for name in mix}
+
+    server = None
+    if args.url:
+        parsed = urlparse(args.url)
+        host, port = parsed.hostname, parsed.port or 80
+    else:
+        host, port = '127.0.0.1', free_port()
+        log_path = os.path.join(tempfile.gettempdir(), f'load_test_{args.target}_{port}.log')
+        print(f"Starting {args.target} on port {port} (log: {log_path})")
+        server = start_server(args.target, port, args.keep_cache, log_path)
+
+    print(f"Mix: {', '.join(f'{name}={weight:g}' for name, weight in mix.items())}; "
+          f"{len(products)} products, concurrency {args.concurrency}, {args.duration:g}s per step")
+    steps = []
+    try:
+        if args.warmup > 0:
+            run_step(host, port, pools, mix, args.rates[0], args.warmup, args.concurrency, args.timeout, rng)
+
+        for rate in args.rates:
+            overall, per_type, counters = run_step(
+                host, port, pools, mix, rate, args.duration, args.concurrency, args.timeout, rng
+            )
+            failed = sum(counters['errors'].values()) + counters['dropped']
+            # Compare against the arrivals actually drawn, not the nominal rate of a short Poisson sample
+            offered = counters['sent'] / args.duration
+            achieved = overall.total / counters['elapsed_seconds']
+            summary = overall.summary()
+            saturated = (
+                achieved < 0.9 * offered
+                or failed > 0.01 * max(1, counters['sent'])
+                or (args.slo_ms is not None and summary['p99_ms'] > args.slo_ms)
+            )
+            steps.append({
+                'offered_rps': rate,
+                'scheduled_rps': round(offered, 2),
+                'achieved_rps': round(achieved, 2),
+                'saturated': saturated,
+                **counters,
+                'latency': summary,
+                'by_type': {name: histogram.summary() for name, histogram in per_type.items()},
+            })
+
+            print(f"\n== {rate:g} req/s offered ({offered:.1f} scheduled): {achieved:.1f} req/s achieved, {counters['sent']} sent, "
+                  f"{failed} failed{' (SATURATED)' if saturated else ''}")
+            print(f"{'type':<18} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'p99.9 ms':>9} {'max ms':>9}")
+            for name, item in [('all', summary)] + list(steps[-1]['by_type'].items()):
+                print(f"{name:<18} {item['count']:>6} {item['p50_ms']:>9.2f} {item['p95_ms']:>9.2f} "
+                      f"{item['p99_ms']:>9.2f} {item['p999_ms']:>9.2f} {item['max_ms']:>9.2f}")
+            if counters['errors']:
+                print(f"errors: {counters['errors']}")
+
+            if args.hgrm_dir:
+                os.makedirs(args.hgrm_dir, exist_ok=True)
+                with open(os.path.join(args.hgrm_dir, f'{args.target}-{rate:g}rps.hgrm'), 'w') as f:
+                    f.write(overall.percentile_distribution())
+            if saturated and not args.no_stop:
+                break
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print("\nSaturation curve")
+    print(f"{'offered':>8} {'achieved':>9} {'p50 ms':>9} {'p99 ms':>9} {'failed':>7}")
+    for step in steps:
+        failed = sum(step['errors'].values()) + step['dropped']
+        print(f"{step['offered_rps']:>8g} {step['achieved_rps']:>9.1f} {step['latency']['p50_ms']:>9.2f} "
+              f"{step['latency']['p99_ms']:>9.2f} {failed:>7}{'  <- saturated' if step['saturated'] else ''}")
+    sustained = [step['achieved_rps'] for step in steps if not step['saturated']]
+    print(f"Highest unsaturated throughput: {max(sustained) if sustained else 0:.1f} req/s")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'target': args.target, 'mix': mix, 'concurrency': args.concurrency, 'steps': steps}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
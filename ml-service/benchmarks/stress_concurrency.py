@@ -0,0 +1,87 @@
+"""Concurrency stress test for the threaded ML service.
+
+Computes the expected /predict response for a set of distinct products
+serially, then replays the same requests from many threads at once and checks
+every response is identical to its serial result. Exits non-zero on any
+mismatch.
+
+Usage (from ml-service/):
+    python benchmarks/stress_concurrency.py --clients 32 --rounds 20
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Exercise the engine itself rather than the result cache
+os.environ.setdefault('PREDICTION_CACHE_SIZE', '0')
+
+import numpy as np  # noqa: E402
+
+from app import app  # noqa: E402
+
+SAMPLE_PRODUCTS = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'sample_products.json')
+
+
+def build_requests(count, seed):
+    """Distinct /predict payloads derived from the sample catalog"""
+    with open(SAMPLE_PRODUCTS) as f:
+        products = json.load(f)
+    rng = np.random.default_rng(seed)
+    payloads = []
+    for i in range(count):
+        product = products[i % len(products)]
+        scale = rng.uniform(0.5, 1.5, len(product['priceHistory']))
+        history = [
+            {'date': point['date'], 'price': round(point['price'] * factor, 2)}
+            for point, factor in zip(product['priceHistory'], scale)
+        ]
+        payloads.append({
+            'product_name': f"{product['name']} #{i}",
+            'price_history': history,
+            'current_price': history[-1]['price'],
+            'analysis_type': ('full', 'trend', 'seasonal')[i % 3],
+        })
+    return payloads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=32, help='parallel client threads')
+    parser.add_argument('--rounds', type=int, default=20, help='requests per client')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    payloads = build_requests(args.clients, args.seed)
+    client = app.test_client()
+    expected = [client.post('/predict', json=payload).get_json() for payload in payloads]
+
+    barrier = threading.Barrier(args.clients)
+    mismatches = []
+
+    def worker(index):
+        worker_client = app.test_client()
+        barrier.wait()
+        for round_number in range(args.rounds):
+            # Rotate payloads so every thread hits every product
+            slot = (index + round_number) % len(payloads)
+            response = worker_client.post('/predict', json=payloads[slot])
+            if response.status_code != 200 or response.get_json() != expected[slot]:
+                mismatches.append((index, round_number, slot))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    total = args.clients * args.rounds
+    print(f"{total} concurrent requests from {args.clients} clients, {len(mismatches)} mismatches")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
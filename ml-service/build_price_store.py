@@ -0,0 +1,53 @@
+"""Convert catalog JSON files into a columnar price store.
+
+Accepts JSON files holding one product or a list of products (the format of
+data/sample_products.json and data/product_N.json) and JSONL files with one
+product per line. Products are read one at a time and streamed to disk.
+
+Usage (from ml-service/):
+    python build_price_store.py ../data/sample_products.json -o ../data/price_store
+"""
+import argparse
+import logging
+
+from price_store import PriceStore, PriceStoreWriter, iter_catalog, product_id_of
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def build_store(paths, output):
+    """Write every product with a price history in ``paths`` to a store at ``output``"""
+    seen = set()
+    skipped = 0
+    with PriceStoreWriter(output) as writer:
+        for path in paths:
+            for product in iter_catalog(path):
+                history = product.get('priceHistory') or product.get('price_history')
+                try:
+                    product_id = product_id_of(product)
+                except KeyError:
+                    skipped += 1
+                    continue
+                if not history or product_id in seen:
+                    skipped += 1
+                    continue
+                writer.add_history(product_id, history)
+                seen.add(product_id)
+    logger.info(f"Wrote {writer.products} products ({writer.points} points) to {output}, skipped {skipped}")
+    return writer.products
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('inputs', nargs='+', help='catalog .json / .jsonl files')
+    parser.add_argument('-o', '--output', required=True, help='store directory to create')
+    args = parser.parse_args()
+
+    build_store(args.inputs, args.output)
+    store = PriceStore(args.output)
+    logger.info(f"Verified store with {len(store)} products")
+
+
+if __name__ == '__main__':
+    main()
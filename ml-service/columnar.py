@@ -0,0 +1,139 @@
+"""Columnar layout of price point lists.
+
+A point list such as ``price_history`` or ``predictions`` is normally a list
+of ``{'date': '2025-06-12T00:58:14.123508', 'price': 129.99}`` objects. In
+the columnar layout the same list is one object of parallel arrays, with the
+dates as days since 1970-01-01:
+
+    {"epoch_days": [20251, 20252.040452], "price": [129.99, 124.5], "utc_offset": "+02:00"}
+
+Whole days are integers; a fractional part carries the wall-clock time of
+day (to the microsecond). ``utc_offset`` is only present when the dates had
+one. Every other field of the points becomes a column of the same name.
+
+Received columnar histories are kept as PointColumns, which the NumPy
+pipelines (``point_arrays``) read as arrays directly, skipping per-point
+date parsing. Everything else can still treat them as a list of point dicts.
+"""
+import hashlib
+from collections.abc import Sequence
+
+import numpy as np
+
+from date_utils import parse_wall_clock, to_isoformat
+
+EPOCH = np.datetime64('1970-01-01T00:00:00', 'us')
+MICROSECONDS_PER_DAY = 86_400_000_000
+
+
+def epoch_days(dates):
+    """datetime64 values as days since 1970-01-01: ints for whole days, floats otherwise"""
+    micros = (np.asarray(dates, dtype='datetime64[us]') - EPOCH).astype(np.int64)
+    if (micros % MICROSECONDS_PER_DAY == 0).all():
+        return (micros // MICROSECONDS_PER_DAY).tolist()
+    return (micros / MICROSECONDS_PER_DAY).tolist()
+
+
+def dates_from_epoch_days(values):
+    """Inverse of epoch_days: datetime64[us] array, rounded to the microsecond"""
+    days = np.asarray(values)
+    if days.dtype.kind in 'iu':
+        return EPOCH + days.astype(np.int64) * MICROSECONDS_PER_DAY * np.timedelta64(1, 'us')
+    micros = np.rint(days.astype(np.float64) * MICROSECONDS_PER_DAY).astype(np.int64)
+    return EPOCH + micros.astype('timedelta64[us]')
+
+
+class PointColumns(Sequence):
+    """A point list received in the columnar layout; reads like a list of point dicts"""
+
+    def __init__(self, columns):
+        self.columns = columns
+        self._arrays = None
+
+    def __len__(self):
+        return len(self.columns['epoch_days'])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(len(self)))]
+        dates, prices, utc_offset = self.arrays()
+        point = {
+            key: values[index] for key, values in self.columns.items()
+            if key not in ('epoch_days', 'utc_offset')
+        }
+        point['date'] = to_isoformat(np.atleast_1d(dates[index]))[0] + utc_offset
+        point['price'] = float(prices[index])
+        return point
+
+    @property
+    def utc_offset(self):
+        return self.columns.get('utc_offset') or ''
+
+    def arrays(self):
+        """(dates, prices, utc_offset) as datetime64[us] and float64 arrays, in received order"""
+        if self._arrays is None:
+            dates = dates_from_epoch_days(self.columns['epoch_days'])
+            prices = np.asarray(self.columns['price'], dtype=float)
+            if dates.shape != prices.shape or dates.ndim != 1:
+                raise ValueError('epoch_days and price must be arrays of the same length')
+            self._arrays = (dates, prices, self.utc_offset)
+        return self._arrays
+
+    def cache_token(self):
+        """Content hash for result cache keys"""
+        dates, prices, utc_offset = self.arrays()
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(dates.view(np.int64).tobytes())
+        digest.update(prices.tobytes())
+        digest.update(utc_offset.encode())
+        return f'columns:{digest.hexdigest()}'
+
+
+def point_arrays(price_history):
+    """(dates, prices, utc_offset) of a list of point dicts or a PointColumns, in input order"""
+    if isinstance(price_history, PointColumns):
+        return price_history.arrays()
+    dates, utc_offset = parse_wall_clock(item['date'] for item in price_history)
+    prices = np.array([item['price'] for item in price_history], dtype=float)
+    return dates, prices, utc_offset
+
+
+def _is_point_list(value):
+    return bool(value) and all(isinstance(item, dict) and isinstance(item.get('date'), str) for item in value)
+
+
+def _point_list_columns(points):
+    dates, utc_offset = parse_wall_clock(point['date'] for point in points)
+    columns = {'epoch_days': epoch_days(dates)}
+    for key in dict.fromkeys(key for point in points for key in point):
+        if key != 'date':
+            columns[key] = [point.get(key) for point in points]
+    if utc_offset:
+        columns['utc_offset'] = utc_offset
+    return columns
+
+
+def to_columnar(value):
+    """Copy of a response object with every list of dated points in the columnar layout"""
+    if isinstance(value, dict):
+        return {key: to_columnar(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if _is_point_list(value):
+            try:
+                return _point_list_columns(value)
+            except ValueError:
+                # Not ISO dates: leave the list as it is
+                pass
+        return [to_columnar(item) for item in value]
+    return value
+
+
+def from_columnar(value):
+    """Request object with every columnar point list (an object with epoch_days) as a PointColumns"""
+    if isinstance(value, dict):
+        if isinstance(value.get('epoch_days'), list):
+            return PointColumns(value)
+        return {key: from_columnar(item) for key, item in value.items()}
+    if isinstance(value, list) and value and isinstance(value[0], (dict, list)):
+        return [from_columnar(item) for item in value]
+    return value
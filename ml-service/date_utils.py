@@ -0,0 +1,83 @@
+from datetime import datetime, timezone
+import numpy as np
+
+DAY = np.timedelta64(1, 'D')
+
+
+def _has_utc_offset(value):
+    """Check whether an ISO-8601 string carries a 'Z' or +HH:MM suffix"""
+    return value.endswith('Z') or (len(value) > 19 and value[-6] in '+-' and value[-3] == ':')
+
+
+def _to_utc_naive(value):
+    """Parse a single offset-aware ISO-8601 string into a naive UTC datetime"""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def parse_dates(values):
+    """Parse ISO-8601 date strings into a datetime64[us] array.
+
+    Offset-aware values (``...Z`` or ``...+05:30``) are converted to naive UTC,
+    which is what ``pd.to_datetime`` does for a uniformly offset series.
+    """
+    values = list(values)
+    if any(_has_utc_offset(value) for value in values):
+        values = [_to_utc_naive(value) if _has_utc_offset(value) else value for value in values]
+    return np.array(values, dtype='datetime64[us]')
+
+
+def days_between(dates, start):
+    """Whole days elapsed from ``start`` (floored like ``Timedelta.days``)"""
+    return (dates - start) // DAY
+
+
+def day_of_week(dates):
+    """Monday=0 ... Sunday=6, like ``datetime.weekday()``"""
+    # 1970-01-01 was a Thursday
+    return (dates.astype('datetime64[D]').astype(np.int64) + 3) % 7
+
+
+def month_of(dates):
+    """Calendar month 1-12"""
+    return dates.astype('datetime64[M]').astype(np.int64) % 12 + 1
+
+
+def to_isoformat(dates):
+    """Format datetime64 values like ``datetime.isoformat()``"""
+    return [value.isoformat() for value in dates.astype('datetime64[us]').astype(object)]
+
+
+def parse_wall_clock(values):
+    """Parse ISO-8601 strings keeping their wall-clock time, like ``pd.to_datetime``.
+
+    Returns ``(dates, utc_offset)`` where ``utc_offset`` is the ``+HH:MM``
+    suffix shared by every value ('' for naive input, '+00:00' for 'Z').
+    Histories mixing different offsets are converted to UTC.
+    """
+    values = list(values)
+    suffixes = {_offset_suffix(value) for value in values}
+    if suffixes == {''}:
+        return np.array(values, dtype='datetime64[us]'), ''
+    if len(suffixes) == 1:
+        # 'Z' and '+00:00' share a suffix, so the length to strip is per value
+        stripped = [value[:-1] if value.endswith('Z') else value[:-6] for value in values]
+        return np.array(stripped, dtype='datetime64[us]'), suffixes.pop()
+    return parse_dates(values), '+00:00'
+
+
+def _offset_suffix(value):
+    if value.endswith('Z'):
+        return '+00:00'
+    return value[-6:] if _has_utc_offset(value) else ''
+
+
+def iso_week(dates):
+    """ISO-8601 week number, like ``Series.dt.isocalendar().week``"""
+    days = dates.astype('datetime64[D]')
+    # The ISO week belongs to the year its Thursday falls in
+    thursday = days + (3 - day_of_week(dates))
+    year_start = thursday.astype('datetime64[Y]').astype('datetime64[D]')
+    return (thursday - year_start).astype(np.int64) // 7 + 1
@@ -0,0 +1,162 @@
+"""Local price histories the service can predict from by product id.
+
+Histories come from catalog files loaded at startup (CATALOG_PATHS), from the
+/ingest endpoint, from a SharedCatalog mapped by every worker, or from a
+memory-mapped PriceStore, in that order of precedence. They are kept as sorted
+``datetime64``/``float64`` arrays, so a by-reference prediction goes straight
+into the NumPy feature pipeline without any per-point JSON handling.
+
+Every in-memory and price store history also carries a PriceSketch (running
+moments and a quantile sketch) that appends update in place of a rescan, so
+the buy recommendation's mean, volatility and 25th-percentile checks cost
+O(log n) per new point. Shared catalog histories carry none, which keeps
+worker memory flat; their analysis scans the mapped prices instead.
+"""
+import logging
+import math
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+from columnar import point_arrays
+from price_sketch import DEFAULT_K, PriceSketch
+from price_store import EPOCH_DAY, iter_catalog, product_id_of
+from result_cache import ResultCache
+
+logger = logging.getLogger(__name__)
+
+# dates are naive wall-clock datetime64[us]; version increases on every change;
+# sketch summarizes prices and must not be modified
+StoredHistory = namedtuple(
+    'StoredHistory',
+    ['product_id', 'name', 'dates', 'prices', 'utc_offset', 'version', 'sketch', 'category', 'brand'],
+    defaults=(None, None)
+)
+
+
+def history_arrays(price_history):
+    """Parse a [{'date', 'price'}, ...] history (or PointColumns) into date-sorted arrays and its UTC offset suffix"""
+    dates, prices, utc_offset = point_arrays(price_history)
+    order = np.argsort(dates, kind='stable')
+    return dates[order], prices[order], utc_offset
+
+
+class HistoryStore:
+    """Product id -> StoredHistory, with an optional SharedCatalog and PriceStore behind it"""
+
+    def __init__(self, price_store=None, sketch_k=DEFAULT_K, catalog=None, store_sketches=1024):
+        self.price_store = price_store
+        self.catalog = catalog
+        self.sketch_k = sketch_k
+        self._histories = {}
+        # Price store products never change, so the sketches of the most
+        # recently used ones are kept (0 builds one per lookup)
+        self._store_sketches = ResultCache(store_sketches, math.inf)
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def get(self, product_id):
+        """Current history of a product, or None if it is unknown"""
+        history = self._histories.get(product_id)
+        if history is not None:
+            return history
+        if self.catalog is not None:
+            generation = self.catalog.current()
+            history = generation.get(product_id) if generation is not None else None
+            if history is not None:
+                return history
+        if self.price_store is None or product_id not in self.price_store:
+            return None
+        days, prices = self.price_store.columns(product_id)
+        dates = (EPOCH_DAY + days.astype('timedelta64[D]')).astype('datetime64[us]')
+        prices = prices.astype(float)
+        sketch = self._store_sketches.get(product_id)
+        if sketch is None:
+            sketch = PriceSketch.from_prices(prices, self.sketch_k)
+            self._store_sketches.set(product_id, sketch)
+        return StoredHistory(product_id, product_id, dates, prices, '', 0, sketch)
+
+    def version(self, product_id):
+        """Current history version of a product, or None if it is unknown.
+
+        Shared catalog products are at their generation's number, price store
+        products at 0.
+        """
+        history = self._histories.get(product_id)
+        if history is not None:
+            return history.version
+        generation = self.catalog.current() if self.catalog is not None else None
+        if generation is not None and product_id in generation:
+            return generation.number
+        if self.price_store is not None and product_id in self.price_store:
+            return 0
+        return None
+
+    def versions(self):
+        """(product_id, version) for every known product, in-memory histories first"""
+        histories = list(self._histories.values())
+        for history in histories:
+            yield history.product_id, history.version
+        generation = self.catalog.current() if self.catalog is not None else None
+        if generation is not None:
+            for product_id in generation.ids():
+                if product_id not in self._histories:
+                    yield product_id, generation.number
+        if self.price_store is not None:
+            for product_id in self.price_store.ids:
+                if product_id not in self._histories and (generation is None or product_id not in generation):
+                    yield product_id, 0
+
+    def add_listener(self, callback):
+        """Call ``callback(history)`` with every StoredHistory put from now on, in version order"""
+        self._listeners.append(callback)
+
+    def put(self, product_id, price_history, name=None, append=False, category=None, brand=None):
+        """Store (or append to) a product's history and return the new StoredHistory"""
+        dates, prices, utc_offset = history_arrays(price_history)
+        with self._lock:
+            current = self.get(product_id)
+            if append and current is not None:
+                if len(dates) and len(current.dates) and dates[0] < current.dates[-1]:
+                    raise ValueError('Appended price points must not predate the stored history')
+                # Readers may hold the current sketch, so the update goes to a copy
+                if current.sketch is not None:
+                    sketch = current.sketch.copy().update(prices)
+                else:
+                    sketch = PriceSketch.from_prices(np.concatenate([current.prices, prices]), self.sketch_k)
+                dates = np.concatenate([current.dates, dates])
+                prices = np.concatenate([current.prices, prices])
+                utc_offset = current.utc_offset
+            else:
+                sketch = PriceSketch.from_prices(prices, self.sketch_k)
+            version = current.version + 1 if current is not None else 1
+            name = name or (current.name if current is not None else product_id)
+            if current is not None:
+                category = category or current.category
+                brand = brand or current.brand
+            history = StoredHistory(product_id, name, dates, prices, utc_offset, version, sketch, category, brand)
+            self._histories[product_id] = history
+            for callback in self._listeners:
+                callback(history)
+            return history
+
+    def load_catalog(self, paths):
+        """Load every product with a price history from catalog .json/.jsonl files"""
+        loaded = 0
+        for path in paths:
+            for product in iter_catalog(path):
+                history = product.get('priceHistory') or product.get('price_history')
+                if not history:
+                    continue
+                self.put(
+                    product_id_of(product), history, product.get('name') or product.get('product_name'),
+                    category=product.get('category'), brand=product.get('brand')
+                )
+                loaded += 1
+        logger.info(f"Loaded {loaded} product histories from {len(paths)} catalog files")
+        return loaded
+
+    def __len__(self):
+        """Number of histories held in memory (catalog files and ingested)"""
+        return len(self._histories)
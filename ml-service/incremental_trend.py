@@ -0,0 +1,158 @@
+"""O(1) trend updates for append-only price histories.
+
+Each product keeps the count, means and co-moments of (day, price) instead of
+the points themselves. These are the raw sums of x, y, xy, x² and y² in
+centered form (Welford's update), which gives the same slope, intercept and R²
+as a full least squares refit without the cancellation error raw sums suffer on
+long histories.
+
+A product's version is the number of points folded into its state, so a client
+that last synced at version N sends only the points after the first N.
+
+States live in the worker process that received them and are kept for the
+most recently updated products only (TREND_STATE_SIZE, TREND_STATE_TTL); a
+client whose product was evicted, or whose request reached another worker,
+gets a version conflict and resends the full history.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from batch_engine import classify_trend
+from date_utils import parse_dates, days_between
+
+
+class VersionConflict(Exception):
+    """Raised when a delta does not start at the product's current version"""
+
+    def __init__(self, current_version):
+        super().__init__(f'History is at version {current_version}')
+        self.current_version = current_version
+
+
+class IncrementalTrend:
+    """Running least squares state of price against days since the first point"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self.cxx = 0.0
+        self.cxy = 0.0
+        self.cyy = 0.0
+        self.start_date = None
+        self.last_date = None
+
+    @property
+    def version(self):
+        return self.count
+
+    def add(self, day, price):
+        """Fold one (days_since_start, price) point into the state"""
+        self.count += 1
+        dx = day - self.mean_x
+        dy = price - self.mean_y
+        self.mean_x += dx / self.count
+        self.mean_y += dy / self.count
+        self.cxx += dx * (day - self.mean_x)
+        self.cxy += dx * (price - self.mean_y)
+        self.cyy += dy * (price - self.mean_y)
+
+    def extend(self, price_history):
+        """Append price points, which must not predate the last point already seen"""
+        if not price_history:
+            return
+        dates = parse_dates(item['date'] for item in price_history)
+        prices = [float(item['price']) for item in price_history]
+        if np.any(dates[1:] < dates[:-1]) or (self.last_date is not None and dates[0] < self.last_date):
+            raise ValueError('Price history points must be appended in date order')
+        if self.start_date is None:
+            self.start_date = dates[0]
+        for day, price in zip(days_between(dates, self.start_date).tolist(), prices):
+            self.add(day, price)
+        self.last_date = dates[-1]
+
+    @property
+    def slope(self):
+        return self.cxy / self.cxx if self.cxx > 0 else 0.0
+
+    @property
+    def intercept(self):
+        return self.mean_y - self.slope * self.mean_x
+
+    @property
+    def r2(self):
+        if self.cyy == 0:
+            # A constant series is fitted perfectly
+            return 1.0
+        if self.cxx == 0:
+            return 0.0
+        return (self.cxy * self.cxy) / (self.cxx * self.cyy)
+
+    def summary(self):
+        """Trend in the same shape PricePredictionEngine.calculate_trend returns"""
+        return {
+            'trend': classify_trend(self.slope),
+            'slope': round(self.slope, 4),
+            'r2_score': round(self.r2, 3),
+            'intercept': round(self.intercept, 4),
+            'version': self.version
+        }
+
+
+class TrendStateStore:
+    """Per-product IncrementalTrend states in an LRU with a per-entry time to live, safe to update from request threads"""
+
+    def __init__(self, max_size=100_000, ttl_seconds=86_400):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls):
+        """Build a store sized by TREND_STATE_SIZE and TREND_STATE_TTL environment variables"""
+        return cls(
+            max_size=int(os.environ.get('TREND_STATE_SIZE', 100_000)),
+            ttl_seconds=float(os.environ.get('TREND_STATE_TTL', 86_400))
+        )
+
+    def apply(self, product_id, since_version, points):
+        """Apply the points recorded after ``since_version`` and return the new summary.
+
+        ``since_version=0`` starts the product over from a full history.
+        """
+        now = time.monotonic()
+        with self._lock:
+            expires_at, state = self._states.get(product_id, (None, None))
+            if state is not None and expires_at <= now:
+                del self._states[product_id]
+                state = None
+            if since_version == 0:
+                state = IncrementalTrend()
+            elif state is None or state.version != since_version:
+                raise VersionConflict(state.version if state else 0)
+            state.extend(points)
+            self._states[product_id] = (now + self.ttl_seconds, state)
+            self._states.move_to_end(product_id)
+            while len(self._states) > self.max_size:
+                self._states.popitem(last=False)
+                self.evictions += 1
+            return state.summary()
+
+    def stats(self):
+        """Counters for health/metrics endpoints"""
+        with self._lock:
+            return {
+                'size': len(self._states),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl_seconds,
+                'evictions': self.evictions
+            }
+
+    def __len__(self):
+        return len(self._states)
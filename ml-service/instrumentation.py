@@ -0,0 +1,247 @@
+"""Low-overhead service metrics in the Prometheus text exposition format.
+
+Histograms keep fixed bucket counts per label set behind one lock, so an
+observation is a ``perf_counter`` delta, a bisect and an increment. Metrics
+live in the process that recorded them; with several worker processes each
+one exposes its own /metrics, which Prometheus aggregates by instance.
+
+Configuration:
+    ML_METRICS   set to 'false' to disable recording and the /metrics endpoint
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import Response, g, request
+
+METRICS_ENABLED = os.environ.get('ML_METRICS', 'true').lower() == 'true'
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; pipeline stages take from microseconds (trend) to seconds (large batches)
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+LENGTH_BUCKETS = (5, 10, 30, 90, 180, 365, 730, 1825, 3650, 10000)
+
+
+def _labels_text(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic count per label set"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for label_values, value in sorted(values.items()):
+            yield f'{self.name}{_labels_text(self.labels, label_values)} {_number(value)}'
+
+
+class Histogram:
+    """Bucketed observations per label set, rendered with cumulative ``le`` buckets"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # bucket counts (the last one is +Inf), sum
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, *label_values):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def samples(self):
+        with self._lock:
+            series = {key: (list(counts), total) for key, (counts, total) in self._series.items()}
+        names = self.labels + ('le',)
+        for label_values, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                yield f'{self.name}_bucket{_labels_text(names, label_values + (_number(bound),))} {cumulative}'
+            labels = _labels_text(self.labels, label_values)
+            yield f'{self.name}_sum{labels} {_number(total)}'
+            yield f'{self.name}_count{labels} {cumulative}'
+
+
+class MetricsRegistry:
+    """Named metrics plus collectors that report values owned elsewhere (cache stats, store sizes) at scrape time"""
+
+    def __init__(self, enabled=METRICS_ENABLED):
+        self.enabled = enabled
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help_text, labels=()):
+        metric = Counter(name, help_text, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help_text, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, func):
+        """Register ``func() -> [(name, type, help, value), ...]`` read at scrape time"""
+        self._collectors.append(func)
+        return func
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        for collect in self._collectors:
+            for name, kind, help_text, value in collect():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                lines.append(f'{name} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+class ServiceMetrics:
+    """The metrics every ML service endpoint and pipeline stage records"""
+
+    def __init__(self, registry=None):
+        self.registry = registry or MetricsRegistry()
+        self.stage_seconds = self.registry.histogram(
+            'ml_stage_duration_seconds', 'Time spent in each pipeline stage', ('stage',))
+        self.request_seconds = self.registry.histogram(
+            'ml_request_duration_seconds', 'Request latency by endpoint', ('endpoint', 'method'))
+        self.requests = self.registry.counter(
+            'ml_requests_total', 'Requests by endpoint and status code', ('endpoint', 'status'))
+        self.errors = self.registry.counter(
+            'ml_request_errors_total', 'Requests answered with a 4xx/5xx status', ('endpoint', 'status'))
+        self.request_bytes = self.registry.histogram(
+            'ml_request_size_bytes', 'Request body size', ('endpoint',), SIZE_BUCKETS)
+        self.response_bytes = self.registry.histogram(
+            'ml_response_size_bytes', 'Response body size (unstreamed responses)', ('endpoint',), SIZE_BUCKETS)
+        self.history_points = self.registry.histogram(
+            'ml_history_points', 'Price points per analyzed history', ('endpoint',), LENGTH_BUCKETS)
+
+    @property
+    def enabled(self):
+        return self.registry.enabled
+
+    def stage(self, name):
+        """Context manager timing one pipeline stage"""
+        if not self.registry.enabled:
+            return _NOOP
+        return self.stage_seconds.time(name)
+
+    def timed(self, name):
+        """Decorator timing every call of a function as stage ``name``"""
+        def decorate(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.registry.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.stage_seconds.observe(time.perf_counter() - start, name)
+            return wrapper
+        return decorate
+
+    def observe_history(self, points):
+        if self.registry.enabled:
+            self.history_points.observe(points, _endpoint())
+
+    def instrument(self, app):
+        """Record per-endpoint latency, status and sizes for ``app`` and serve GET /metrics"""
+        if not self.registry.enabled:
+            return
+
+        @app.before_request
+        def start_timer():
+            g.metrics_start = time.perf_counter()
+
+        @app.after_request
+        def record_request(response):
+            start = g.pop('metrics_start', None)
+            if start is None:
+                return response
+            endpoint = _endpoint()
+            # Streamed bodies are still being generated; this times the headers
+            self.request_seconds.observe(time.perf_counter() - start, endpoint, request.method)
+            self.requests.inc(endpoint, str(response.status_code))
+            if response.status_code >= 400:
+                self.errors.inc(endpoint, str(response.status_code))
+            if request.content_length is not None:
+                self.request_bytes.observe(request.content_length, endpoint)
+            if not response.is_streamed and response.content_length is not None:
+                self.response_bytes.observe(response.content_length, endpoint)
+            return response
+
+        @app.route('/metrics', methods=['GET'])
+        def metrics_endpoint():
+            return Response(self.registry.render(), mimetype=None, content_type=CONTENT_TYPE)
+
+
+def _endpoint():
+    # The route pattern rather than the raw path, so unknown paths share one label
+    rule = request.url_rule
+    return rule.rule if rule is not None else 'unmatched'
+
+
+class _NoopTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopTimer()
@@ -0,0 +1,30 @@
+import importlib
+
+
+class LazyModule:
+    """Stand-in for a module that is only imported on first attribute access.
+
+    Lets the service answer /health without paying for pandas/sklearn at
+    startup; ``load()`` imports eagerly, e.g. from a pre-fork warmup.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def load(self):
+        if self._module is None:
+            # importlib serializes concurrent first imports with the import lock
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self.loaded else 'not loaded'
+        return f"<LazyModule '{self._name}' ({state})>"
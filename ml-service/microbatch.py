@@ -0,0 +1,111 @@
+"""Coalesce concurrent single-item calls into batches.
+
+Request threads ``submit`` work items; a dispatcher thread collects them for up
+to ``window`` seconds (or until ``max_batch_size`` items are waiting), runs one
+``process_batch(items)`` call for the whole batch and hands every caller its
+own result through a Future. Items submitted with the same key while an
+identical one is queued or running share its Future (single-flight), so
+concurrent duplicate requests are computed once.
+
+``process_batch`` returns one result per item, in order; an item whose result
+is an Exception instance raises it in its caller only.
+
+Configuration (used by app.py):
+    MICROBATCH_WINDOW_MS   collection window; 0 (default) disables batching
+    MICROBATCH_MAX_SIZE    items per batch (default 32)
+"""
+import logging
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """Dispatcher thread that batches submitted items; safe to share across request threads"""
+
+    def __init__(self, process_batch, window=0.003, max_batch_size=32):
+        self.process_batch = process_batch
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self._pending = []
+        self._inflight = {}
+        self._cond = threading.Condition()
+        self._thread = None
+        self.batches = 0
+        self.items = 0
+        self.deduplicated = 0
+        self.largest_batch = 0
+
+    def submit(self, key, item):
+        """Queue ``item`` and return a Future for its result; ``key=None`` opts out of deduplication"""
+        with self._cond:
+            if key is not None:
+                future = self._inflight.get(key)
+                if future is not None:
+                    self.deduplicated += 1
+                    return future
+            future = Future()
+            if key is not None:
+                self._inflight[key] = future
+            self._pending.append((key, item, future))
+            # Started on first use, so each forked worker gets its own thread
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='microbatch', daemon=True)
+                self._thread.start()
+            if len(self._pending) == 1 or len(self._pending) >= self.max_batch_size:
+                self._cond.notify()
+        return future
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            deadline = time.monotonic() + self.window
+            while len(self._pending) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                results = self.process_batch([item for _, item, _ in batch])
+            except Exception as e:
+                logger.error(f"Micro-batch of {len(batch)} failed: {str(e)}")
+                results = [e] * len(batch)
+
+            for (_, _, future), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+            with self._cond:
+                # Removed only after the results are set: a duplicate that found
+                # the Future until now gets the finished result
+                for key, _, future in batch:
+                    if key is not None and self._inflight.get(key) is future:
+                        del self._inflight[key]
+                self.batches += 1
+                self.items += len(batch)
+                self.largest_batch = max(self.largest_batch, len(batch))
+
+    def stats(self):
+        """Counters for health/metrics endpoints"""
+        with self._cond:
+            return {
+                'window_ms': self.window * 1000,
+                'max_batch_size': self.max_batch_size,
+                'batches': self.batches,
+                'items': self.items,
+                'deduplicated': self.deduplicated,
+                'largest_batch': self.largest_batch,
+                'mean_batch_size': round(self.items / self.batches, 2) if self.batches else 0.0
+            }
@@ -0,0 +1,83 @@
+"""Process-pool execution for large batch requests.
+
+Batches are split into contiguous chunks, each chunk is handled by one worker
+process and the per-chunk result lists are concatenated in submission order,
+so callers get results in input order. Chunk functions must be module-level
+(picklable) and report per-item errors in their returned records rather than
+raising.
+
+Workers are started from a forkserver (spawned where that is unavailable)
+rather than forked from the threaded server, so they never inherit locks held
+by other threads; each worker imports the chunk function's module once.
+
+Configuration:
+    BATCH_EXECUTION   'serial' (default) or 'process'
+    BATCH_WORKERS     worker processes in the shared pool (capped at CPU count)
+    PARALLEL_MIN_BATCH  smaller batches always run in-process
+"""
+import logging
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+EXECUTION_MODES = ('serial', 'process')
+BATCH_EXECUTION = os.environ.get('BATCH_EXECUTION', 'serial')
+MAX_WORKERS = os.cpu_count() or 1
+BATCH_WORKERS = max(1, min(int(os.environ.get('BATCH_WORKERS', MAX_WORKERS)), MAX_WORKERS))
+PARALLEL_MIN_BATCH = int(os.environ.get('PARALLEL_MIN_BATCH', 64))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def pool_context():
+    """Start method for pool workers: forking a multithreaded process can deadlock the child"""
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+
+def get_pool():
+    """Shared worker pool, created on first use; bounds worker processes for all requests"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=BATCH_WORKERS, mp_context=pool_context())
+            logger.info(f"Started batch worker pool with {BATCH_WORKERS} processes")
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+def chunked(items, chunk_size):
+    return [items[start:start + chunk_size] for start in range(0, len(items), chunk_size)]
+
+
+def run_chunked(chunk_func, items, execution=None, pool=None, workers=BATCH_WORKERS, chunk_size=None):
+    """Apply ``chunk_func`` (list -> list of records) to ``items`` and return the records in order.
+
+    With ``execution='process'`` and a batch of at least PARALLEL_MIN_BATCH
+    items, chunks run on ``pool`` (the shared pool by default, which has
+    ``workers`` processes); otherwise everything runs in the calling thread.
+    """
+    execution = execution or BATCH_EXECUTION
+    if execution != 'process' or len(items) < PARALLEL_MIN_BATCH:
+        return chunk_func(items)
+
+    # A few chunks per worker keeps the pool busy when chunks take uneven time
+    chunk_size = chunk_size or max(1, math.ceil(len(items) / (workers * 4)))
+
+    results = []
+    for chunk_results in (pool or get_pool()).map(chunk_func, chunked(items, chunk_size)):
+        results.extend(chunk_results)
+    return results
@@ -0,0 +1,154 @@
+"""Background precomputation of /predict results for the stored catalog.
+
+A scheduler thread walks every product of a HistoryStore on a fixed interval,
+or as soon as ``notify()`` reports a change, and recomputes only products
+whose history version differs from the version their stored result was
+computed from. Results are kept JSON-encoded in a ResultTable, so a lookup is
+a dict access plus string concatenation.
+
+A looked-up entry is marked ``stale`` when the product's history has changed
+since it was computed; the next pass replaces it. Each worker process keeps
+its own table, so prefer one threaded worker (see README) when enabling this.
+
+Configuration (used by app.py):
+    PRECOMPUTE_INTERVAL    seconds between passes; 0 (default) disables precomputation
+    PRECOMPUTE_EXECUTION   'serial' or 'process' (default BATCH_EXECUTION)
+"""
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class ResultTable:
+    """product_id -> (history version, computed_at, JSON-encoded result)"""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, product_id):
+        return self._entries.get(product_id)
+
+    def version(self, product_id):
+        entry = self._entries.get(product_id)
+        return entry[0] if entry is not None else None
+
+    def set_many(self, rows):
+        """Store (product_id, version, result dict) rows"""
+        computed_at = datetime.now().isoformat()
+        encoded = [(product_id, (version, computed_at, json.dumps(result))) for product_id, version, result in rows]
+        with self._lock:
+            self._entries.update(encoded)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class PrecomputeScheduler:
+    """Keeps a ResultTable up to date with a HistoryStore.
+
+    ``compute(histories)`` takes a list of StoredHistory and returns one
+    result dict (or Exception) per history, in order.
+    """
+
+    def __init__(self, history_store, compute, interval=300, chunk_size=1024):
+        self.history_store = history_store
+        self.compute = compute
+        self.interval = interval
+        self.chunk_size = chunk_size
+        self.table = ResultTable()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.passes = 0
+        self.computed = 0
+        self.failed = 0
+        self.last_pass_seconds = None
+
+    def start(self):
+        """Run passes in a background thread; forked workers (gunicorn --preload) restart their own"""
+        if self._thread is None:
+            os.register_at_fork(after_in_child=self._start_in_child)
+            self._start_thread()
+
+    def _start_thread(self):
+        self._thread = threading.Thread(target=self._run, name='precompute', daemon=True)
+        self._thread.start()
+        logger.info(f"Precompute scheduler started (every {self.interval}s)")
+
+    def _start_in_child(self):
+        # Threads do not survive fork; the child's table keeps the parent's results
+        self._wakeup = threading.Event()
+        self._start_thread()
+
+    def notify(self):
+        """Start a pass now instead of at the next interval"""
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            try:
+                self.run_pass()
+            except Exception as e:
+                logger.error(f"Precompute pass failed: {str(e)}")
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+    def stale_products(self):
+        """Ids of products with no result or a result for an older history version"""
+        return [
+            product_id for product_id, version in self.history_store.versions()
+            if self.table.version(product_id) != version
+        ]
+
+    def run_pass(self):
+        """Recompute every stale product and return how many were computed"""
+        started = time.perf_counter()
+        stale = self.stale_products()
+        computed = 0
+        for start in range(0, len(stale), self.chunk_size):
+            histories = [self.history_store.get(product_id) for product_id in stale[start:start + self.chunk_size]]
+            histories = [history for history in histories if history is not None]
+            rows = []
+            for history, result in zip(histories, self.compute(histories)):
+                if isinstance(result, Exception):
+                    self.failed += 1
+                    logger.warning(f"Precompute failed for {history.product_id}: {str(result)}")
+                else:
+                    rows.append((history.product_id, history.version, result))
+            self.table.set_many(rows)
+            computed += len(rows)
+        self.passes += 1
+        self.computed += computed
+        self.last_pass_seconds = round(time.perf_counter() - started, 3)
+        if stale:
+            logger.info(f"Precomputed {computed} of {len(stale)} stale products in {self.last_pass_seconds}s")
+        return computed
+
+    def lookup(self, product_id):
+        """JSON document for a product's precomputed result, or None"""
+        entry = self.table.get(product_id)
+        if entry is None:
+            return None
+        version, computed_at, body = entry
+        current = self.history_store.version(product_id)
+        return (
+            f'{{"product_id": {json.dumps(product_id)}, "version": {version}, '
+            f'"computed_at": "{computed_at}", "stale": {"true" if current != version else "false"}, '
+            f'"result": {body}}}'
+        )
+
+    def stats(self):
+        """Counters for health/metrics endpoints"""
+        return {
+            'products': len(self.table),
+            'passes': self.passes,
+            'computed': self.computed,
+            'failed': self.failed,
+            'interval_seconds': self.interval,
+            'last_pass_seconds': self.last_pass_seconds
+        }
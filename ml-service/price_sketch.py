@@ -0,0 +1,204 @@
+"""Mergeable per-product price statistics: running moments and a quantile sketch.
+
+``RunningMoments`` keeps count, mean, M2 (Welford), min and max; two of them
+merge exactly with Chan's parallel formula. ``QuantileSketch`` is a KLL-style
+compactor hierarchy: level ``h`` holds items of weight ``2**h``, and a level
+that outgrows its capacity is sorted and every other item is promoted to the
+next level. With ``k`` items kept at the top level, a quantile's rank error is
+O(1/k) of the count (about 1% for k=200) while the sketch holds O(k log n)
+items. Compaction alternates which half survives, so the same points always
+give the same sketch. Until the first compaction every item is kept and
+``quantile`` matches ``np.percentile`` exactly.
+
+``PriceSketch`` pairs the two; sketches built from different shards of a
+history merge into one, so statistics can be computed in parallel.
+"""
+import math
+
+import numpy as np
+
+DEFAULT_K = 200
+
+
+class RunningMoments:
+    """Count, mean, variance, min and max, updated one batch of values at a time"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        if len(values) == 0:
+            return self
+        batch = RunningMoments()
+        batch.count = len(values)
+        batch.mean = float(values.mean())
+        batch.m2 = float(((values - batch.mean) ** 2).sum())
+        batch.min = float(values.min())
+        batch.max = float(values.max())
+        return self.merge(batch)
+
+    def merge(self, other):
+        """Combine with another RunningMoments in place (Chan et al.)"""
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.min, self.max = other.min, other.max
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def std(self):
+        """Population standard deviation, like np.std"""
+        return math.sqrt(self.m2 / self.count) if self.count else 0.0
+
+
+class QuantileSketch:
+    """KLL-style mergeable quantile sketch"""
+
+    def __init__(self, k=DEFAULT_K):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.count = 0
+        self._flip = 0
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self.count += len(values)
+        self._compress()
+        return self
+
+    def merge(self, other):
+        """Add another sketch's items in place"""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self._compress()
+        return self
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # An odd item out stays at this level
+                keep = items[:1] if len(items) % 2 else items[:0]
+                pairs = items[len(keep):]
+                self._flip ^= 1
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], pairs[self._flip::2]])
+                self.levels[level] = keep
+            level += 1
+
+    def copy(self):
+        """Independent sketch with the same items and compaction state"""
+        clone = QuantileSketch(self.k)
+        # Levels are replaced, never modified in place, so they can be shared
+        clone.levels = list(self.levels)
+        clone.count = self.count
+        clone._flip = self._flip
+        return clone
+
+    @property
+    def exact(self):
+        """True while no item has been compacted away"""
+        return all(len(items) == 0 for items in self.levels[1:])
+
+    def quantile(self, q):
+        """Approximate q-quantile (0 <= q <= 1); exact np.percentile while the sketch is exact"""
+        if self.count == 0:
+            raise ValueError('Quantile of an empty sketch')
+        if self.exact:
+            return float(np.percentile(self.levels[0], q * 100))
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2.0 ** level) for level, items in enumerate(self.levels)])
+        order = np.argsort(values, kind='stable')
+        values, weights = values[order], weights[order]
+        # Each item stands for the ranks it covers; interpolate between the centres
+        centres = np.cumsum(weights) - weights / 2
+        return float(np.interp(q * weights.sum(), centres, values))
+
+    def __len__(self):
+        return sum(len(items) for items in self.levels)
+
+
+class PriceSketch:
+    """Running moments plus a quantile sketch of one product's prices"""
+
+    def __init__(self, k=DEFAULT_K):
+        self.moments = RunningMoments()
+        self.quantiles = QuantileSketch(k)
+
+    @classmethod
+    def from_prices(cls, prices, k=DEFAULT_K):
+        return cls(k).update(prices)
+
+    def update(self, prices):
+        """Add new price points"""
+        self.moments.update(prices)
+        self.quantiles.update(prices)
+        return self
+
+    def merge(self, other):
+        """Add the points summarized by another sketch (e.g. another shard of the history)"""
+        self.moments.merge(other.moments)
+        self.quantiles.merge(other.quantiles)
+        return self
+
+    def copy(self):
+        clone = PriceSketch(self.quantiles.k)
+        clone.moments.merge(self.moments)
+        clone.quantiles = self.quantiles.copy()
+        return clone
+
+    @property
+    def count(self):
+        return self.moments.count
+
+    @property
+    def mean(self):
+        return self.moments.mean
+
+    @property
+    def std(self):
+        return self.moments.std
+
+    @property
+    def min(self):
+        return self.moments.min
+
+    @property
+    def max(self):
+        return self.moments.max
+
+    def quantile(self, q):
+        return self.quantiles.quantile(q)
+
+
+def merge_sketches(sketches):
+    """One PriceSketch summarizing all of ``sketches``"""
+    merged = None
+    for sketch in sketches:
+        merged = sketch.copy() if merged is None else merged.merge(sketch)
+    return merged
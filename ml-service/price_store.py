@@ -0,0 +1,191 @@
+"""Columnar, memory-mapped price-history store.
+
+All products share two contiguous arrays, so a catalog of 1M products x 365
+days takes ~2.9 GB and any product is two slices away:
+
+    prices.f32   float32 prices, product after product
+    days.i32     int32 days since 1970-01-01 for each price
+    offsets.i64  int64 start of each product in the arrays (products + 1 entries)
+    ids.txt      one product id per line, in row order
+    meta.json    format version and counts
+
+Readers open the arrays with ``numpy.memmap``, so lookups are zero-copy views
+and worker processes opening the same store share the page cache.
+"""
+import json
+import os
+import shutil
+
+import numpy as np
+
+from date_utils import parse_dates
+
+STORE_FORMAT = 'shopsmart-price-store'
+STORE_VERSION = 1
+
+EPOCH_DAY = np.datetime64('1970-01-01', 'D')
+
+
+def history_to_columns(price_history):
+    """Convert [{'date', 'price'}, ...] into date-sorted (epoch days, prices) arrays"""
+    dates = parse_dates(item['date'] for item in price_history)
+    prices = np.array([item['price'] for item in price_history], dtype=np.float32)
+    order = np.argsort(dates, kind='stable')
+    days = (dates[order].astype('datetime64[D]') - EPOCH_DAY).astype(np.int32)
+    return days, prices[order]
+
+
+def iter_catalog(path):
+    """Yield product dicts from a JSON (object or array) or JSONL file"""
+    if path.endswith('.jsonl'):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        return
+    with open(path) as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        yield data
+    else:
+        yield from data
+
+
+def product_id_of(product):
+    """Catalog id of a product document"""
+    for key in ('_id', 'product_id', 'id'):
+        if product.get(key) is not None:
+            return str(product[key])
+    raise KeyError('Product has no _id')
+
+
+class PriceStoreWriter:
+    """Append-only writer; products stream straight to disk with constant memory.
+
+    Files are written to ``<path>.tmp`` and moved into place by ``close()``,
+    so readers never see a partially written store.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = f'{path}.tmp'
+        if os.path.exists(self.tmp_path):
+            shutil.rmtree(self.tmp_path)
+        os.makedirs(self.tmp_path)
+        self._prices = open(os.path.join(self.tmp_path, 'prices.f32'), 'wb')
+        self._days = open(os.path.join(self.tmp_path, 'days.i32'), 'wb')
+        self._offsets = open(os.path.join(self.tmp_path, 'offsets.i64'), 'wb')
+        self._ids = open(os.path.join(self.tmp_path, 'ids.txt'), 'w')
+        self._offsets.write(np.int64(0).tobytes())
+        self.products = 0
+        self.points = 0
+
+    def add(self, product_id, days, prices):
+        """Append one product's epoch-day and price arrays"""
+        if len(days) != len(prices):
+            raise ValueError('days and prices must have the same length')
+        product_id = str(product_id)
+        if '\n' in product_id:
+            raise ValueError('Product ids cannot contain newlines')
+        self._days.write(np.ascontiguousarray(days, dtype=np.int32).tobytes())
+        self._prices.write(np.ascontiguousarray(prices, dtype=np.float32).tobytes())
+        self.points += len(prices)
+        self.products += 1
+        self._offsets.write(np.int64(self.points).tobytes())
+        self._ids.write(product_id + '\n')
+
+    def add_block(self, product_ids, days, prices):
+        """Append equal-length products at once from a (products, points) price matrix and their shared days"""
+        prices = np.ascontiguousarray(prices, dtype=np.float32)
+        product_ids = [str(product_id) for product_id in product_ids]
+        if prices.shape != (len(product_ids), len(days)):
+            raise ValueError('prices must have one row per product and one column per day')
+        if any('\n' in product_id for product_id in product_ids):
+            raise ValueError('Product ids cannot contain newlines')
+        self._days.write(np.tile(np.asarray(days, dtype=np.int32), len(product_ids)).tobytes())
+        self._prices.write(prices.tobytes())
+        ends = self.points + len(days) * np.arange(1, len(product_ids) + 1, dtype=np.int64)
+        self._offsets.write(ends.tobytes())
+        self.points += prices.size
+        self.products += len(product_ids)
+        self._ids.write(''.join(product_id + '\n' for product_id in product_ids))
+
+    def add_history(self, product_id, price_history):
+        """Append one product from its JSON-style price history"""
+        self.add(product_id, *history_to_columns(price_history))
+
+    def close(self):
+        for handle in (self._prices, self._days, self._offsets, self._ids):
+            handle.close()
+        with open(os.path.join(self.tmp_path, 'meta.json'), 'w') as f:
+            json.dump({
+                'format': STORE_FORMAT,
+                'version': STORE_VERSION,
+                'products': self.products,
+                'points': self.points
+            }, f)
+        if os.path.exists(self.path):
+            shutil.rmtree(self.path)
+        os.replace(self.tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            for handle in (self._prices, self._days, self._offsets, self._ids):
+                handle.close()
+            shutil.rmtree(self.tmp_path, ignore_errors=True)
+
+
+def _memmap(path, dtype, count):
+    # np.memmap cannot map an empty file
+    if count == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=(count,))
+
+
+class PriceStore:
+    """Read-only view of a store directory with O(1) lookup by product id"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        if self.meta.get('format') != STORE_FORMAT or self.meta.get('version') != STORE_VERSION:
+            raise ValueError(f'Unsupported price store at {path}')
+
+        products, points = self.meta['products'], self.meta['points']
+        self.prices = _memmap(os.path.join(path, 'prices.f32'), np.float32, points)
+        self.days = _memmap(os.path.join(path, 'days.i32'), np.int32, points)
+        self.offsets = _memmap(os.path.join(path, 'offsets.i64'), np.int64, products + 1)
+        with open(os.path.join(path, 'ids.txt')) as f:
+            self.ids = f.read().splitlines()
+        self._rows = {product_id: row for row, product_id in enumerate(self.ids)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, product_id):
+        return product_id in self._rows
+
+    def row(self, product_id):
+        """Row index of a product; raises KeyError for unknown ids"""
+        return self._rows[product_id]
+
+    def columns(self, product_id):
+        """Zero-copy (epoch days, prices) views of one product's history"""
+        row = self._rows[product_id]
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return self.days[start:end], self.prices[start:end]
+
+    def history(self, product_id):
+        """One product's history in the [{'date', 'price'}, ...] request format"""
+        days, prices = self.columns(product_id)
+        dates = (EPOCH_DAY + days.astype('timedelta64[D]')).astype(str)
+        return [
+            {'date': date, 'price': round(price, 2)}
+            for date, price in zip(dates.tolist(), prices.tolist())
+        ]
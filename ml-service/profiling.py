@@ -0,0 +1,135 @@
+"""Opt-in cProfile profiling of individual requests.
+
+A request is profiled when it carries ``X-Profile: 1`` (and header triggers are
+enabled) or when it is picked by the sampling rate. Its profile is written to
+PROFILE_DIR as ``<time>-<endpoint>-<id>.prof`` (open with ``python -m pstats``
+or snakeviz) and the file name is returned in the ``X-Profile-File`` header.
+``X-Profile: top`` also returns the slowest functions by cumulative time in
+``X-Profile-Top``.
+
+One request is profiled at a time: a request that would be profiled while
+another one is runs unprofiled and gets ``X-Profile-Skipped``. This keeps the
+profiling slowdown to one request and avoids Python 3.12+'s limit of one
+active profiler per process. When neither trigger is enabled no hooks are
+installed, so disabled profiling costs nothing.
+
+Streamed responses are profiled up to the point their body starts streaming.
+
+Configuration:
+    PROFILE_HEADER       'true' to honour the X-Profile request header
+    PROFILE_SAMPLE_RATE  fraction of requests to profile (0 disables sampling)
+    PROFILE_DIR          where profiles are written (default ./profiles)
+    PROFILE_TOP          functions listed in X-Profile-Top (default 5)
+"""
+import cProfile
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+import uuid
+
+from flask import g, request
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Profile'
+
+
+class RequestProfiler:
+    """Profiles sampled or header-flagged requests of a Flask app"""
+
+    def __init__(self, directory='profiles', sample_rate=0.0, allow_header=False, top=5):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.allow_header = allow_header
+        self.top = top
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            directory=os.environ.get('PROFILE_DIR', 'profiles'),
+            sample_rate=float(os.environ.get('PROFILE_SAMPLE_RATE', 0)),
+            allow_header=os.environ.get('PROFILE_HEADER', 'false').lower() == 'true',
+            top=int(os.environ.get('PROFILE_TOP', 5))
+        )
+
+    @property
+    def enabled(self):
+        return self.allow_header or self.sample_rate > 0
+
+    def wanted(self):
+        """Whether the current request should be profiled"""
+        flag = request.headers.get(PROFILE_HEADER, '').lower()
+        if self.allow_header and flag in ('1', 'true', 'top'):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def instrument(self, app):
+        """Install the profiling hooks on ``app`` if profiling is enabled"""
+        if not self.enabled:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        logger.info(f"Request profiling enabled (header={self.allow_header}, "
+                    f"sample_rate={self.sample_rate}) writing to {self.directory}")
+
+        @app.before_request
+        def start_profile():
+            if not self.wanted():
+                return
+            if not self._lock.acquire(blocking=False):
+                g.profile_skipped = True
+                return
+            profiler = cProfile.Profile()
+            g.profiler = profiler
+            profiler.enable()
+
+        @app.after_request
+        def finish_profile(response):
+            profiler = g.pop('profiler', None)
+            if profiler is None:
+                if g.pop('profile_skipped', False):
+                    response.headers['X-Profile-Skipped'] = 'another request is being profiled'
+                return response
+            try:
+                profiler.disable()
+                path = self.dump(profiler)
+                response.headers['X-Profile-File'] = os.path.basename(path)
+                if request.headers.get(PROFILE_HEADER, '').lower() == 'top':
+                    response.headers['X-Profile-Top'] = self.summary(profiler)
+            except Exception as e:
+                logger.error(f"Profile error: {str(e)}")
+            finally:
+                self._lock.release()
+            return response
+
+        @app.teardown_request
+        def release_profile(error):
+            # after_request is skipped when the request raised
+            profiler = g.pop('profiler', None)
+            if profiler is not None:
+                profiler.disable()
+                self._lock.release()
+
+    def dump(self, profiler):
+        """Write a profile for the current request and return its path"""
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        name = '{}-{}-{}.prof'.format(
+            time.strftime('%Y%m%dT%H%M%S'),
+            endpoint.strip('/').replace('/', '_').replace('<', '').replace('>', '') or 'root',
+            uuid.uuid4().hex[:8]
+        )
+        path = os.path.join(self.directory, name)
+        profiler.dump_stats(path)
+        return path
+
+    def summary(self, profiler):
+        """'function (file:line) 12.3ms; ...' for the top functions by cumulative time"""
+        stats = pstats.Stats(profiler).stats
+        slowest = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:self.top]
+        return '; '.join(
+            f'{func} ({os.path.basename(filename)}:{line}) {cumulative * 1000:.1f}ms'
+            for (filename, line, func), (_, _, _, cumulative, _) in slowest
+        )
@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def _key_default(value):
+    # Columnar histories hash their arrays instead of being serialized point by point
+    cache_token = getattr(value, 'cache_token', None)
+    return cache_token() if cache_token is not None else str(value)
+
+
+def make_cache_key(*parts):
+    """Content hash of JSON-serializable request parts"""
+    encoded = json.dumps(parts, sort_keys=True, separators=(',', ':'), default=_key_default).encode()
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+class ResultCache:
+    """Thread-safe in-process LRU cache with a per-entry time to live"""
+
+    def __init__(self, max_size=1024, ttl_seconds=300):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @classmethod
+    def from_env(cls, prefix='PREDICTION_CACHE'):
+        """Build a cache sized by <prefix>_SIZE and <prefix>_TTL environment variables"""
+        return cls(
+            max_size=int(os.environ.get(f'{prefix}_SIZE', 1024)),
+            ttl_seconds=float(os.environ.get(f'{prefix}_TTL', 300))
+        )
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss"""
+        if self.max_size <= 0:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """Store value under key, evicting the least recently used entries if full"""
+        if self.max_size <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Counters for health/metrics endpoints"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,166 @@
+"""Periodogram (rFFT) detection of weekly, monthly and yearly price cycles.
+
+Histories are resampled onto a daily grid, cut to the most recent standard
+window and analyzed per window length with one ``rfft`` along the batch. A
+cycle is reported when its band's strongest bin stands out from the
+neighbouring bins of the whitened (price change) spectrum and moves the price
+by a useful amount; its phase gives the next low (``next_low_in_days``,
+``best_phase``).
+"""
+import numpy as np
+
+# name -> (nominal period, shortest and longest period of the band) in days
+CYCLES = {
+    'weekly': (7, 6.0, 8.5),
+    'monthly': (30.44, 26.0, 35.0),
+    'yearly': (365.25, 300.0, 430.0),
+}
+
+# Analysis windows in days; multiples of 7 so the weekly cycle falls on a bin.
+# A cycle needs two full periods, so 735 is the shortest window with a yearly one.
+WINDOWS = (14, 28, 56, 91, 182, 364, 728, 735, 1092, 1456, 1820)
+
+# Target chance per searched band of a random-walk bin passing the prominence test
+FALSE_ALARM_RATE = 0.01
+# Minimum number of frequency bins the background power is estimated from
+NEIGHBOURS = 16
+# Smallest cycle worth reporting: half the peak-to-trough swing / mean price
+MIN_AMPLITUDE = 0.005
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+          'August', 'September', 'October', 'November', 'December']
+
+
+def window_length(span_days):
+    """Longest standard window that fits in a history spanning ``span_days`` + 1 days, or 0"""
+    fitting = [window for window in WINDOWS if window <= span_days + 1]
+    return fitting[-1] if fitting else 0
+
+
+def resample_daily(days, prices, length):
+    """The last ``length`` days of a history, linearly interpolated onto a daily grid"""
+    end = days[-1]
+    grid = np.arange(end - length + 1, end + 1, dtype=float)
+    return np.interp(grid, days, prices)
+
+
+def periodogram(series):
+    """Detrended, mean-normalized rFFT coefficients of a (products, n) matrix of daily prices"""
+    n = series.shape[1]
+    t = np.arange(n, dtype=float)
+    t_centered = t - t.mean()
+    mean = series.mean(axis=1)
+    slope = (series - mean[:, None]) @ t_centered / (t_centered @ t_centered)
+    residual = series - mean[:, None] - slope[:, None] * t_centered
+    return np.fft.rfft(residual / mean[:, None], axis=1)
+
+
+def detect_cycle_matrix(series, false_alarm_rate=FALSE_ALARM_RATE, min_amplitude=MIN_AMPLITUDE):
+    """Cycle statistics for equal-length daily series.
+
+    Returns ``{cycle name: dict of per-row arrays}`` with ``detected``,
+    ``period``, ``strength``, ``prominence``, ``amplitude`` (half the
+    peak-to-trough swing relative to the mean price) and ``low_offset`` (days
+    after the last sample until the cycle's next minimum).
+    """
+    rows, n = series.shape
+    coefficients = periodogram(series)
+    power = np.abs(coefficients) ** 2
+    power[:, 0] = 0.0
+    # Both halves of the spectrum count toward the variance, except Nyquist
+    total = 2 * power[:, 1:].sum(axis=1) - (power[:, -1] if n % 2 == 0 else 0)
+    top = power.shape[1] - 1
+    # Differencing multiplies the power at bin k by 4 sin^2(pi k / n)
+    whitened = power * (4 * np.sin(np.pi * np.arange(top + 1) / n) ** 2)
+    results = {}
+
+    for name, (nominal, shortest, longest) in CYCLES.items():
+        low_bin = max(1, int(np.ceil(n / longest)))
+        high_bin = min(top, int(np.floor(n / shortest)))
+        if n < 2 * nominal or low_bin > high_bin:
+            continue
+
+        peak = low_bin + np.argmax(whitened[:, low_bin:high_bin + 1], axis=1)
+        peak_power = power[np.arange(rows), peak]
+
+        # Background: median whitened power of neighbouring frequencies, peak
+        # excluded; at least NEIGHBOURS bins so the median is stable
+        first = max(1, low_bin // 2)
+        last = min(top, max(2 * high_bin + 1, first + NEIGHBOURS))
+        neighbours = whitened[:, first:last + 1].copy()
+        bins = np.arange(first, last + 1)
+        neighbours[np.abs(bins[None, :] - peak[:, None]) <= 1] = np.nan
+        with np.errstate(divide='ignore', invalid='ignore'):
+            background = _row_nanmedian(neighbours) if neighbours.shape[1] > 3 else np.full(rows, np.nan)
+            strength = np.where(total > 0, 2 * peak_power / total, 0.0)
+            prominence = whitened[np.arange(rows), peak] / background
+        # P(exponential > c * median) = 2^-c, for each of the band's bins
+        min_prominence = np.log2((high_bin - low_bin + 1) / false_alarm_rate)
+        amplitude = 2 * np.abs(coefficients[np.arange(rows), peak]) / n
+
+        period = n / peak
+        # Component = amplitude * cos(2 pi t / period + phase); minimum where the angle is pi
+        phase = np.angle(coefficients[np.arange(rows), peak])
+        first_low = np.mod((np.pi - phase) / (2 * np.pi) * period, period)
+        low_offset = first_low + period * np.floor((n - 1 - first_low) / period + 1) - (n - 1)
+
+        results[name] = {
+            'detected': (prominence >= min_prominence) & (amplitude >= min_amplitude),
+            'period': period,
+            'strength': strength,
+            'prominence': prominence,
+            'amplitude': amplitude,
+            'low_offset': low_offset,
+        }
+    return results
+
+
+def _row_nanmedian(values):
+    """Median of the non-NaN entries of every row (np.nanmedian is slow on small matrices)"""
+    ordered = np.sort(values, axis=1)  # NaN sorts last
+    count = (~np.isnan(values)).sum(axis=1)
+    lower = np.take_along_axis(ordered, ((count - 1) // 2)[:, None], axis=1)[:, 0]
+    upper = np.take_along_axis(ordered, (count // 2)[:, None], axis=1)[:, 0]
+    return (lower + upper) / 2
+
+
+def detect_cycles(histories, last_dates):
+    """Detected cycles for a batch of histories.
+
+    ``histories`` is a list of (days since start, prices) arrays sorted by day
+    and ``last_dates`` the ``datetime64`` date of each history's last point.
+    Returns one list of cycle dicts per history.
+    """
+    cycles = [[] for _ in histories]
+    groups = {}
+    for row, (days, _) in enumerate(histories):
+        length = window_length(days[-1] - days[0]) if len(days) else 0
+        if length:
+            groups.setdefault(length, []).append(row)
+
+    for length, rows in groups.items():
+        series = np.vstack([resample_daily(*histories[row], length) for row in rows])
+        for name, stats in detect_cycle_matrix(series).items():
+            for index in np.flatnonzero(stats['detected']):
+                row = rows[index]
+                offset = max(1, int(np.round(stats['low_offset'][index])))
+                low_date = (last_dates[row] + np.timedelta64(offset, 'D')).astype('datetime64[D]')
+                cycles[row].append({
+                    'cycle': name,
+                    'period_days': round(float(stats['period'][index]), 2),
+                    'strength': round(float(stats['strength'][index]), 3),
+                    'amplitude': round(float(stats['amplitude'][index]), 4),
+                    'next_low_in_days': offset,
+                    'best_phase': _phase_label(name, low_date),
+                })
+    return cycles
+
+
+def _phase_label(name, date):
+    if name == 'weekly':
+        return WEEKDAYS[int((date.astype('datetime64[D]').astype(np.int64) + 3) % 7)]
+    if name == 'monthly':
+        day = int((date - date.astype('datetime64[M]').astype('datetime64[D]')).astype(np.int64)) + 1
+        return f'Day {day} of the month'
+    return MONTHS[int(date.astype('datetime64[M]').astype(np.int64) % 12)]
@@ -0,0 +1,372 @@
+"""Catalog histories shared by every worker process through memory-mapped files.
+
+The catalog (CATALOG_PATHS) is written once into an immutable generation
+directory of flat columns, and every worker maps the same files, so the
+histories live once in the page cache however many workers read them:
+
+    dates.i64       naive wall-clock datetime64[us] of each point, product after product
+    prices.f64      float64 price of each point
+    offsets.i64     start of each product in the point arrays (products + 1 entries)
+    ids.S           product ids in row order, fixed-width UTF-8
+    names.S, categories.S, brands.S, utc_offsets.S
+    lookup.S        product ids sorted, for binary search
+    lookup_rows.i64 row of each sorted id
+    category_codes.i32, brand_codes.i32
+                    code of each row's category/brand in meta.json's labels
+    deal_*.f64      DealIndex columns of each row (see deals.DEAL_COLUMNS), when
+                    published with deal parameters
+    meta.json       format, generation number, counts, string widths, labels,
+                    deal parameters, source files
+
+Lookups binary-search the mapped ``lookup.S``, so a worker holds no
+per-product Python objects.
+
+Reloading writes generation N+1 next to the current one and then atomically
+replaces the ``CURRENT`` pointer file. Readers check the pointer at most once
+per poll interval and swap to the new generation in one assignment; a request
+that already holds a history keeps reading the old generation's mappings,
+which stay valid after the files are pruned. Writers serialize on a lock file
+(POSIX only), so concurrently starting workers build a generation once.
+
+Configuration (used by app.py):
+    SHARED_CATALOG_DIR    directory for catalog generations; unset keeps per-process catalogs
+    SHARED_CATALOG_POLL   seconds between checks for a newer generation (default 1)
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from deals import DEAL_COLUMNS, catalog_deal_columns
+from history_store import StoredHistory, history_arrays
+from price_store import iter_catalog, product_id_of
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process writer lock
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+CATALOG_FORMAT = 'shopsmart-shared-catalog'
+CATALOG_VERSION = 2
+
+STRING_COLUMNS = ('ids', 'names', 'categories', 'brands', 'utc_offsets')
+
+# Coded label columns: field -> string column
+LABEL_COLUMNS = {'category': 'categories', 'brand': 'brands'}
+
+# Generations kept on disk: the current one and the one before it
+KEEP_GENERATIONS = 2
+
+
+def _memmap(path, dtype, count):
+    # np.memmap cannot map an empty file
+    if count == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=(count,))
+
+
+def _string_column(values):
+    encoded = [value.encode('utf-8') if value else b'' for value in values]
+    width = max([1] + [len(value) for value in encoded])
+    return np.array(encoded, dtype=f'S{width}'), width
+
+
+def catalog_sources(paths):
+    """(path, size, mtime) of every catalog file, to tell whether a generation is current"""
+    sources = []
+    for path in paths:
+        stat = os.stat(path)
+        sources.append([os.path.abspath(path), stat.st_size, stat.st_mtime_ns])
+    return sources
+
+
+class CatalogGeneration:
+    """Read-only mapping of one generation directory"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        if self.meta.get('format') != CATALOG_FORMAT or self.meta.get('version') != CATALOG_VERSION:
+            raise ValueError(f'Unsupported shared catalog at {path}')
+
+        self.number = self.meta['generation']
+        products, points = self.meta['products'], self.meta['points']
+        self.dates = _memmap(os.path.join(path, 'dates.i64'), np.int64, points).view('datetime64[us]')
+        self.prices = _memmap(os.path.join(path, 'prices.f64'), np.float64, points)
+        self.offsets = _memmap(os.path.join(path, 'offsets.i64'), np.int64, products + 1)
+        self.strings = {
+            name: _memmap(os.path.join(path, f'{name}.S'), f"S{self.meta['widths'][name]}", products)
+            for name in STRING_COLUMNS
+        }
+        self.lookup = _memmap(os.path.join(path, 'lookup.S'), f"S{self.meta['widths']['ids']}", self.meta['unique'])
+        self.lookup_rows = _memmap(os.path.join(path, 'lookup_rows.i64'), np.int64, self.meta['unique'])
+        self.labels = self.meta['labels']
+        self.codes = {
+            field: _memmap(os.path.join(path, f'{field}_codes.i32'), np.int32, products) for field in LABEL_COLUMNS
+        }
+
+    def __len__(self):
+        return len(self.lookup)
+
+    def row(self, product_id):
+        """Row of a product, or None if it is not in this generation"""
+        key = product_id.encode('utf-8')
+        position = int(np.searchsorted(self.lookup, key))
+        if position < len(self.lookup) and self.lookup[position] == key:
+            return int(self.lookup_rows[position])
+        return None
+
+    def __contains__(self, product_id):
+        return self.row(product_id) is not None
+
+    def string(self, name, row):
+        """Value of a string column at ``row``, None when empty"""
+        return self.strings[name][row].decode('utf-8') or None
+
+    def deal_columns(self, percentile, window_days):
+        """Mapped DealIndex columns, or None unless published with these parameters"""
+        deals = self.meta.get('deals')
+        if deals != {'percentile': percentile, 'window_days': window_days}:
+            return None
+        products = self.meta['products']
+        return {name: _memmap(os.path.join(self.path, f'deal_{name}.f64'), np.float64, products) for name in DEAL_COLUMNS}
+
+    def get(self, product_id):
+        """Zero-copy StoredHistory of a product (version = generation number), or None"""
+        row = self.row(product_id)
+        if row is None:
+            return None
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return StoredHistory(
+            product_id, self.string('names', row) or product_id, self.dates[start:end], self.prices[start:end],
+            self.string('utc_offsets', row) or '', self.number, None,
+            self.string('categories', row), self.string('brands', row)
+        )
+
+    def ids(self):
+        """Product ids in row order (the last occurrence of a repeated id wins)"""
+        for row in np.sort(self.lookup_rows).tolist():
+            yield self.strings['ids'][row].decode('utf-8')
+
+
+class CatalogWriter:
+    """Streams products into a new generation directory"""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path)
+        self._dates = open(os.path.join(path, 'dates.i64'), 'wb')
+        self._prices = open(os.path.join(path, 'prices.f64'), 'wb')
+        self._offsets = [0]
+        self._strings = {name: [] for name in STRING_COLUMNS}
+
+    def add(self, product_id, dates, prices, name=None, category=None, brand=None, utc_offset=''):
+        """Append one product's date-sorted datetime64[us] and price arrays"""
+        if len(dates) != len(prices):
+            raise ValueError('dates and prices must have the same length')
+        self._dates.write(np.ascontiguousarray(dates, dtype='datetime64[us]').view(np.int64).tobytes())
+        self._prices.write(np.ascontiguousarray(prices, dtype=np.float64).tobytes())
+        self._offsets.append(self._offsets[-1] + len(prices))
+        for column, value in zip(STRING_COLUMNS, (product_id, name, category, brand, utc_offset)):
+            self._strings[column].append(value)
+
+    def close(self, generation, sources=None, deal_params=None):
+        """Write the remaining columns and meta.json; ``deal_params`` = (percentile, window_days) adds deal columns"""
+        self._dates.close()
+        self._prices.close()
+        np.array(self._offsets, dtype=np.int64).tofile(os.path.join(self.path, 'offsets.i64'))
+        widths = {}
+        for column, values in self._strings.items():
+            array, widths[column] = _string_column(values)
+            array.tofile(os.path.join(self.path, f'{column}.S'))
+
+        # Last occurrence of each id wins, as with repeated HistoryStore.put calls
+        rows = {product_id: row for row, product_id in enumerate(self._strings['ids'])}
+        lookup, _ = _string_column(rows)
+        order = np.argsort(lookup, kind='stable')
+        np.ascontiguousarray(lookup[order]).astype(f"S{widths['ids']}").tofile(os.path.join(self.path, 'lookup.S'))
+        np.array(list(rows.values()), dtype=np.int64)[order].tofile(os.path.join(self.path, 'lookup_rows.i64'))
+
+        labels = {}
+        for field, column in LABEL_COLUMNS.items():
+            values = self._strings[column]
+            labels[field] = [None] + sorted({value for value in values if value})
+            codes = {label: code for code, label in enumerate(labels[field])}
+            np.array([codes[value or None] for value in values], dtype=np.int32).tofile(
+                os.path.join(self.path, f'{field}_codes.i32')
+            )
+
+        deals = None
+        if deal_params is not None:
+            percentile, window_days = deal_params
+            points = self._offsets[-1]
+            columns = catalog_deal_columns(
+                _memmap(os.path.join(self.path, 'dates.i64'), np.int64, points).view('datetime64[us]'),
+                _memmap(os.path.join(self.path, 'prices.f64'), np.float64, points),
+                np.array(self._offsets, dtype=np.int64), percentile, window_days
+            )
+            for name in DEAL_COLUMNS:
+                columns[name].astype(np.float64).tofile(os.path.join(self.path, f'deal_{name}.f64'))
+            deals = {'percentile': percentile, 'window_days': window_days}
+
+        with open(os.path.join(self.path, 'meta.json'), 'w') as f:
+            json.dump({
+                'format': CATALOG_FORMAT,
+                'version': CATALOG_VERSION,
+                'generation': generation,
+                'products': len(self._offsets) - 1,
+                'unique': len(rows),
+                'points': self._offsets[-1],
+                'widths': widths,
+                'labels': labels,
+                'deals': deals,
+                'sources': sources or [],
+                'created_at': time.time()
+            }, f)
+
+
+def iter_catalog_products(paths):
+    """(product_id, dates, prices, name, category, brand, utc_offset) for every product with a history"""
+    for path in paths:
+        for product in iter_catalog(path):
+            history = product.get('priceHistory') or product.get('price_history')
+            if not history:
+                continue
+            dates, prices, utc_offset = history_arrays(history)
+            yield (
+                product_id_of(product), dates, prices, product.get('name') or product.get('product_name'),
+                product.get('category'), product.get('brand'), utc_offset
+            )
+
+
+class SharedCatalog:
+    """The current generation of a shared catalog directory, refreshed on a poll interval"""
+
+    def __init__(self, root, poll_interval=1.0, deal_params=None):
+        self.root = root
+        self.poll_interval = poll_interval
+        # (percentile, window_days) of the deal columns written into published generations
+        self.deal_params = deal_params
+        os.makedirs(root, exist_ok=True)
+        self._generation = None
+        self._checked_at = 0.0
+        self._listeners = []
+        self._refresh_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._refresh(wait=True)
+
+    @property
+    def _pointer(self):
+        return os.path.join(self.root, 'CURRENT')
+
+    def _current_name(self):
+        try:
+            with open(self._pointer) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def add_listener(self, callback):
+        """Call ``callback(generation)`` whenever this process switches to a new generation"""
+        self._listeners.append(callback)
+
+    def _refresh(self, wait=False):
+        """Switch to the generation CURRENT points at, if it is newer; returns the current generation"""
+        # One thread refreshes at a time; unless waiting, the others keep the generation they have
+        if not self._refresh_lock.acquire(blocking=wait):
+            return self._generation
+        try:
+            self._checked_at = time.monotonic()
+            name = self._current_name()
+            current = self._generation
+            if name is None or (current is not None and os.path.basename(current.path) == name):
+                return current
+            generation = CatalogGeneration(os.path.join(self.root, name))
+            self._generation = generation
+            logger.info(f"Shared catalog generation {generation.number}: {len(generation)} products")
+            for callback in self._listeners:
+                callback(generation)
+            return generation
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not open shared catalog generation in {self.root}: {str(e)}")
+            return self._generation
+        finally:
+            self._refresh_lock.release()
+
+    def current(self):
+        """The newest generation this process has mapped, checking the pointer once per poll interval"""
+        if time.monotonic() - self._checked_at >= self.poll_interval:
+            return self._refresh()
+        return self._generation
+
+    def publish(self, products, sources=None):
+        """Write ``products`` (see iter_catalog_products) as the next generation and make it current"""
+        with self._writer_lock():
+            return self._publish(products, sources)
+
+    def load(self, paths, force=False):
+        """Make the catalog files current: reuse the current generation if it was built from the same files"""
+        sources = catalog_sources(paths)
+        with self._writer_lock():
+            generation = self._refresh(wait=True)
+            if not force and generation is not None and generation.meta.get('sources') == sources:
+                return generation
+            return self._publish(iter_catalog_products(paths), sources)
+
+    def _publish(self, products, sources):
+        current = self._current_name()
+        number = int(current.split('-')[1]) + 1 if current else 1
+        name = f'gen-{number:06d}'
+        tmp_path = os.path.join(self.root, f'{name}.tmp-{os.getpid()}')
+        try:
+            writer = CatalogWriter(tmp_path)
+            for product in products:
+                writer.add(*product)
+            writer.close(number, sources, self.deal_params)
+            os.rename(tmp_path, os.path.join(self.root, name))
+        except Exception:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+        # Readers see either the old or the new pointer, never a partial one
+        pointer_tmp = f'{self._pointer}.tmp-{os.getpid()}'
+        with open(pointer_tmp, 'w') as f:
+            f.write(name)
+        os.replace(pointer_tmp, self._pointer)
+        logger.info(f"Published shared catalog {name}")
+        self._prune(name)
+        return self._refresh(wait=True)
+
+    def _prune(self, current):
+        generations = sorted(
+            entry for entry in os.listdir(self.root)
+            if entry.startswith('gen-') and '.tmp-' not in entry
+        )
+        # Mapped files of removed generations stay readable until unmapped
+        for entry in generations[:generations.index(current) + 1][:-KEEP_GENERATIONS]:
+            shutil.rmtree(os.path.join(self.root, entry), ignore_errors=True)
+
+    @contextmanager
+    def _writer_lock(self):
+        """Serialize generation writers across threads and (where flock exists) processes"""
+        with self._write_lock, open(os.path.join(self.root, '.lock'), 'a') as handle:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+            yield
+
+    def stats(self):
+        """Counters for health/metrics endpoints"""
+        generation = self._generation
+        return {
+            'generation': generation.number if generation is not None else None,
+            'products': len(generation) if generation is not None else 0,
+            'points': generation.meta['points'] if generation is not None else 0
+        }
+
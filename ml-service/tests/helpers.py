@@ -0,0 +1,19 @@
+import math
+
+
+def assert_results_close(actual, expected, rel=1e-12, path='result'):
+    """Recursive equality of JSON-like results, with floats compared to ``rel`` relative error"""
+    if isinstance(expected, dict):
+        assert isinstance(actual, dict) and actual.keys() == expected.keys(), f'{path}: {actual!r} != {expected!r}'
+        for key in expected:
+            assert_results_close(actual[key], expected[key], rel, f'{path}[{key!r}]')
+    elif isinstance(expected, (list, tuple)):
+        assert isinstance(actual, (list, tuple)) and len(actual) == len(expected), f'{path}: {actual!r} != {expected!r}'
+        for index, (left, right) in enumerate(zip(actual, expected)):
+            assert_results_close(left, right, rel, f'{path}[{index}]')
+    elif isinstance(expected, float) and math.isnan(expected):
+        assert isinstance(actual, float) and math.isnan(actual), f'{path}: {actual!r} != nan'
+    elif isinstance(expected, float) and not isinstance(actual, bool):
+        assert math.isclose(actual, expected, rel_tol=rel, abs_tol=1e-12), f'{path}: {actual!r} != {expected!r}'
+    else:
+        assert actual == expected, f'{path}: {actual!r} != {expected!r}'
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+import app as ml_app
+from batch_engine import evaluate_products
+from features import FeatureFrame
+from helpers import assert_results_close
+
+
+@pytest.fixture
+def client():
+    ml_app.prediction_cache.clear()
+    return ml_app.app.test_client()
+
+
+def price_history(seed, points):
+    rng = np.random.default_rng(seed)
+    start = np.datetime64('2024-01-01T10:30:00', 'us')
+    dates = start + np.arange(points) * np.timedelta64(1, 'D') + rng.integers(0, 3_600_000_000, points).astype('timedelta64[us]')
+    prices = np.round(rng.uniform(50, 500) * np.exp(np.cumsum(rng.normal(0, 0.02, points))), 2)
+    return [{'date': date, 'price': price} for date, price in zip(np.datetime_as_string(dates, unit='us').tolist(), prices.tolist())]
+
+
+@pytest.mark.parametrize('points, analysis_type', [(60, 'full'), (200, 'full'), (120, 'trend'), (120, 'seasonal')])
+def test_predict_by_reference_matches_inline(client, points, analysis_type):
+    # Up to PRICE_SKETCH_K points the stored sketch is exact
+    history = price_history(points, points)
+    product_id = f'ref-{points}-{analysis_type}'
+    ingested = client.post('/ingest', json={'products': [
+        {'product_id': product_id, 'product_name': 'Phone', 'price_history': history}
+    ]})
+    assert ingested.status_code == 200
+
+    current_price = history[-1]['price'] * 1.05
+    inline = client.post('/predict', json={
+        'product_name': 'Phone', 'price_history': history, 'current_price': current_price, 'analysis_type': analysis_type
+    })
+    by_reference = client.post('/predict', json={
+        'product_id': product_id, 'current_price': current_price, 'analysis_type': analysis_type
+    })
+    assert inline.status_code == by_reference.status_code == 200
+    assert_results_close(by_reference.get_json(), inline.get_json())
+
+
+def test_predict_by_reference_unknown_product(client):
+    assert client.post('/predict', json={'product_id': 'never-ingested'}).status_code == 404
+
+
+@pytest.mark.filterwarnings('ignore::sklearn.exceptions.UndefinedMetricWarning')
+def test_analyze_frames_matches_analyze_frame():
+    jobs = []
+    for seed in range(12):
+        history = price_history(100 + seed, 10 + 30 * seed)
+        df = ml_app.predictor.preprocess_data(history, 'numpy')
+        jobs.append((df, history[-1]['price'], ('full', 'trend', 'seasonal')[seed % 3], 14))
+    jobs.append((FeatureFrame({'date': np.array(['2024-01-01'], dtype='datetime64[us]'), 'price': np.array([5.0])}), 5.0, 'full', 14))
+
+    batched = ml_app.analyze_frames(jobs)
+    single = [ml_app.analyze_frame(*job) for job in jobs]
+    assert_results_close(batched, single, rel=1e-9)
+
+
+def test_batch_predict_matches_single_products(client):
+    products = [
+        {'product_id': f'b{seed}', 'product_name': f'Product {seed}', 'current_price': 100.0,
+         'price_history': price_history(200 + seed, 5 + 20 * seed)}
+        for seed in range(10)
+    ] + [{'product_id': 'bad', 'product_name': 'Bad', 'current_price': 1.0, 'price_history': []}]
+    response = client.post('/batch-predict', json={'products': products}).get_json()
+    assert response['total_processed'] == 10
+    assert response['errors'] == [evaluate_products([products[-1]])[0][1]]
+    assert_results_close(response['results'], [evaluate_products([product])[0][1] for product in products[:-1]])
+
+    # The batch trend is the trend /predict computes with sklearn for the same history
+    for product, result in zip(products, response['results']):
+        single = client.post('/predict', json={**product, 'analysis_type': 'trend'}).get_json()
+        assert (result['trend'], result['slope'], result['r2_score']) == (single['trend'], single['slope'], single['r2_score'])
+
+
+@pytest.mark.parametrize('query', ['k=abc', 'k=0', 'k=-1', 'k=2.5', 'min_discount=abc', 'min_discount=nan', 'basis=median'])
+def test_deals_rejects_bad_parameters(client, query):
+    assert client.get(f'/deals?{query}').status_code == 400
+
+
+def test_deals_returns_ingested_products(client):
+    history = [{'date': f'2024-02-{day + 1:02d}', 'price': 100.0 if day < 20 else 70.0} for day in range(21)]
+    client.post('/ingest', json={'products': [
+        {'product_id': 'deal-1', 'product_name': 'Deal', 'category': 'Deals test', 'price_history': history}
+    ]})
+    response = client.get('/deals?k=5&category=Deals%20test&min_discount=10')
+    assert response.status_code == 200
+    assert [(deal['product_id'], deal['discount_percentage']) for deal in response.get_json()['deals']] == [('deal-1', 30.0)]
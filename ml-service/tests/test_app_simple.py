@@ -0,0 +1,47 @@
+import pytest
+
+import app_simple
+import parallel
+
+
+@pytest.fixture
+def client():
+    return app_simple.app.test_client()
+
+
+def history(points):
+    return [{'date': f'2024-03-{day + 1:02d}T08:00:00Z', 'price': 100.0 + day % 5} for day in range(points)]
+
+
+def test_batch_error_records_keep_the_product_id(monkeypatch):
+    def fail(product, days):
+        raise ValueError('model failed')
+
+    monkeypatch.setattr(app_simple, 'predict_batch_product', fail)
+    assert app_simple.predict_batch_chunk([{'product_id': 'p1'}, 'not a product'], 30) == [
+        {'product_id': 'p1', 'error': 'model failed'},
+        {'product_id': None, 'error': 'model failed'},
+    ]
+
+
+def test_process_batches_match_serial(client):
+    products = [{'product_id': f'p{index}', 'price_history': history(10 + index % 20)} for index in range(parallel.PARALLEL_MIN_BATCH)]
+    products.append({'product_id': 'empty', 'price_history': []})
+    try:
+        serial = client.post('/predict/batch', json={'products': products, 'execution': 'serial'}).get_json()
+        process = client.post('/predict/batch', json={'products': products, 'execution': 'process'}).get_json()
+    finally:
+        parallel.shutdown_pool()
+    assert process['results'] == serial['results']
+    assert serial['results'][-1] == {'product_id': 'empty', 'error': 'Missing product_id or price_history'}
+
+
+def test_analyze_trend_reads_only_prices(client):
+    # Dates are not needed for the trend, so unparseable ones are accepted
+    rows = client.post('/analyze/trend', json={'price_history': [
+        {'date': 'yesterday', 'price': 100}, {'date': None, 'price': 110}
+    ]})
+    columns = client.post('/analyze/trend', json={'price_history': {'epoch_days': [19800, 19801], 'price': [100, 110]}},
+                          headers={'Content-Type': 'application/vnd.shopsmart.columnar+json'})
+    assert rows.status_code == columns.status_code == 200
+    assert rows.get_json()['change_percent'] == columns.get_json()['change_percent'] == 10.0
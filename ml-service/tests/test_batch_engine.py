@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import r2_score
+from sklearn.preprocessing import StandardScaler
+
+from batch_engine import (
+    PERCENTILES, batch_scaled_regression, batch_statistics, batch_trend, evaluate_products, history_to_arrays,
+    pack_histories
+)
+from helpers import assert_results_close
+
+# Agreement with sklearn stated in the batch_engine docstring
+RTOL = 1e-9
+
+
+def random_histories(seed, count=40):
+    rng = np.random.default_rng(seed)
+    histories = []
+    for _ in range(count):
+        length = int(rng.integers(2, 400))
+        days = np.sort(rng.choice(1000, length, replace=False)).astype(float)
+        prices = rng.uniform(20, 1500) * np.exp(np.cumsum(rng.normal(0, 0.02, length)))
+        histories.append((days, prices))
+    return histories
+
+
+def payload(product_id, days, prices, current_price):
+    start = np.datetime64('2024-01-01T09:30:00', 'us')
+    dates = np.datetime_as_string(start + days.astype(np.int64) * np.timedelta64(1, 'D'), unit='us')
+    return {
+        'product_id': product_id,
+        'product_name': f'Product {product_id}',
+        'current_price': current_price,
+        'price_history': [{'date': date, 'price': price} for date, price in zip(dates.tolist(), prices.tolist())]
+    }
+
+
+def test_batch_trend_matches_sklearn():
+    histories = random_histories(0)
+    slope, intercept, r2 = batch_trend(pack_histories(histories))
+    for row, (days, prices) in enumerate(histories):
+        model = LinearRegression().fit(days.reshape(-1, 1), prices)
+        assert slope[row] == pytest.approx(model.coef_[0], rel=RTOL, abs=1e-12)
+        assert intercept[row] == pytest.approx(model.intercept_, rel=RTOL)
+        assert r2[row] == pytest.approx(r2_score(prices, model.predict(days.reshape(-1, 1))), rel=RTOL, abs=1e-12)
+
+
+def test_batch_trend_constant_series():
+    slope, _, r2 = batch_trend(pack_histories([(np.arange(5.0), np.full(5, 42.0))]))
+    assert slope[0] == 0.0
+    assert r2[0] == 1.0
+
+
+def test_batch_statistics_match_numpy():
+    histories = random_histories(1)
+    stats = batch_statistics(pack_histories(histories))
+    for row, (_, prices) in enumerate(histories):
+        assert stats['mean'][row] == pytest.approx(np.mean(prices), rel=1e-12)
+        assert stats['min'][row] == np.min(prices)
+        assert stats['max'][row] == np.max(prices)
+        assert stats['std'][row] == pytest.approx(np.std(prices), rel=1e-9)
+        for q in PERCENTILES:
+            assert stats[f'p{q}'][row] == pytest.approx(np.percentile(prices, q), rel=1e-12)
+
+
+def test_batch_scaled_regression_matches_sklearn():
+    rng = np.random.default_rng(2)
+    features, targets = [], []
+    for _ in range(30):
+        length = int(rng.integers(3, 200))
+        days = np.arange(length, dtype=float)
+        dates = np.datetime64('2024-01-01') + np.arange(length)
+        X = np.column_stack([
+            days,
+            (dates.astype(np.int64) + 3) % 7,
+            dates.astype('datetime64[M]').astype(np.int64) % 12 + 1,
+            rng.uniform(90, 110, length),
+        ])
+        features.append(X)
+        targets.append(100 + 0.1 * days + rng.normal(0, 1, length))
+
+    mean, scale, coefficients, intercept = batch_scaled_regression(features, targets)
+    for row, (X, y) in enumerate(zip(features, targets)):
+        scaler = StandardScaler()
+        X_scaled = scaler.fit_transform(X)
+        model = LinearRegression().fit(X_scaled, y)
+        np.testing.assert_allclose(mean[row], scaler.mean_, rtol=RTOL)
+        np.testing.assert_allclose(scale[row], scaler.scale_, rtol=RTOL)
+        # Compare predictions: the minimum-norm solution is unique, rank-deficient columns included
+        np.testing.assert_allclose(X_scaled @ coefficients[row] + intercept[row], model.predict(X_scaled), rtol=RTOL)
+
+
+def test_evaluate_products_batch_matches_single():
+    products = [
+        payload(f'p{row}', days, prices, float(prices[-1]) * 0.97)
+        for row, (days, prices) in enumerate(random_histories(3, 25))
+    ]
+    products.insert(5, {'product_id': 'short', 'product_name': 'Short', 'current_price': 1.0,
+                        'price_history': [{'date': '2024-01-01', 'price': 1.0}]})
+    products.insert(9, {'product_id': 'missing', 'product_name': 'Missing'})
+
+    batched = evaluate_products(products)
+    # Padding changes NumPy's summation order, so unrounded floats may differ in the last bit
+    assert_results_close(batched, [evaluate_products([product])[0] for product in products])
+    assert [ok for ok, _ in batched].count(False) == 2
+    assert batched[9] == (False, {'product_id': 'missing', 'error': "'price_history'"})
+
+
+def test_history_to_arrays_sorts_by_date():
+    days, prices = history_to_arrays([
+        {'date': '2024-01-03T10:00:00', 'price': 3.0},
+        {'date': '2024-01-01T10:00:00', 'price': 1.0},
+        {'date': '2024-01-02T09:00:00', 'price': 2.0},
+    ])
+    np.testing.assert_array_equal(days, [0.0, 0.0, 2.0])
+    np.testing.assert_array_equal(prices, [1.0, 2.0, 3.0])
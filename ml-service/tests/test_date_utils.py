@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+from date_utils import day_of_week, iso_week, parse_dates, parse_wall_clock
+
+
+def test_parse_wall_clock_naive():
+    dates, utc_offset = parse_wall_clock(['2025-06-12T00:58:14.123508', '2025-06-13T10:00:00'])
+    assert utc_offset == ''
+    np.testing.assert_array_equal(
+        dates, np.array(['2025-06-12T00:58:14.123508', '2025-06-13T10:00:00'], dtype='datetime64[us]')
+    )
+
+
+def test_parse_wall_clock_keeps_shared_offset():
+    dates, utc_offset = parse_wall_clock(['2025-06-12T08:00:00+05:30', '2025-06-13T09:30:00+05:30'])
+    assert utc_offset == '+05:30'
+    np.testing.assert_array_equal(
+        dates, np.array(['2025-06-12T08:00:00', '2025-06-13T09:30:00'], dtype='datetime64[us]')
+    )
+
+
+def test_parse_wall_clock_mixed_utc_suffixes():
+    values = ['2025-06-12T08:00:00Z', '2025-06-13T09:30:00+00:00', '2025-06-14T10:15:00.250000Z']
+    dates, utc_offset = parse_wall_clock(values)
+    assert utc_offset == '+00:00'
+    np.testing.assert_array_equal(
+        dates, np.array(['2025-06-12T08:00:00', '2025-06-13T09:30:00', '2025-06-14T10:15:00.25'], dtype='datetime64[us]')
+    )
+    # Starting with the longer suffix must not change the result
+    reordered, _ = parse_wall_clock(values[1:] + values[:1])
+    np.testing.assert_array_equal(reordered, np.concatenate([dates[1:], dates[:1]]))
+
+
+def test_parse_wall_clock_mixed_offsets_convert_to_utc():
+    dates, utc_offset = parse_wall_clock(['2025-06-12T08:00:00+02:00', '2025-06-12T08:00:00-01:00'])
+    assert utc_offset == '+00:00'
+    np.testing.assert_array_equal(dates, parse_dates(['2025-06-12T06:00:00Z', '2025-06-12T09:00:00Z']))
+
+
+def test_calendar_fields_match_pandas():
+    dates = np.datetime64('2019-12-25', 'us') + np.arange(900) * np.timedelta64(1, 'D')
+    index = pd.DatetimeIndex(dates)
+    np.testing.assert_array_equal(day_of_week(dates), index.dayofweek)
+    np.testing.assert_array_equal(iso_week(dates), index.isocalendar().week.to_numpy())
@@ -0,0 +1,153 @@
+import numpy as np
+import pytest
+
+from deals import DealIndex, discounts, trailing_means
+from history_store import HistoryStore
+from price_store import PriceStore, PriceStoreWriter
+from shared_catalog import SharedCatalog
+
+START = np.datetime64('2024-01-01T00:00:00', 'us')
+
+
+def random_products(seed, count):
+    rng = np.random.default_rng(seed)
+    products = []
+    for index in range(count):
+        length = int(rng.integers(1, 80))
+        days = np.sort(rng.choice(200, length, replace=False))
+        products.append((
+            f'p{index}', START + days * np.timedelta64(1, 'D'), rng.uniform(50, 150, length), f'Product {index}',
+            ('Phones', 'Audio', None)[index % 3], ('Acme', 'Globex')[index % 2], ''
+        ))
+    return products
+
+
+def flat_product(product_id, last, days=40):
+    prices = np.full(days, 100.0)
+    prices[-1] = last
+    return (product_id, START + np.arange(days) * np.timedelta64(1, 'D'), prices, product_id, 'Phones', 'Acme', '')
+
+
+def memory_index(generation):
+    """Reference: every catalog product indexed one at a time through update()"""
+    index = DealIndex(50.0, 30)
+    for product_id in generation.ids():
+        index.update(generation.get(product_id))
+    return index
+
+
+def test_trailing_means_exclude_the_current_day():
+    days = np.array([0, 1, 2, 10, 0, 5, 6], dtype=np.int64)
+    prices = np.array([1.0, 2.0, 3.0, 4.0, 10.0, 20.0, 30.0])
+    means = trailing_means(days, prices, np.array([4, 7]), np.array([0, 4]), 9)
+    # Days 1 and 2 fall within 9 days before day 10; days 0 and 5 before day 6
+    np.testing.assert_array_equal(means, [2.5, 15.0])
+
+
+def test_discounts_without_reference():
+    np.testing.assert_array_equal(
+        discounts(np.array([50.0, 50.0, 50.0]), np.array([100.0, 0.0, np.nan])), [0.5, -np.inf, -np.inf]
+    )
+
+
+def test_top_matches_a_full_sort():
+    index = DealIndex()
+    for product_id, dates, prices, name, category, brand, _ in random_products(0, 300):
+        index.update(HistoryStore().put(product_id, [
+            {'date': str(date), 'price': price} for date, price in zip(dates, prices.tolist())
+        ], name, category=category, brand=brand))
+    for basis in ('percentile', 'moving_average'):
+        discount = index._columns[f'{basis}_discount'][:index.size]
+        order = [row for row in np.argsort(-discount, kind='stable') if discount[row] >= 0.1]
+        assert [deal['product_id'] for deal in index.top(25, basis, min_discount=0.1)] == [index.ids[row] for row in order[:25]]
+    deals = index.top(1000, category='Audio', brand='Acme', min_discount=-10)
+    assert deals and all((deal['category'], deal['brand']) == ('Audio', 'Acme') for deal in deals)
+    assert index.top(10, category='Unknown') == []
+    with pytest.raises(ValueError):
+        index.top(basis='median')
+
+
+@pytest.mark.parametrize('deal_params', [(50.0, 30), None])
+def test_catalog_matches_indexing_each_product(tmp_path, deal_params):
+    # Mapped columns (published with the same parameters) or computed on load
+    generation = SharedCatalog(str(tmp_path), deal_params=deal_params).publish(random_products(1, 500) + [flat_product('p7', 60.0)])
+    index = DealIndex(50.0, 30)
+    index.load_catalog(generation, wait=True)
+    reference = memory_index(generation)
+
+    assert len(index) == len(reference) == 500
+    for query in ({}, {'basis': 'moving_average'}, {'category': 'Phones'}, {'brand': 'Globex', 'category': None},
+                  {'category': 'Unknown'}, {'k': 500, 'min_discount': -10}):
+        query = {'k': 25, **query}
+        assert index.top(**query) == reference.top(**query)
+
+
+def test_products_missing_from_a_new_generation_disappear(tmp_path):
+    catalog = SharedCatalog(str(tmp_path), deal_params=(50.0, 30))
+    index = DealIndex(50.0, 30)
+    index.load_catalog(catalog.publish([flat_product(f'p{i}', 50.0 + i) for i in range(5)]), wait=True)
+    assert [deal['product_id'] for deal in index.top(10)] == ['p0', 'p1', 'p2', 'p3', 'p4']
+
+    index.load_catalog(catalog.publish([flat_product(f'p{i}', 50.0 + i) for i in range(2, 5)]), wait=True)
+    assert [deal['product_id'] for deal in index.top(10)] == ['p2', 'p3', 'p4']
+    assert len(index) == 3
+    assert index.stats()['catalog_generation'] == 2
+
+
+def test_an_older_generation_never_replaces_a_newer_one(tmp_path):
+    catalog = SharedCatalog(str(tmp_path))
+    first = catalog.publish([flat_product('old', 50.0)])
+    second = catalog.publish([flat_product('new', 50.0)])
+    index = DealIndex()
+    index.load_catalog(second, wait=True)
+    index.load_catalog(first, wait=True)
+    assert [deal['product_id'] for deal in index.top()] == ['new']
+
+
+def test_held_histories_take_precedence_over_catalog_and_price_store(tmp_path):
+    with PriceStoreWriter(str(tmp_path / 'store')) as writer:
+        for i in range(10):
+            writer.add(f'p{i}', np.arange(40), np.r_[np.full(39, 100.0), 50.0])
+    price_store = PriceStore(str(tmp_path / 'store'))
+    catalog = SharedCatalog(str(tmp_path / 'catalog'), deal_params=(50.0, 30))
+    catalog.publish([flat_product(f'p{i}', 60.0) for i in range(5, 15)])
+
+    history_store = HistoryStore(price_store, catalog=catalog)
+    index = DealIndex(50.0, 30)
+    index.load_price_store(price_store)
+    index.load_catalog(catalog.current(), wait=True)
+    history_store.add_listener(index.update)
+    ingested = [{'date': f'2024-01-{day + 1:02d}', 'price': 100.0 if day < 20 else 10.0} for day in range(21)]
+    history_store.put('p12', ingested)
+    history_store.put('p2', ingested)
+
+    def current_prices():
+        deals = index.top(100)
+        assert len(deals) == len(index) == 15
+        return {deal['product_id']: deal['current_price'] for deal in deals}
+
+    expected = {'p2': 10.0, 'p12': 10.0, **{f'p{i}': 50.0 for i in (0, 1, 3, 4)}}
+    assert current_prices() == {**expected, **{f'p{i}': 60.0 for i in (5, 6, 7, 8, 9, 10, 11, 13, 14)}}
+
+    # Held histories stay hidden in the next generation too
+    index.load_catalog(catalog.publish([flat_product(f'p{i}', 70.0) for i in range(5, 15)]), wait=True)
+    assert current_prices() == {**expected, **{f'p{i}': 70.0 for i in (5, 6, 7, 8, 9, 10, 11, 13, 14)}}
+
+
+def test_price_store_chunks_match_single_updates(tmp_path):
+    products = random_products(2, 200)
+    with PriceStoreWriter(str(tmp_path / 'store')) as writer:
+        for product_id, dates, prices, *_ in products:
+            writer.add(product_id, dates.astype('datetime64[D]').astype(np.int64), prices)
+    price_store = PriceStore(str(tmp_path / 'store'))
+    chunked = DealIndex()
+    chunked.load_price_store(price_store, chunk_size=17)
+    single = DealIndex()
+    history_store = HistoryStore()
+    for product_id in price_store.ids:
+        days, prices = price_store.columns(product_id)
+        single.update(history_store.put(product_id, [
+            {'date': str(np.datetime64(int(day), 'D')), 'price': float(price)} for day, price in zip(days, prices)
+        ])._replace(sketch=None))
+    for basis in ('percentile', 'moving_average'):
+        assert chunked.top(50, basis, min_discount=-10) == single.top(50, basis, min_discount=-10)
@@ -0,0 +1,61 @@
+import time
+
+import numpy as np
+import pytest
+
+from batch_engine import batch_trend, history_to_arrays, pack_histories
+from incremental_trend import TrendStateStore, VersionConflict
+
+
+def points(start, stop):
+    rng = np.random.default_rng(start)
+    return [
+        {'date': str(np.datetime64('2024-01-01') + day), 'price': float(100 + 0.3 * day + rng.normal(0, 2))}
+        for day in range(start, stop)
+    ]
+
+
+def test_deltas_match_a_full_refit():
+    store = TrendStateStore()
+    store.apply('p1', 0, points(0, 40))
+    store.apply('p1', 40, points(40, 41))
+    summary = store.apply('p1', 41, points(41, 400))
+
+    slope, intercept, r2 = batch_trend(pack_histories([history_to_arrays(points(0, 40) + points(40, 41) + points(41, 400))]))
+    assert summary['version'] == 400
+    assert summary['slope'] == round(float(slope[0]), 4)
+    assert summary['intercept'] == round(float(intercept[0]), 4)
+    assert summary['r2_score'] == round(float(r2[0]), 3)
+
+
+def test_version_conflicts():
+    store = TrendStateStore()
+    with pytest.raises(VersionConflict) as conflict:
+        store.apply('p1', 5, points(0, 3))
+    assert conflict.value.current_version == 0
+    store.apply('p1', 0, points(0, 3))
+    with pytest.raises(VersionConflict) as conflict:
+        store.apply('p1', 2, points(2, 4))
+    assert conflict.value.current_version == 3
+    with pytest.raises(ValueError):
+        store.apply('p1', 3, points(0, 1))
+
+
+def test_least_recently_updated_products_are_evicted():
+    store = TrendStateStore(max_size=2)
+    for product_id in ('a', 'b', 'c'):
+        store.apply(product_id, 0, points(0, 3))
+    with pytest.raises(VersionConflict):
+        store.apply('a', 3, points(3, 4))
+    assert store.apply('c', 3, points(3, 4))['version'] == 4
+    assert store.stats()['evictions'] == 1
+    assert len(store) == 2
+
+
+def test_idle_states_expire():
+    store = TrendStateStore(ttl_seconds=0.05)
+    store.apply('a', 0, points(0, 3))
+    time.sleep(0.1)
+    with pytest.raises(VersionConflict) as conflict:
+        store.apply('a', 3, points(3, 4))
+    assert conflict.value.current_version == 0
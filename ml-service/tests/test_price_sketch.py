@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from price_sketch import PriceSketch, QuantileSketch, RunningMoments
+
+
+def rank_error(sketch, values, q):
+    """|rank of the sketch's q-quantile - q| as a fraction of the count"""
+    ordered = np.sort(values)
+    estimate = sketch.quantile(q)
+    low = np.searchsorted(ordered, estimate, side='left')
+    high = np.searchsorted(ordered, estimate, side='right')
+    target = q * len(values)
+    return max(0, low - target, target - high) / len(values)
+
+
+def test_running_moments_match_numpy():
+    values = np.random.default_rng(0).normal(100, 15, 5000)
+    moments = RunningMoments()
+    for chunk in np.array_split(values, 37):
+        moments.update(chunk)
+    assert moments.count == len(values)
+    assert moments.mean == pytest.approx(np.mean(values), rel=1e-12)
+    assert moments.std == pytest.approx(np.std(values), rel=1e-10)
+    assert (moments.min, moments.max) == (values.min(), values.max())
+
+
+def test_exact_until_first_compaction():
+    values = np.random.default_rng(1).uniform(10, 20, 150)
+    sketch = PriceSketch.from_prices(values, k=200)
+    assert sketch.quantiles.exact
+    for q in (0, 0.25, 0.5, 0.9, 1):
+        assert sketch.quantile(q) == np.percentile(values, q * 100)
+
+
+@pytest.mark.parametrize('k', [64, 200])
+def test_rank_error_is_about_one_over_k(k):
+    values = np.random.default_rng(2).lognormal(4, 0.5, 200_000)
+    sketch = QuantileSketch(k)
+    for chunk in np.array_split(values, 500):
+        sketch.update(chunk)
+    assert not sketch.exact
+    assert len(sketch) < 10 * k * np.log2(len(values) / k)
+    # The README quotes the 25th percentile (buy recommendation); the tails interpolate against fewer items
+    assert rank_error(sketch, values, 0.25) <= 1 / k
+    for q in (0.01, 0.5, 0.75, 0.99):
+        assert rank_error(sketch, values, q) <= 3 / k
+
+
+def test_merged_shards_keep_the_rank_error():
+    values = np.random.default_rng(3).normal(500, 50, 100_000)
+    shards = [PriceSketch.from_prices(shard, k=200) for shard in np.array_split(values, 8)]
+    merged = PriceSketch(200)
+    for shard in shards:
+        merged.merge(shard)
+    assert merged.count == len(values)
+    assert merged.mean == pytest.approx(np.mean(values), rel=1e-12)
+    assert merged.std == pytest.approx(np.std(values), rel=1e-10)
+    for q in (0.25, 0.5, 0.75):
+        assert rank_error(merged.quantiles, values, q) <= 0.01
+
+
+def test_copy_updates_like_the_original():
+    rng = np.random.default_rng(4)
+    original = PriceSketch.from_prices(rng.normal(100, 5, 5001), k=64)
+    clone = original.copy()
+    appended = rng.normal(100, 5, 3000)
+    original.update(appended)
+    clone.update(appended)
+    assert clone.quantiles._flip == original.quantiles._flip
+    assert all(np.array_equal(left, right) for left, right in zip(clone.quantiles.levels, original.quantiles.levels))
+    assert vars(clone.moments) == vars(original.moments)
+
+
+def test_copy_is_independent():
+    original = PriceSketch.from_prices(np.arange(10.0), k=64)
+    clone = original.copy().update([1000.0])
+    assert original.count == 10 and original.quantile(1) == 9.0
+    assert clone.count == 11 and clone.quantile(1) == 1000.0
+
+
+def test_quantile_of_empty_sketch():
+    with pytest.raises(ValueError):
+        QuantileSketch().quantile(0.5)
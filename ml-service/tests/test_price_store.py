@@ -0,0 +1,72 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from price_store import PriceStore, PriceStoreWriter, history_to_columns, iter_catalog, product_id_of
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'store')
+    rng = np.random.default_rng(0)
+    products = {}
+    with PriceStoreWriter(path) as writer:
+        for index in range(20):
+            length = int(rng.integers(0, 50))
+            days = np.sort(rng.choice(20_000, length, replace=False)).astype(np.int32)
+            prices = rng.uniform(1, 500, length).astype(np.float32)
+            writer.add(f'p{index}', days, prices)
+            products[f'p{index}'] = (days, prices)
+        block_days = np.arange(19_000, 19_010, dtype=np.int32)
+        block = rng.uniform(1, 500, (3, 10)).astype(np.float32)
+        writer.add_block(['b0', 'b1', 'b2'], block_days, block)
+        products.update({f'b{row}': (block_days, block[row]) for row in range(3)})
+
+    store = PriceStore(path)
+    assert len(store) == len(products)
+    assert list(store.ids) == list(products)
+    for product_id, (days, prices) in products.items():
+        stored_days, stored_prices = store.columns(product_id)
+        np.testing.assert_array_equal(stored_days, days)
+        np.testing.assert_array_equal(stored_prices, prices)
+    assert 'missing' not in store
+    with pytest.raises(KeyError):
+        store.columns('missing')
+
+
+def test_failed_write_leaves_no_store(tmp_path):
+    path = str(tmp_path / 'store')
+    with pytest.raises(ValueError):
+        with PriceStoreWriter(path) as writer:
+            writer.add('p0', [1, 2], [1.0])
+    assert not os.path.exists(path)
+    assert not os.path.exists(f'{path}.tmp')
+
+
+def test_history_round_trip(tmp_path):
+    history = [
+        {'date': '2024-03-02T10:00:00', 'price': 12.5},
+        {'date': '2024-03-01T09:00:00', 'price': 10.25},
+    ]
+    days, prices = history_to_columns(history)
+    np.testing.assert_array_equal(days, [19783, 19784])
+    path = str(tmp_path / 'store')
+    with PriceStoreWriter(path) as writer:
+        writer.add_history('p0', history)
+    assert PriceStore(path).history('p0') == [
+        {'date': '2024-03-01', 'price': 10.25},
+        {'date': '2024-03-02', 'price': 12.5},
+    ]
+
+
+def test_iter_catalog_formats(tmp_path):
+    products = [{'_id': 'a'}, {'product_id': 7}, {'id': 'c'}]
+    (tmp_path / 'catalog.json').write_text(json.dumps(products))
+    (tmp_path / 'catalog.jsonl').write_text('\n'.join(json.dumps(product) for product in products) + '\n\n')
+    (tmp_path / 'one.json').write_text(json.dumps(products[0]))
+    for name in ('catalog.json', 'catalog.jsonl'):
+        assert [product_id_of(product) for product in iter_catalog(str(tmp_path / name))] == ['a', '7', 'c']
+    assert list(iter_catalog(str(tmp_path / 'one.json'))) == [products[0]]
+    with pytest.raises(KeyError):
+        product_id_of({'name': 'no id'})
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from seasonality import CYCLES, WINDOWS, detect_cycle_matrix, detect_cycles, window_length
+
+
+def random_walk(rng, rows, n, step=0.3):
+    return 100 + np.cumsum(rng.normal(0, step, (rows, n)), axis=1)
+
+
+def history(days, prices):
+    return np.asarray(days, dtype=float), np.asarray(prices, dtype=float)
+
+
+def test_window_length_picks_longest_fitting_window():
+    assert window_length(12) == 0
+    assert window_length(13) == 14
+    assert window_length(400) == 364
+    assert window_length(734) == 735
+    assert window_length(5000) == WINDOWS[-1]
+
+
+@pytest.mark.parametrize('name', list(CYCLES))
+def test_every_cycle_has_a_window_with_two_periods(name):
+    # Otherwise the cycle could never be looked for
+    nominal = CYCLES[name][0]
+    assert any(window >= 2 * nominal for window in WINDOWS)
+    n = min(window for window in WINDOWS if window >= 2 * nominal)
+    series = random_walk(np.random.default_rng(0), 1, n)
+    assert name in detect_cycle_matrix(series)
+
+
+@pytest.mark.parametrize('name, n', [('weekly', 91), ('monthly', 182), ('yearly', 735)])
+def test_planted_cycle_is_detected(name, n):
+    nominal = CYCLES[name][0]
+    t = np.arange(n)
+    series = random_walk(np.random.default_rng(1), 20, n, step=0.2) + 8 * np.sin(2 * np.pi * t / nominal)
+    stats = detect_cycle_matrix(series)[name]
+    assert stats['detected'].all()
+    assert np.all(np.abs(stats['period'] - nominal) <= nominal * 0.1)
+    # The component's next minimum is a quarter period before the next sine trough
+    expected = (0.75 * nominal - (n - 1)) % nominal
+    offsets = stats['low_offset'] % nominal
+    assert np.all(np.minimum(np.abs(offsets - expected), nominal - np.abs(offsets - expected)) <= 0.1 * nominal + 1)
+
+
+def test_random_walks_rarely_show_cycles():
+    series = random_walk(np.random.default_rng(2), 2000, 364)
+    for name, stats in detect_cycle_matrix(series).items():
+        assert stats['detected'].mean() < 0.05, name
+
+
+def test_batch_matches_single_histories():
+    rng = np.random.default_rng(3)
+    histories, last_dates = [], []
+    for row in range(30):
+        n = int(rng.integers(5, 900))
+        days = np.sort(rng.choice(n + 60, n, replace=False))
+        prices = random_walk(rng, 1, n)[0] + (row % 3) * 5 * np.sin(2 * np.pi * days / 7)
+        histories.append(history(days - days[0], prices))
+        last_dates.append(np.datetime64('2024-01-01') + int(days[-1] - days[0]))
+
+    batched = detect_cycles(histories, last_dates)
+    assert batched == [detect_cycles([one], [date])[0] for one, date in zip(histories, last_dates)]
+    assert any(cycles for cycles in batched)
+
+
+def test_weekly_phase_names_a_weekday():
+    days = np.arange(182)
+    prices = 100 + 5 * np.sin(2 * np.pi * days / 7)
+    (cycles,) = detect_cycles([history(days, prices)], [np.datetime64('2024-06-30')])
+    weekly = [cycle for cycle in cycles if cycle['cycle'] == 'weekly']
+    assert len(weekly) == 1
+    assert weekly[0]['period_days'] == 7.0
+    assert weekly[0]['best_phase'] in ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
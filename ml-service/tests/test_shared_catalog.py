@@ -0,0 +1,106 @@
+import json
+import time
+
+import numpy as np
+
+from deals import DEAL_COLUMNS, catalog_deal_columns
+from shared_catalog import CatalogGeneration, SharedCatalog
+
+
+def product(index, days=40, last=None, category='Phones', brand='Acme', utc_offset=''):
+    dates = np.datetime64('2024-01-01T08:15:00', 'us') + np.arange(days) * np.timedelta64(1, 'D')
+    prices = 100.0 + np.arange(days) % 7
+    if last is not None:
+        prices[-1] = last
+    return (f'p{index}', dates, prices, f'Product {index}', category, brand, utc_offset)
+
+
+def write_catalog(path, products):
+    with open(path, 'w') as f:
+        json.dump([
+            {'_id': product_id, 'name': name, 'category': category, 'brand': brand,
+             'priceHistory': [{'date': str(date), 'price': price} for date, price in zip(dates, prices.tolist())]}
+            for product_id, dates, prices, name, category, brand, _ in products
+        ], f)
+
+
+def test_publish_and_get(tmp_path):
+    catalog = SharedCatalog(str(tmp_path))
+    assert catalog.current() is None
+    products = [product(0), product(1, days=3, category=None, brand=None, utc_offset='+02:00'), product(2, days=0)]
+    generation = catalog.publish(products)
+
+    assert generation.number == 1
+    assert len(generation) == 3
+    for product_id, dates, prices, name, category, brand, utc_offset in products:
+        history = generation.get(product_id)
+        np.testing.assert_array_equal(history.dates, dates)
+        np.testing.assert_array_equal(history.prices, prices)
+        assert (history.name, history.category, history.brand) == (name, category, brand)
+        assert history.utc_offset == utc_offset
+        assert history.version == 1
+    assert generation.get('missing') is None
+    assert list(generation.ids()) == ['p0', 'p1', 'p2']
+
+
+def test_last_occurrence_of_an_id_wins(tmp_path):
+    generation = SharedCatalog(str(tmp_path)).publish([product(0, last=1.0), product(1), product(0, last=2.0)])
+    assert len(generation) == 2
+    assert generation.get('p0').prices[-1] == 2.0
+    assert list(generation.ids()) == ['p1', 'p0']
+
+
+def test_label_codes(tmp_path):
+    generation = SharedCatalog(str(tmp_path)).publish([
+        product(0, category='Phones'), product(1, category=None), product(2, category='Audio'), product(3)
+    ])
+    assert generation.labels['category'] == [None, 'Audio', 'Phones']
+    decoded = [generation.labels['category'][code] for code in generation.codes['category']]
+    assert decoded == ['Phones', None, 'Audio', 'Phones']
+
+
+def test_deal_columns_are_written_for_the_publisher_parameters(tmp_path):
+    products = [product(index, days=20 + index, last=90.0 + index) for index in range(10)]
+    generation = SharedCatalog(str(tmp_path), deal_params=(50.0, 30)).publish(products)
+
+    mapped = generation.deal_columns(50.0, 30)
+    computed = catalog_deal_columns(generation.dates, generation.prices, generation.offsets, 50.0, 30, chunk_size=3)
+    for name in DEAL_COLUMNS:
+        np.testing.assert_array_equal(mapped[name], computed[name])
+    assert generation.deal_columns(75.0, 30) is None
+    assert SharedCatalog(str(tmp_path / 'plain')).publish(products).deal_columns(50.0, 30) is None
+
+
+def test_workers_switch_to_a_published_generation(tmp_path):
+    writer = SharedCatalog(str(tmp_path))
+    reader = SharedCatalog(str(tmp_path), poll_interval=0)
+    switched = []
+    reader.add_listener(lambda generation: switched.append(generation.number))
+
+    writer.publish([product(0)])
+    first = reader.current()
+    held = first.get('p0')
+    writer.publish([product(0, last=5.0)])
+    writer.publish([product(1)])
+
+    assert reader.current().number == 3
+    assert switched == [1, 3]
+    # A history read from an old generation stays readable
+    assert held.prices[-1] == 104.0
+    assert reader.current().get('p0') is None
+
+
+def test_load_reuses_a_generation_built_from_the_same_files(tmp_path):
+    path = str(tmp_path / 'catalog.json')
+    write_catalog(path, [product(0), product(1)])
+    catalog = SharedCatalog(str(tmp_path / 'shared'))
+    assert catalog.load([path]).number == 1
+    assert catalog.load([path]).number == 1
+    assert catalog.load([path], force=True).number == 2
+
+    time.sleep(0.01)
+    write_catalog(path, [product(0), product(1), product(2)])
+    generation = catalog.load([path])
+    assert generation.number == 3
+    assert len(generation) == 3
+    assert isinstance(CatalogGeneration(generation.path).get('p2').prices, np.ndarray)
@@ -0,0 +1,195 @@
+"""Content negotiation for ML service request and response bodies.
+
+Requests may be sent:
+
+    Content-Encoding: gzip                              compressed body (also for NDJSON streams)
+    Content-Type: application/json                      plain JSON (the default)
+    Content-Type: application/vnd.shopsmart.columnar+json
+    Content-Type: application/msgpack                   MessagePack (needs the msgpack package)
+    Content-Type: application/vnd.shopsmart.columnar+msgpack
+
+In the columnar types every point list (``price_history``, ``points``) is an
+object of parallel arrays (see columnar.py), which the NumPy pipelines read
+without parsing a date string per point. Responses are encoded in the type
+the ``Accept`` header prefers among the same four, so a columnar client gets
+``predictions``/``future_predictions`` back as arrays too; JSON is returned
+when nothing else is asked for, and MessagePack is only offered when the
+package is installed. An unsupported Content-Encoding, or a MessagePack body
+without the package, gets a 415.
+
+Decompression is streamed and capped, so a small compressed body cannot
+expand without bound.
+
+Configuration (used by app.py and app_simple.py):
+    MAX_DECOMPRESSED_BYTES   largest request body after gunzip (default 64 MiB)
+"""
+import io
+import os
+import zlib
+
+from flask import Request, current_app, has_request_context, jsonify, request
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge
+from werkzeug.utils import cached_property
+
+from columnar import from_columnar, to_columnar
+
+try:
+    import msgpack
+except ImportError:  # MessagePack is optional
+    msgpack = None
+
+JSON = 'application/json'
+COLUMNAR_JSON = 'application/vnd.shopsmart.columnar+json'
+MSGPACK = 'application/msgpack'
+COLUMNAR_MSGPACK = 'application/vnd.shopsmart.columnar+msgpack'
+
+MSGPACK_TYPES = (MSGPACK, 'application/x-msgpack', COLUMNAR_MSGPACK)
+COLUMNAR_TYPES = (COLUMNAR_JSON, COLUMNAR_MSGPACK)
+GZIP_ENCODINGS = ('gzip', 'x-gzip')
+
+DEFAULT_MAX_DECOMPRESSED_BYTES = 64 * 1024 * 1024
+
+
+def response_types():
+    """Media types responses can be encoded in, preferred first on equal quality"""
+    if msgpack is None:
+        return [JSON, COLUMNAR_JSON]
+    return [JSON, COLUMNAR_JSON, MSGPACK, COLUMNAR_MSGPACK]
+
+
+def _msgpack_default(value):
+    # NumPy scalars and anything else jsonify would stringify
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+def packb(value):
+    return msgpack.packb(value, use_bin_type=True, default=_msgpack_default)
+
+
+def unpackb(data):
+    return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+
+class GzipBody(io.RawIOBase):
+    """Incrementally gunzipped request stream that refuses to expand past ``limit`` bytes"""
+
+    def __init__(self, stream, limit, chunk_size=65536):
+        self._stream = stream
+        self._limit = limit
+        self._chunk_size = chunk_size
+        self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self._pending = b''
+        self._produced = 0
+        self._finished = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending and not self._finished:
+            self._pending = self._inflate()
+        count = min(len(buffer), len(self._pending))
+        buffer[:count] = self._pending[:count]
+        self._pending = self._pending[count:]
+        return count
+
+    def _inflate(self):
+        decompressor = self._decompressor
+        if decompressor.eof:
+            if not decompressor.unused_data:
+                self._finished = True
+                return b''
+            # Concatenated gzip members
+            data, self._decompressor = decompressor.unused_data, zlib.decompressobj(16 + zlib.MAX_WBITS)
+            decompressor = self._decompressor
+        else:
+            data = decompressor.unconsumed_tail or self._stream.read(self._chunk_size)
+            if not data:
+                raise BadRequest('Truncated gzip request body')
+        try:
+            output = decompressor.decompress(data, self._chunk_size)
+        except zlib.error as e:
+            raise BadRequest(f'Invalid gzip request body: {str(e)}')
+        self._produced += len(output)
+        if self._produced > self._limit:
+            raise RequestEntityTooLarge(f'Decompressed request body exceeds {self._limit} bytes')
+        return output
+
+
+class NegotiatedRequest(Request):
+    """Request that gunzips its body and decodes MessagePack and columnar bodies in get_json"""
+
+    @cached_property
+    def stream(self):
+        stream = super().stream
+        if (self.content_encoding or '').lower() in GZIP_ENCODINGS:
+            limit = current_app.config.get('MAX_DECOMPRESSED_BYTES', DEFAULT_MAX_DECOMPRESSED_BYTES)
+            return io.BufferedReader(GzipBody(stream, limit))
+        return stream
+
+    @property
+    def is_msgpack(self):
+        return self.mimetype in MSGPACK_TYPES
+
+    def get_json(self, force=False, silent=False, cache=True):
+        if self.is_msgpack and msgpack is not None:
+            try:
+                value = unpackb(self.get_data(cache=cache))
+            except ValueError as e:
+                if silent:
+                    return None
+                raise BadRequest(f'Failed to decode MessagePack object: {str(e) or type(e).__name__}')
+        else:
+            value = super().get_json(force=force, silent=silent, cache=cache)
+        if self.mimetype in COLUMNAR_TYPES:
+            value = from_columnar(value)
+        return value
+
+
+class NegotiatedJSONProvider(DefaultJSONProvider):
+    """jsonify() that encodes the response in the media type the request's Accept header prefers"""
+
+    def response(self, *args, **kwargs):
+        if not has_request_context():
+            return super().response(*args, **kwargs)
+        media_type = request.accept_mimetypes.best_match(response_types(), default=JSON)
+        if media_type == JSON:
+            response = super().response(*args, **kwargs)
+        else:
+            value = self._prepare_response_obj(args, kwargs)
+            if media_type in COLUMNAR_TYPES:
+                value = to_columnar(value)
+            if media_type in MSGPACK_TYPES:
+                body = packb(value)
+            else:
+                body = self.dumps(value, separators=(',', ':'))
+            response = self._app.response_class(body, mimetype=media_type)
+        response.vary.add('Accept')
+        return response
+
+
+class ContentNegotiation:
+    """Installs the request class, JSON provider and Content-Encoding checks on a Flask app"""
+
+    def __init__(self, max_decompressed_bytes=DEFAULT_MAX_DECOMPRESSED_BYTES):
+        self.max_decompressed_bytes = max_decompressed_bytes
+
+    @classmethod
+    def from_env(cls):
+        return cls(int(os.environ.get('MAX_DECOMPRESSED_BYTES', DEFAULT_MAX_DECOMPRESSED_BYTES)))
+
+    def instrument(self, app):
+        app.config['MAX_DECOMPRESSED_BYTES'] = self.max_decompressed_bytes
+        app.request_class = NegotiatedRequest
+        app.json = NegotiatedJSONProvider(app)
+
+        @app.before_request
+        def check_body_format():
+            encoding = (request.content_encoding or 'identity').lower()
+            if encoding not in GZIP_ENCODINGS + ('identity',):
+                return jsonify({'error': f'Unsupported Content-Encoding: {encoding}'}), 415
+            if request.is_msgpack and msgpack is None:
+                return jsonify({'error': 'MessagePack bodies need the msgpack package on the server'}), 415